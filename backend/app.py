@@ -1,85 +1,426 @@
-from flask import Flask, request, jsonify, session, redirect, url_for
+import time
+_import_started = time.perf_counter()
+
+from flask import Flask, Blueprint, current_app, request, jsonify, session, redirect, url_for
 from flask_cors import CORS
 from flask_login import LoginManager, current_user, login_user, logout_user, login_required
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.middleware.proxy_fix import ProxyFix
 from models.models import db, User
-from datetime import datetime, timedelta, timezone
 import os
 import jwt
-from authlib.integrations.flask_client import OAuth
 from dotenv import load_dotenv
-import stripe
 from functools import wraps
-from controllers.transaction_controller import TransactionController
-
-# Load environment variables
-load_dotenv()
-
-# Initialize app
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev_key_for_testing')
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///users.db'
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['JWT_SECRET'] = os.environ.get('JWT_SECRET', 'jwt_dev_key')
-app.config['JWT_EXPIRATION_HOURS'] = 24
-
-# Configure Stripe
-stripe.api_key = os.environ.get('STRIPE_SECRET_KEY')
-stripe_webhook_secret = os.environ.get('STRIPE_WEBHOOK_SECRET')
-client_url = os.environ.get('CLIENT_URL', 'http://localhost:5173')
-
-# Enable CORS
-CORS(app, supports_credentials=True, origins=["http://localhost:5173"])
-
-# Initialize database
-db.init_app(app)
+from controllers.transaction_controller import TransactionController, parse_line_items
+from controllers.product_controller import ProductController
+from controllers.export_controller import ExportController
+from controllers.report_controller import ReportController
+from controllers.event_controller import EventController
+from controllers.reconciliation_controller import ReconciliationController
+from services.transaction_cache import history_cache
+from services.catalog import product_catalog
+from services.reporting import rebuild_rollups
+from services.search import install_search_index, rebuild_search_index
+from services.archive import transaction_archiver
+from services.events import transaction_events
+from services.reconciliation import statement_reconciler, read_statement
+from services.scheduler import job_scheduler
+from services.expiry import pending_expirer
+from services.database import database_uri, engine_options, sqlite_pragmas, configure_engine
+from services.webhook_queue import webhook_queue, EVENT_HANDLERS
+from services.token_auth import token_auth, load_user_from_request
+from services.instrumentation import request_metrics
+from services.password_hashing import password_hasher, HashingBusy
+from services.http_cache import make_etag, add_validators, not_modified
+from services.compression import response_compressor
+from services.serialization import configure_json
+from services.rate_limit import rate_limiter
+from services.stripe_client import get_stripe
+from services.oauth_clients import oauth_clients
+from migrations import runner as migrations
+from migrations.query_plans import check_query_plans
+from flask.cli import AppGroup
+import click
+
+def env_config(environ=os.environ):
+    hash_workers = int(environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1))
+    return {
+        'SECRET_KEY': environ.get('SECRET_KEY', 'dev_key_for_testing'),
+        'SQLALCHEMY_DATABASE_URI': database_uri(environ),
+        'SQLITE_PRAGMAS': sqlite_pragmas(environ),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'JWT_SECRET': environ.get('JWT_SECRET', 'jwt_dev_key'),
+        'JWT_EXPIRATION_HOURS': 24,
+        'TOKEN_REVOCATION_CHECK_SECONDS': int(environ.get('TOKEN_REVOCATION_CHECK_SECONDS', 60)),
+        # Schema on boot: migrations (AUTO_MIGRATE) or, for disposable databases, create_all (CREATE_SCHEMA)
+        'AUTO_MIGRATE': environ.get('AUTO_MIGRATE', 'true').lower() == 'true',
+        'CREATE_SCHEMA': environ.get('CREATE_SCHEMA', 'false').lower() == 'true',
+        'TRANSACTION_CACHE_SIZE': int(environ.get('TRANSACTION_CACHE_SIZE', 1024)),
+        'TRANSACTION_CACHE_TTL': int(environ.get('TRANSACTION_CACHE_TTL', 300)),
+        'CATALOG_CACHE_TTL': int(environ.get('CATALOG_CACHE_TTL', 60)),
+        # Approved/cancelled transactions older than this move to the archive tables (`flask archive run`)
+        'ARCHIVE_AFTER_DAYS': int(environ.get('ARCHIVE_AFTER_DAYS', 365)),
+        'ARCHIVE_BATCH_SIZE': int(environ.get('ARCHIVE_BATCH_SIZE', 1000)),
+        # Bank statement import: approvals per batch, and whether one-typo title matches are approved too
+        'RECONCILE_BATCH_SIZE': int(environ.get('RECONCILE_BATCH_SIZE', 1000)),
+        'RECONCILE_APPROVE_FUZZY': environ.get('RECONCILE_APPROVE_FUZZY', 'true').lower() == 'true',
+        'RECONCILE_REPORT_LIMIT': int(environ.get('RECONCILE_REPORT_LIMIT', 200)),
+        # Unpaid offline payments older than PENDING_EXPIRY_HOURS are cancelled or flagged (0 = never)
+        'PENDING_EXPIRY_HOURS': int(environ.get('PENDING_EXPIRY_HOURS', 72)),
+        'PENDING_EXPIRY_ACTION': environ.get('PENDING_EXPIRY_ACTION', 'cancel'),
+        'PENDING_EXPIRY_BATCH_SIZE': int(environ.get('PENDING_EXPIRY_BATCH_SIZE', 500)),
+        'PENDING_EXPIRY_INTERVAL_SECONDS': int(environ.get('PENDING_EXPIRY_INTERVAL_SECONDS', 900)),
+        # In-process job scheduler; a lease in job_lock lets only one process run a job at a time
+        'SCHEDULER_ENABLED': environ.get('SCHEDULER_ENABLED', 'true').lower() == 'true',
+        'SCHEDULER_TICK_SECONDS': int(environ.get('SCHEDULER_TICK_SECONDS', 30)),
+        'SCHEDULER_LOCK_SECONDS': int(environ.get('SCHEDULER_LOCK_SECONDS', 600)),
+        'SCHEDULER_HISTORY_DAYS': int(environ.get('SCHEDULER_HISTORY_DAYS', 30)),
+        # JSON encoder for responses: 'auto' (orjson when installed), 'orjson' or 'stdlib'
+        'JSON_ENCODER': environ.get('JSON_ENCODER', 'auto'),
+        'WEBHOOK_WORKERS': int(environ.get('WEBHOOK_WORKERS', 2)),
+        'WEBHOOK_BATCH_SIZE': int(environ.get('WEBHOOK_BATCH_SIZE', 50)),
+        'SQL_QUERY_WARN_THRESHOLD': int(environ.get('SQL_QUERY_WARN_THRESHOLD', 20)),
+        'METRICS_TOKEN': environ.get('METRICS_TOKEN'),
+        'RATE_LIMIT_ENABLED': environ.get('RATE_LIMIT_ENABLED', 'true').lower() == 'true',
+        # Reverse proxies (e.g. nginx) in front of the app whose X-Forwarded-For/-Proto are trusted;
+        # 0 = clients connect directly and forwarded headers are ignored
+        'TRUSTED_PROXIES': int(environ.get('TRUSTED_PROXIES', 0)),
+        # 'count/seconds' per client IP, per submitted username or per logged-in user
+        'RATE_LIMITS': {
+            'login': {
+                'ip': environ.get('RATE_LIMIT_LOGIN_IP', '20/60'),
+                'username': environ.get('RATE_LIMIT_LOGIN_USERNAME', '5/60'),
+            },
+            'register': {
+                'ip': environ.get('RATE_LIMIT_REGISTER_IP', '5/60'),
+            },
+            'checkout': {
+                'ip': environ.get('RATE_LIMIT_CHECKOUT_IP', '30/60'),
+                'user': environ.get('RATE_LIMIT_CHECKOUT_USER', '10/60'),
+            },
+        },
+        'COMPRESS_MIN_SIZE': int(environ.get('COMPRESS_MIN_SIZE', 1024)),
+        # Server-Sent Events at /api/events: change feed poll interval and per-subscriber buffer
+        'EVENTS_POLL_INTERVAL': float(environ.get('EVENTS_POLL_INTERVAL', 1.0)),
+        'EVENTS_SUBSCRIBER_BUFFER': int(environ.get('EVENTS_SUBSCRIBER_BUFFER', 100)),
+        'EVENTS_HEARTBEAT_SECONDS': int(environ.get('EVENTS_HEARTBEAT_SECONDS', 15)),
+        'EVENTS_MAX_STREAM_SECONDS': int(environ.get('EVENTS_MAX_STREAM_SECONDS', 300)),
+        'PASSWORD_HASH_METHOD': environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000'),
+        'PASSWORD_HASH_WORKERS': hash_workers,
+        'PASSWORD_HASH_MAX_PENDING': int(environ.get('PASSWORD_HASH_MAX_PENDING', hash_workers * 4 or 4)),
+        'PASSWORD_HASH_QUEUE_TIMEOUT': float(environ.get('PASSWORD_HASH_QUEUE_TIMEOUT', 2.0)),
+        # Stripe and OAuth clients are built on first use (services/stripe_client.py, services/oauth_clients.py)
+        'STRIPE_SECRET_KEY': environ.get('STRIPE_SECRET_KEY'),
+        'STRIPE_WEBHOOK_SECRET': environ.get('STRIPE_WEBHOOK_SECRET'),
+        'STRIPE_API_BASE': environ.get('STRIPE_API_BASE'),
+        'STRIPE_TIMEOUT': float(environ.get('STRIPE_TIMEOUT', 10)),
+        'GOOGLE_CLIENT_ID': environ.get('GOOGLE_CLIENT_ID'),
+        'GOOGLE_CLIENT_SECRET': environ.get('GOOGLE_CLIENT_SECRET'),
+        'GITHUB_CLIENT_ID': environ.get('GITHUB_CLIENT_ID'),
+        'GITHUB_CLIENT_SECRET': environ.get('GITHUB_CLIENT_SECRET'),
+        'OAUTH_TIMEOUT': float(environ.get('OAUTH_TIMEOUT', 10)),
+        'OAUTH_METADATA_TTL': int(environ.get('OAUTH_METADATA_TTL', 86400)),
+        'CLIENT_URL': environ.get('CLIENT_URL', 'http://localhost:5173'),
+    }
 
-# Setup login manager
+api = Blueprint('api', __name__)
 login_manager = LoginManager()
-login_manager.init_app(app)
-
-# Setup OAuth
-oauth = OAuth(app)
-
-# Configure OAuth providers
-google = oauth.register(
-    name='google',
-    client_id=os.environ.get('GOOGLE_CLIENT_ID'),
-    client_secret=os.environ.get('GOOGLE_CLIENT_SECRET'),
-    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
-    client_kwargs={'scope': 'openid email profile'},
-)
-
-github = oauth.register(
-    name='github',
-    client_id=os.environ.get('GITHUB_CLIENT_ID'),
-    client_secret=os.environ.get('GITHUB_CLIENT_SECRET'),
-    access_token_url='https://github.com/login/oauth/access_token',
-    access_token_params=None,
-    authorize_url='https://github.com/login/oauth/authorize',
-    authorize_params=None,
-    api_base_url='https://api.github.com/',
-    client_kwargs={'scope': 'user:email'},
-)
 
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
 
-with app.app_context():
-    db.create_all()
+def create_app(config=None):
+    # config overrides values read from the environment, e.g. create_app({'TESTING': True,
+    # 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'AUTO_MIGRATE': False, 'CREATE_SCHEMA': True})
+    started = time.perf_counter()
+    load_dotenv()
+    app = Flask(__name__)
+    app.config.update(env_config())
+    app.config.update(config or {})
+    if 'SQLALCHEMY_ENGINE_OPTIONS' not in (config or {}):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+    timings = {'module_import': import_seconds, 'config': time.perf_counter() - started}
+
+    # Client address and scheme from the proxy headers, so rate limits key on the real client IP
+    if app.config['TRUSTED_PROXIES'] > 0:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'], x_proto=app.config['TRUSTED_PROXIES'])
+
+    # Enable CORS
+    CORS(app, supports_credentials=True, origins=["http://localhost:5173"])
+
+    # Initialize database
+    db.init_app(app)
+    with app.app_context():
+        configure_engine(db.engine, app.config['SQLITE_PRAGMAS'])
+        # Per-request timing and SQL counts: Server-Timing header and Prometheus text at /metrics
+        metrics = request_metrics.init_app(app, db.engine)
+
+    # gzip/brotli for large JSON bodies (transaction lists); registered after the metrics hook
+    # so compression time is included in the measured request duration
+    response_compressor.init_app(app)
+
+    # Responses are encoded with orjson when it is installed (JSON_ENCODER)
+    configure_json(app)
+
+    # Per-user transaction history cache
+    history_cache.init_app(app)
+
+    # Retention: closed transactions past ARCHIVE_AFTER_DAYS leave the hot tables
+    transaction_archiver.init_app(app)
+
+    # Offline payments matched against imported bank statements
+    statement_reconciler.init_app(app)
+
+    # Background jobs; the scheduler thread is started by __main__, gunicorn or `flask jobs scheduler`
+    scheduler = job_scheduler.init_app(app)
+    expirer = pending_expirer.init_app(app)
+    if app.config['PENDING_EXPIRY_HOURS'] > 0:
+        scheduler.register('expire_pending', expirer.run, app.config['PENDING_EXPIRY_INTERVAL_SECONDS'])
+
+    # Product catalog served from memory; also the price source for payments
+    product_catalog.init_app(app)
+
+    # Durable Stripe webhook queue; workers are started by __main__ or `flask webhooks work`
+    webhook_queue.init_app(app)
+
+    # Token-bucket throttling for login, registration and checkout
+    rate_limiter.init_app(app)
+
+    # Password hashing runs in a bounded process pool so logins cannot starve request threads
+    hasher = password_hasher.init_app(app)
+    metrics.add_histogram('password_hash_seconds', 'Time spent computing password hashes', hasher.hash_seconds)
+    metrics.add_histogram('password_hash_queue_wait_seconds', 'Time password hashes waited for a worker', hasher.queue_wait_seconds)
+    metrics.add_collector(collect_service_metrics)
+
+    # Setup login manager; `Authorization: Bearer <token>` requests get a user built from
+    # the token claims, so no User row is loaded per request
+    login_manager.init_app(app)
+    token_auth.init_app(app)
+    login_manager.request_loader(load_user_from_request)
+
+    # Transaction status push (SSE); the change feed thread starts with the first subscriber
+    transaction_events.init_app(app)
+
+    # OAuth providers are registered on first use
+    oauth_clients.init_app(app)
+
+    app.register_blueprint(api)
+    app.cli.add_command(db_cli)
+    app.cli.add_command(reports_cli)
+    app.cli.add_command(webhooks_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(archive_cli)
+    app.cli.add_command(reconcile_cli)
+    app.cli.add_command(jobs_cli)
+    timings['extensions'] = time.perf_counter() - started - timings['config']
+
+    schema_started = time.perf_counter()
+    with app.app_context():
+        if app.config['CREATE_SCHEMA']:
+            db.create_all()
+            # The full-text index and its triggers are not part of the ORM metadata
+            with db.engine.begin() as connection:
+                install_search_index(connection)
+        elif app.config['AUTO_MIGRATE']:
+            # Bring the schema up to the latest migration on startup
+            migrations.upgrade(db.engine)
+    timings['schema'] = time.perf_counter() - schema_started
+    timings['create_app'] = time.perf_counter() - started
+
+    app.extensions['boot_timings'] = timings
+    app.logger.info('App created in %.1f ms (%s)', timings['create_app'] * 1000,
+                    ', '.join(f'{phase} {seconds * 1000:.1f} ms' for phase, seconds in timings.items()))
+    return app
+
+@api.app_errorhandler(HashingBusy)
+def password_hashing_busy(error):
+    response = jsonify({'message': 'Serwer jest przeciążony, spróbuj ponownie za chwilę'})
+    response.headers['Retry-After'] = str(max(1, round(password_hasher.queue_timeout)))
+    return response, 503
+
+def collect_service_metrics():
+    cache = history_cache.stats()
+    queue = webhook_queue.metrics()
+    hashing = password_hasher.stats()
+    compression = response_compressor.stats()
+    events = transaction_events.stats()
+    reconciliation = statement_reconciler.stats()
+    jobs = job_scheduler.stats()
+    return [
+        ('app_boot_seconds', 'gauge', 'Time spent importing and creating the app, by phase', [
+            ({'phase': phase}, round(seconds, 6)) for phase, seconds in current_app.extensions['boot_timings'].items()
+        ]),
+        ('transaction_history_cache_hits_total', 'counter', 'History cache hits', [({}, cache['hits'])]),
+        ('transaction_history_cache_misses_total', 'counter', 'History cache misses', [({}, cache['misses'])]),
+        ('webhook_queue_depth', 'gauge', 'Webhook events waiting or in progress', [({}, queue['depth'])]),
+        ('webhook_queue_lag_seconds', 'gauge', 'Age of the oldest unprocessed webhook event', [({}, queue['lag_seconds'])]),
+        ('webhook_events_failed', 'gauge', 'Webhook events that exhausted their retries', [({}, queue['failed'])]),
+        ('password_hash_rejected_total', 'counter', 'Password hashes rejected because the pool was saturated', [({}, hashing['rejected'])]),
+        ('http_response_compressed_bytes_in_total', 'counter', 'Response bytes before compression', [({}, compression['bytes_in'])]),
+        ('http_response_compressed_bytes_out_total', 'counter', 'Response bytes after compression', [({}, compression['bytes_out'])]),
+        ('rate_limit_rejected_total', 'counter', 'Requests rejected by rate limits', [
+            ({'rule': rule, 'key': key}, count) for (rule, key), count in sorted(rate_limiter.rejected.items())
+        ]),
+        ('password_rehash_total', 'counter', 'Passwords upgraded to the current hash method on login', [({}, hashing['rehashed'])]),
+        ('transaction_event_subscribers', 'gauge', 'Open Server-Sent Events streams', [({}, events['subscribers'])]),
+        ('transaction_events_published_total', 'counter', 'Transaction change events published', [({}, events['published'])]),
+        ('transaction_event_overflows_total', 'counter', 'Events dropped because a subscriber buffer was full', [({}, events['dropped'])]),
+        ('reconciliation_runs_total', 'counter', 'Bank statements imported', [({}, reconciliation['runs'])]),
+        ('reconciliation_approved_total', 'counter', 'Offline payments approved from bank statements', [({}, reconciliation['approved'])]),
+        ('scheduler_job_runs_total', 'counter', 'Scheduled job runs in this process', [
+            ({'job': name, 'status': status}, count) for (name, status), count in sorted(job_scheduler.runs.items())
+        ]),
+        ('scheduler_job_rows_processed_total', 'counter', 'Rows processed by scheduled jobs', [
+            ({'job': name}, count) for name, count in sorted(jobs['rows'].items())
+        ]),
+        ('scheduler_job_last_run_rows', 'gauge', 'Rows processed by the last run of each job', [
+            ({'job': name}, run['rows_processed']) for name, run in sorted(jobs['last_runs'].items())
+        ]),
+        ('scheduler_job_last_run_seconds', 'gauge', 'Duration of the last run of each job', [
+            ({'job': name}, run['seconds']) for name, run in sorted(jobs['last_runs'].items())
+        ]),
+    ]
+
+# Schema management commands: flask db upgrade | downgrade | current | check-plans
+# (set AUTO_MIGRATE=false so creating the app does not upgrade before the command runs)
+db_cli = AppGroup('db')
+
+@db_cli.command('upgrade')
+@click.option('--revision', type=int, default=None)
+def db_upgrade(revision):
+    migrations.upgrade(db.engine, target=revision)
+
+@db_cli.command('downgrade')
+@click.argument('revision', type=int)
+def db_downgrade(revision):
+    migrations.downgrade(db.engine, target=revision)
+
+@db_cli.command('current')
+def db_current():
+    print(migrations.current_revision(db.engine))
+
+@db_cli.command('check-plans')
+def db_check_plans():
+    failed = False
+    for name, ok, plan in check_query_plans(db.engine):
+        print(f"{'OK  ' if ok else 'FAIL'} {name}: {' | '.join(plan)}")
+        failed = failed or not ok
+    if failed:
+        raise SystemExit(1)
+
+# Reporting commands: flask reports backfill
+reports_cli = AppGroup('reports')
+
+@reports_cli.command('backfill')
+def reports_backfill():
+    counts = rebuild_rollups()
+    print(f"Rebuilt {counts['daily_sales']} daily_sales and {counts['daily_product_sales']} daily_product_sales rows")
+
+# Webhook queue commands: flask webhooks work | drain
+webhooks_cli = AppGroup('webhooks')
+
+@webhooks_cli.command('work')
+@click.option('--workers', type=int, default=None)
+def webhooks_work(workers):
+    webhook_queue.start(workers)
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        webhook_queue.stop()
+
+@webhooks_cli.command('drain')
+def webhooks_drain():
+    print(f"Processed {webhook_queue.drain()} webhook events")
+
+# Full-text search commands: flask search rebuild
+search_cli = AppGroup('search')
+
+@search_cli.command('rebuild')
+def search_rebuild():
+    with db.engine.begin() as connection:
+        print(f"Indexed {rebuild_search_index(connection)} transactions")
+
+# Retention commands: flask archive run | stats
+archive_cli = AppGroup('archive')
+
+@archive_cli.command('run')
+@click.option('--older-than-days', type=int, default=None)
+@click.option('--batch-size', type=int, default=None)
+def archive_run(older_than_days, batch_size):
+    result = transaction_archiver.run(older_than_days=older_than_days, batch_size=batch_size)
+    print(f"Archived {result['archived']} transactions of {result['users']} users created before {result['cutoff']} "
+          f"in {result['batches']} batches")
+
+@archive_cli.command('stats')
+def archive_stats():
+    for key, value in transaction_archiver.stats().items():
+        print(f'{key}: {value}')
+
+# Bank statement import: flask reconcile import STATEMENT [--format csv|mt940] [--dry-run]
+reconcile_cli = AppGroup('reconcile')
+
+@reconcile_cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'statement_format', type=click.Choice(['csv', 'mt940']), default=None)
+@click.option('--encoding', default='utf-8-sig')
+@click.option('--dry-run', is_flag=True)
+def reconcile_import(path, statement_format, encoding, dry_run):
+    with open(path, 'rb') as stream:
+        statement_format, entries = read_statement(stream, statement_format, encoding)
+        result = statement_reconciler.reconcile(entries, dry_run=dry_run, statement_format=statement_format)
+    print(f"Read {result['entries']} {result['format']} entries against {result['pending_indexed']} pending payments "
+          f"in {result['seconds']} s")
+    for outcome, count in sorted(result['outcomes'].items()):
+        print(f'{outcome}: {count}')
+    for entry in result['review']:
+        print(f"line {entry['line']}: {entry['outcome']} {entry['amount_minor']} {entry['transfer_title'] or ''} {entry['description']}")
+
+# Background jobs: flask jobs list | run NAME [--force] | history [NAME] | scheduler
+jobs_cli = AppGroup('jobs')
+
+@jobs_cli.command('list')
+def jobs_list():
+    for name, job in job_scheduler.jobs.items():
+        print(f'{name}: every {job.interval} s, last finished {job_scheduler.last_finished(name) or "never"}')
+
+@jobs_cli.command('run')
+@click.argument('name')
+@click.option('--force', is_flag=True, help='Run even if the job ran within its interval')
+def jobs_run(name, force):
+    if name not in job_scheduler.jobs:
+        raise click.BadParameter(f'Unknown job {name}')
+    result = job_scheduler.run_job(name, force=force)
+    if result is None:
+        print(f'{name} is running in another process or ran recently (use --force)')
+    else:
+        print(f"{name} {result['status']}: {result['rows_processed']} rows in {result['batches']} batches, {result['seconds']} s")
+
+@jobs_cli.command('history')
+@click.argument('name', required=False)
+@click.option('--limit', type=int, default=20)
+def jobs_history(name, limit):
+    for run in job_scheduler.recent_runs(name, limit):
+        print(f'{run.started_at:%Y-%m-%d %H:%M:%S} {run.job} {run.status} rows={run.rows_processed} '
+              f'batches={run.batches} owner={run.owner}{" error=" + run.error if run.error else ""}')
+
+@jobs_cli.command('scheduler')
+def jobs_scheduler():
+    # Foreground scheduler for deployments that keep it out of the web workers
+    job_scheduler.start()
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        job_scheduler.stop()
 
 # Helper function to create JWT token
-def generate_token(user_id):
-    payload = {
-        'user_id': user_id,
-        'exp': datetime.now(timezone.utc) + timedelta(hours=app.config['JWT_EXPIRATION_HOURS'])
-    }
-    token = jwt.encode(payload, app.config['JWT_SECRET'], algorithm='HS256')
-    return token
+def generate_token(user):
+    return token_auth.issue(user)
 
 # Registration endpoint
-@app.route('/api/register', methods=['POST'])
+@api.route('/api/register', methods=['POST'])
+@rate_limiter.limit('register')
 def register():
     data = request.get_json()
     
@@ -92,7 +433,7 @@ def register():
         return jsonify({'message': 'Email już istnieje w bazie danych'}), 409
     
     # Create new user
-    hashed_password = generate_password_hash(data['password'])
+    hashed_password = password_hasher.hash(data['password'])
     new_user = User(
         username=data['username'],
         email=data['email'],
@@ -106,7 +447,7 @@ def register():
     login_user(new_user)
     
     # Generate JWT token
-    token = generate_token(new_user.id)
+    token = generate_token(new_user)
     
     # Create response data
     response_data = {
@@ -122,24 +463,31 @@ def register():
     
     # Create response with token in cookie
     response = jsonify(response_data)
-    response.set_cookie('session_data', jwt.encode(response_data, app.config['JWT_SECRET'], algorithm='HS256'), 
-                        httponly=False, secure=False, samesite='Lax', max_age=app.config['JWT_EXPIRATION_HOURS'] * 3600)
+    response.set_cookie('session_data', jwt.encode(response_data, current_app.config['JWT_SECRET'], algorithm='HS256'), 
+                        httponly=False, secure=False, samesite='Lax', max_age=current_app.config['JWT_EXPIRATION_HOURS'] * 3600)
     
     return response, 201
 
 # Login endpoint
-@app.route('/api/login', methods=['POST'])
+@api.route('/api/login', methods=['POST'])
+@rate_limiter.limit('login')
 def login():
     data = request.get_json()
     user = User.query.filter_by(username=data['username']).first()
     
-    if not user or not check_password_hash(user.password, data['password']):
+    if not user or not password_hasher.verify(user.password, data['password']):
         return jsonify({'message': 'Nieprawidłowa nazwa użytkownika lub hasło'}), 401
+
+    # Upgrade hashes created with an older method while the plaintext is at hand
+    if password_hasher.needs_rehash(user.password):
+        user.password = password_hasher.hash(data['password'])
+        db.session.commit()
+        password_hasher.record_rehash()
     
     login_user(user)
     
     # Generate JWT token
-    token = generate_token(user.id)
+    token = generate_token(user)
     
     # Create response data
     response_data = {
@@ -155,24 +503,25 @@ def login():
     
     # Create response with token in cookie
     response = jsonify(response_data)
-    response.set_cookie('session_data', jwt.encode(response_data, app.config['JWT_SECRET'], algorithm='HS256'), 
-                        httponly=False, secure=False, samesite='Lax', max_age=app.config['JWT_EXPIRATION_HOURS'] * 3600)
+    response.set_cookie('session_data', jwt.encode(response_data, current_app.config['JWT_SECRET'], algorithm='HS256'), 
+                        httponly=False, secure=False, samesite='Lax', max_age=current_app.config['JWT_EXPIRATION_HOURS'] * 3600)
     
     return response, 200
 
 # Google OAuth login
-@app.route('/api/login/google')
+@api.route('/api/login/google')
 def google_login():
     # Generate and store a nonce in the session
     session['google_auth_nonce'] = os.urandom(16).hex()
-    redirect_uri = url_for('google_authorize', _external=True)
-    return google.authorize_redirect(
+    redirect_uri = url_for('.google_authorize', _external=True)
+    return oauth_clients.client('google').authorize_redirect(
         redirect_uri, 
         nonce=session['google_auth_nonce']
     )
 
-@app.route('/api/login/google/callback')
+@api.route('/api/login/google/callback')
 def google_authorize():
+    google = oauth_clients.client('google')
     token = google.authorize_access_token()
     # Retrieve the nonce from the session
     nonce = session.pop('google_auth_nonce', None)
@@ -186,7 +535,7 @@ def google_authorize():
         user = User(
             username=user_info.get('name', user_info['email']),
             email=user_info['email'],
-            password=generate_password_hash(os.urandom(24).hex()),
+            password=password_hasher.hash(os.urandom(24).hex()),
             auth_method='google'
         )
         db.session.add(user)
@@ -195,7 +544,7 @@ def google_authorize():
     login_user(user)
     
     # Generate JWT token
-    token = generate_token(user.id)
+    token = generate_token(user)
     
     # Return JSON response with token and user info
     response_data = {
@@ -213,8 +562,8 @@ def google_authorize():
     frontend_url = "http://localhost:5173"
     
     # Set cookie with proper JSON and correctly encoded JWT
-    cookie_value = jwt.encode(response_data, app.config['JWT_SECRET'], algorithm='HS256')
-    max_age = app.config['JWT_EXPIRATION_HOURS'] * 3600
+    cookie_value = jwt.encode(response_data, current_app.config['JWT_SECRET'], algorithm='HS256')
+    max_age = current_app.config['JWT_EXPIRATION_HOURS'] * 3600
     
     response = redirect(f"{frontend_url}/login")
     response.set_cookie('session_data', cookie_value, 
@@ -223,13 +572,14 @@ def google_authorize():
     return response
 
 # GitHub OAuth login
-@app.route('/api/login/github')
+@api.route('/api/login/github')
 def github_login():
-    redirect_uri = url_for('github_authorize', _external=True)
-    return github.authorize_redirect(redirect_uri)
+    redirect_uri = url_for('.github_authorize', _external=True)
+    return oauth_clients.client('github').authorize_redirect(redirect_uri)
 
-@app.route('/api/login/github/callback')
+@api.route('/api/login/github/callback')
 def github_authorize():
+    github = oauth_clients.client('github')
     token = github.authorize_access_token()
     
     # Get user profile information
@@ -275,7 +625,7 @@ def github_authorize():
         user = User(
             username=username,
             email=email,  # Now we have a valid email
-            password=generate_password_hash(os.urandom(24).hex()),
+            password=password_hasher.hash(os.urandom(24).hex()),
             auth_method='github'
         )
         db.session.add(user)
@@ -284,7 +634,7 @@ def github_authorize():
     login_user(user)
     
     # Generate JWT token
-    token = generate_token(user.id)
+    token = generate_token(user)
     
     # Create response data
     response_data = {
@@ -302,8 +652,8 @@ def github_authorize():
     frontend_url = "http://localhost:5173"
     
     # Set cookie with proper JSON and correctly encoded JWT
-    cookie_value = jwt.encode(response_data, app.config['JWT_SECRET'], algorithm='HS256')
-    max_age = app.config['JWT_EXPIRATION_HOURS'] * 3600
+    cookie_value = jwt.encode(response_data, current_app.config['JWT_SECRET'], algorithm='HS256')
+    max_age = current_app.config['JWT_EXPIRATION_HOURS'] * 3600
     
     response = redirect(f"{frontend_url}/login")
     response.set_cookie('session_data', cookie_value, 
@@ -312,7 +662,7 @@ def github_authorize():
     return response
 
 # Logout endpoint
-@app.route('/api/logout', methods=['POST'])
+@api.route('/api/logout', methods=['POST'])
 @login_required
 def logout():
     logout_user()
@@ -320,6 +670,16 @@ def logout():
     response.delete_cookie('session_data')  # Clear the session cookie
     return response, 200
 
+# Invalidate every token issued to the current user (log out everywhere)
+@api.route('/api/tokens/revoke', methods=['POST'])
+@login_required
+def revoke_tokens():
+    token_auth.revoke_user_tokens(current_user.id)
+    logout_user()
+    response = jsonify({'message': 'Tokens revoked'})
+    response.delete_cookie('session_data')
+    return response, 200
+
 # Admin role required decorator
 def admin_required(f):
     @wraps(f)
@@ -330,50 +690,139 @@ def admin_required(f):
     return decorated_function
 
 # Get user info endpoint
-@app.route('/api/user', methods=['GET'])
+@api.route('/api/user', methods=['GET'])
 @login_required
 def get_user():
-    return jsonify({
-        'user': {
-            'id': current_user.id,
-            'username': current_user.username,
-            'email': current_user.email,
-            'auth_method': current_user.auth_method,
-            'is_admin': current_user.is_admin
-        }
-    }), 200
+    user = {
+        'id': current_user.id,
+        'username': current_user.username,
+        'email': current_user.email,
+        'auth_method': current_user.auth_method,
+        'is_admin': current_user.is_admin
+    }
+    etag = make_etag('user', *user.values())
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    return add_validators(jsonify({'user': user}), etag), 200
 
-@app.route('/api/create-offline-payment', methods=['POST'])
+@api.route('/api/create-offline-payment', methods=['POST'])
 @login_required
 def create_offline_payment():
     return TransactionController.create_offline_payment()
 
-@app.route('/api/transactions', methods=['GET'])
+@api.route('/api/create-offline-payments/bulk', methods=['POST'])
+@login_required
+def create_offline_payments_bulk():
+    return TransactionController.create_offline_payments_bulk()
+
+@api.route('/api/products', methods=['GET'])
+def get_products():
+    return ProductController.get_products()
+
+@api.route('/api/admin/products', methods=['POST'])
+@login_required
+@admin_required
+def create_product():
+    return ProductController.create_product()
+
+@api.route('/api/admin/products/<int:product_id>', methods=['PUT'])
+@login_required
+@admin_required
+def update_product(product_id):
+    return ProductController.update_product(product_id)
+
+@api.route('/api/events', methods=['GET'])
+def transaction_events_stream():
+    return EventController.stream_transaction_events()
+
+@api.route('/api/transactions', methods=['GET'])
 @login_required
 def get_user_transactions():
     return TransactionController.get_user_transactions()
 
-@app.route('/api/admin/transactions', methods=['GET'])
+@api.route('/api/admin/transactions', methods=['GET'])
 @login_required
 @admin_required
 def get_all_transactions():
     return TransactionController.get_all_transactions()
 
-@app.route('/api/admin/transactions/<int:transaction_id>', methods=['PUT'])
+@api.route('/api/admin/transactions/export', methods=['GET'])
+@login_required
+@admin_required
+def export_transactions():
+    return ExportController.export_transactions()
+
+@api.route('/api/admin/transactions/search', methods=['GET'])
+@login_required
+@admin_required
+def search_transactions():
+    return TransactionController.search_transactions()
+
+@api.route('/api/admin/transactions/status', methods=['POST'])
+@login_required
+@admin_required
+def update_transaction_statuses_bulk():
+    return TransactionController.update_transaction_statuses_bulk()
+
+@api.route('/api/admin/reconciliation', methods=['POST'])
+@login_required
+@admin_required
+def import_bank_statement():
+    return ReconciliationController.import_statement()
+
+@api.route('/api/admin/transactions/<int:transaction_id>', methods=['PUT'])
 @login_required
 @admin_required
 def update_transaction_status(transaction_id):
     return TransactionController.update_transaction_status(transaction_id)
 
-@app.route('/api/create-checkout-session', methods=['POST'])
+@api.route('/api/admin/reports/totals', methods=['GET'])
 @login_required
+@admin_required
+def get_report_totals():
+    return ReportController.get_totals()
+
+@api.route('/api/admin/reports/daily', methods=['GET'])
+@login_required
+@admin_required
+def get_daily_sales_report():
+    return ReportController.get_daily_sales()
+
+@api.route('/api/admin/reports/products', methods=['GET'])
+@login_required
+@admin_required
+def get_product_sales_report():
+    return ReportController.get_product_sales()
+
+@api.route('/api/admin/cache/stats', methods=['GET'])
+@login_required
+@admin_required
+def get_cache_stats():
+    return jsonify({'transaction_history': history_cache.stats(), 'product_catalog': product_catalog.stats()}), 200
+
+@api.route('/api/create-checkout-session', methods=['POST'])
+@login_required
+@rate_limiter.limit('checkout')
 def create_checkout_session():
     try:
         data = request.json
-        line_items = data.get('lineItems', [])
-        success_url = data.get('successUrl', f"{client_url}/sklep?success=true")
-        cancel_url = data.get('cancelUrl', f"{client_url}/sklep?canceled=true")
-        checkout_session = stripe.checkout.Session.create(
+        try:
+            items, currency, _ = parse_line_items(data.get('lineItems', []))
+        except (ValueError, TypeError, AttributeError) as e:
+            return jsonify({'error': str(e)}), 400
+        # Stripe gets catalog prices, never the amounts sent by the browser
+        line_items = [{
+            'price_data': {
+                'currency': currency.lower(),
+                'unit_amount': item['unit_price_minor'],
+                'product_data': {'name': item['product_name']}
+            },
+            'quantity': item['quantity']
+        } for item in items]
+        success_url = data.get('successUrl', f"{current_app.config['CLIENT_URL']}/sklep?success=true")
+        cancel_url = data.get('cancelUrl', f"{current_app.config['CLIENT_URL']}/sklep?canceled=true")
+        checkout_session = get_stripe().checkout.Session.create(
             payment_method_types=['card'],
             line_items=line_items,
             mode='payment',
@@ -390,61 +839,59 @@ def create_checkout_session():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/webhook', methods=['POST'])
+@api.route('/api/webhook', methods=['POST'])
 def webhook():
     event = None
     payload = request.data
     sig_header = request.headers.get('Stripe-Signature')
-    print("payload:", payload)
+    stripe = get_stripe()
 
     try:
         event = stripe.Webhook.construct_event(
-            payload, sig_header, stripe_webhook_secret
+            payload, sig_header, current_app.config['STRIPE_WEBHOOK_SECRET']
         )
     except ValueError as e:
         # Invalid payload
-        print("Invalid payload:", e)
+        current_app.logger.warning("Invalid webhook payload: %s", e)
         return jsonify({'error': 'Invalid payload'}), 400
     except stripe.error.SignatureVerificationError as e:
         # Invalid signature
-        print("Invalid signature:", e)
+        current_app.logger.warning("Invalid webhook signature: %s", e)
         return jsonify({'error': 'Invalid signature'}), 400
 
-    # Handle the event
-    if event['type'] == 'checkout.session.completed':
-        session = event['data']['object']
-        
-        # Extract metadata
-        user_id = session.get('metadata', {}).get('user_id')
-        payment_status = session.get('payment_status')
-        amount_total = session.get('amount_total', 0) / 100  # Convert from cents to PLN
-        
-        # Log payment details
-        print(f"Payment completed for user {user_id}")
-        print(f"Payment status: {payment_status}")
-        print(f"Amount: {amount_total} PLN")
-        
-        return jsonify({'status': 'success', 'message': 'Payment processed successfully'}), 200
-    elif event['type'] == 'checkout.session.async_payment_succeeded':
-        session = event['data']['object']
-        print(f"Async payment succeeded for session {session.get('id')}")
-        return jsonify({'status': 'success', 'message': 'Async payment succeeded'}), 200
-    elif event['type'] == 'checkout.session.async_payment_failed':
-        session = event['data']['object']
-        print(f"Async payment failed for session {session.get('id')}")
-        return jsonify({'status': 'failed', 'message': 'Async payment failed'}), 200
-    elif event['type'] == 'payment_intent.created':
-        payment_intent = event['data']['object']
-        print(f"Payment intent created: {payment_intent.get('id')}")
-        return jsonify({'status': 'success', 'message': 'Payment intent created'}), 200
-    elif event['type'] == 'charge.updated':
-        charge = event['data']['object']
-        print(f"Charge updated: {charge.get('id')}")
-        return jsonify({'status': 'success', 'message': 'Charge updated'}), 200
-    else:
-        print(f"Unhandled event type: {event['type']}")
-    
-    return jsonify({'status': 'received', 'type': event['type']}), 200
+    # Only events we act on are stored; processing happens in the webhook workers
+    if event['type'] not in EVENT_HANDLERS:
+        return jsonify({'status': 'ignored', 'type': event['type']}), 200
+
+    queued = webhook_queue.enqueue(event['id'], event['type'], payload.decode('utf-8'))
+
+    return jsonify({'status': 'queued' if queued else 'duplicate', 'type': event['type']}), 200
+
+@api.route('/api/admin/webhooks/metrics', methods=['GET'])
+@login_required
+@admin_required
+def get_webhook_metrics():
+    return jsonify({'webhooks': webhook_queue.metrics()}), 200
+
+@api.route('/api/admin/jobs', methods=['GET'])
+@login_required
+@admin_required
+def get_job_runs():
+    runs = job_scheduler.recent_runs(request.args.get('job'), min(request.args.get('limit', 50, type=int), 500))
+    return jsonify({
+        'scheduler': job_scheduler.stats(),
+        'runs': [{
+            'id': run.id,
+            'job': run.job,
+            'owner': run.owner,
+            'status': run.status,
+            'started_at': run.started_at.isoformat(),
+            'finished_at': run.finished_at.isoformat() if run.finished_at else None,
+            'rows_processed': run.rows_processed,
+            'batches': run.batches,
+            'error': run.error
+        } for run in runs]
+    }), 200
 
 def create_admin_accout():
     admin_username = os.environ.get('ADMIN_USERNAME')
@@ -459,7 +906,7 @@ def create_admin_accout():
         print(f"Admin user with email {admin_email} already exists.")
         return
     
-    hashed_password = generate_password_hash(admin_password)
+    hashed_password = password_hasher.hash(admin_password)
     admin_user = User(
         username=admin_username,
         email=admin_email,
@@ -471,8 +918,15 @@ def create_admin_accout():
     db.session.add(admin_user)
     db.session.commit()
 
+import_seconds = time.perf_counter() - _import_started
+
 if __name__ == '__main__':
+    app = create_app()
     with app.app_context():
-        db.create_all()
         create_admin_accout()
+    # With the reloader active only the child process serves requests
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        webhook_queue.for_app(app).start()
+        if app.config['SCHEDULER_ENABLED']:
+            job_scheduler.for_app(app).start()
     app.run(debug=True)
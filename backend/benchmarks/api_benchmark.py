@@ -0,0 +1,270 @@
+"""Reproducible load test for the Flask API.
+
+Seeds a synthetic SQLite database, drives the main endpoints through the WSGI app
+at a fixed concurrency and reports latency percentiles, throughput and SQL
+statements per request. Results can be saved as a baseline and later runs compared
+against it to catch regressions.
+
+    python -m benchmarks.api_benchmark --users 500 --transactions 20000 --concurrency 8
+    python -m benchmarks.api_benchmark --save-baseline benchmarks/baseline.json
+    python -m benchmarks.api_benchmark --baseline benchmarks/baseline.json
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WEBHOOK_SECRET = 'whsec_benchmark'
+PASSWORD = 'benchmark-password'
+PRODUCTS = [('Kubek', 2999), ('Plakat', 1999), ('Podkładka pod myszkę', 2000), ('Koszulka', 5999)]
+STATUSES = ['pending', 'approved', 'cancelled']
+
+def load_app(database_path):
+    from app import create_app
+    return create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database_path}',
+        'STRIPE_WEBHOOK_SECRET': WEBHOOK_SECRET,
+        'AUTO_MIGRATE': True,
+        # Every simulated client shares one IP; throttling would measure the limiter instead
+        'RATE_LIMIT_ENABLED': False,
+    })
+
+def seed(app, users, transactions, items_per_transaction, seed_value):
+    from sqlalchemy import insert
+    from werkzeug.security import generate_password_hash
+    from models.models import db, User, Transaction, TransactionItem
+    from services.reporting import rebuild_rollups
+
+    rng = random.Random(seed_value)
+    password = generate_password_hash(PASSWORD)
+    now = datetime.utcnow()
+
+    with app.app_context():
+        db.session.execute(insert(User), [{
+            'username': f'user{i}', 'email': f'user{i}@example.com', 'password': password,
+            'auth_method': 'local', 'created_at': now, 'is_admin': i == 1, 'token_version': 0
+        } for i in range(1, users + 1)])
+
+        batch = 5000
+        for start in range(0, transactions, batch):
+            count = min(batch, transactions - start)
+            rows, item_rows = [], []
+            for offset in range(count):
+                transaction_id = start + offset + 1
+                created_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+                products = [rng.choice(PRODUCTS) for _ in range(items_per_transaction)]
+                quantities = [rng.randint(1, 3) for _ in products]
+                rows.append({
+                    'id': transaction_id, 'user_id': rng.randint(1, users),
+                    'amount_minor': sum(price * quantity for (_, price), quantity in zip(products, quantities)),
+                    'currency': 'PLN', 'payment_method': rng.choice(['offline', 'stripe']),
+                    'status': rng.choice(STATUSES), 'created_at': created_at, 'updated_at': created_at,
+                    'transfer_title': f'PAYMENT-{transaction_id:08X}'
+                })
+                item_rows.extend({
+                    'transaction_id': transaction_id, 'product_name': name,
+                    'unit_price_minor': price, 'quantity': quantity
+                } for (name, price), quantity in zip(products, quantities))
+            db.session.execute(insert(Transaction), rows)
+            db.session.execute(insert(TransactionItem), item_rows)
+            db.session.commit()
+
+        rebuild_rollups()
+
+class QueryCounter:
+    # Counts SQL statements issued by the current thread
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self._local = threading.local()
+        event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self._local.count = getattr(self._local, 'count', 0) + 1
+
+    def reset(self):
+        self._local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self._local, 'count', 0)
+
+class Session:
+    # One logged-in test client per worker thread
+    def __init__(self, app, user_index, users):
+        self.client = app.test_client()
+        self.username = f'user{user_index}'
+        self.users = users
+        self.catalog_etag = None
+        response = self.client.post('/api/login', json={'username': self.username, 'password': PASSWORD})
+        assert response.status_code == 200, response.data
+
+def scenario_login(session):
+    return session.client.post('/api/login', json={'username': session.username, 'password': PASSWORD})
+
+def scenario_transactions(session):
+    return session.client.get('/api/transactions')
+
+def scenario_admin_transactions(session):
+    return session.client.get('/api/admin/transactions?limit=50')
+
+def scenario_create_offline_payment(session):
+    # Catalog products seeded by migration 0007
+    return session.client.post('/api/create-offline-payment', json={'lineItems': [{
+        'product_id': random.randint(1, 3), 'quantity': random.randint(1, 3)
+    }]})
+
+def scenario_products(session):
+    response = session.client.get('/api/products', headers={'If-None-Match': session.catalog_etag or ''})
+    session.catalog_etag = response.headers.get('ETag', '').strip('"') or session.catalog_etag
+    return response
+
+def scenario_search(session):
+    # Admin lookup by customer name, as typed into the panel's search box
+    return session.client.get(f'/api/admin/transactions/search?q=user{random.randint(1, session.users)}&limit=50')
+
+def scenario_webhook(session):
+    from benchmarks.fake_stripe import checkout_completed_event, signed_request
+    event = checkout_completed_event(random.randint(1, session.users), [random.choice(PRODUCTS) + (1,)])
+    payload, headers = signed_request(event, WEBHOOK_SECRET)
+    return session.client.post('/api/webhook', data=payload, headers=headers)
+
+# name -> (request function, needs admin session)
+SCENARIOS = {
+    'login': (scenario_login, False),
+    'transactions': (scenario_transactions, False),
+    'admin_transactions': (scenario_admin_transactions, True),
+    'create_offline_payment': (scenario_create_offline_payment, False),
+    'products': (scenario_products, False),
+    'search': (scenario_search, True),
+    'webhook': (scenario_webhook, False),
+}
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def run_scenario(app, counter, name, requests, concurrency, users):
+    function, admin = SCENARIOS[name]
+    sessions = [Session(app, 1 if admin else random.randint(2, users), users) for _ in range(concurrency)]
+    latencies, queries, errors = [], [], [0]
+    lock = threading.Lock()
+    per_worker = [requests // concurrency + (1 if i < requests % concurrency else 0) for i in range(concurrency)]
+
+    def worker(index):
+        session = sessions[index]
+        for _ in range(per_worker[index]):
+            counter.reset()
+            started = time.perf_counter()
+            response = function(session)
+            elapsed = time.perf_counter() - started
+            with lock:
+                latencies.append(elapsed)
+                queries.append(counter.count)
+                if response.status_code >= 400:
+                    errors[0] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(worker, range(concurrency)))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors[0],
+        'throughput_rps': round(len(latencies) / wall, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'queries_per_request': round(sum(queries) / len(queries), 2) if queries else 0.0,
+    }
+
+def compare(results, baseline, tolerance):
+    # Latency may drift by `tolerance` (machines differ); query counts must not grow
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get('results', {}).get(name)
+        if not reference:
+            continue
+        if result['p95_ms'] > reference['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {result['p95_ms']}ms > baseline {reference['p95_ms']}ms")
+        if result['queries_per_request'] > reference['queries_per_request'] + 0.5:
+            regressions.append(f"{name}: {result['queries_per_request']} queries/request > baseline {reference['queries_per_request']}")
+        if result['errors'] > reference['errors']:
+            regressions.append(f"{name}: {result['errors']} errors > baseline {reference['errors']}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--transactions', type=int, default=10000)
+    parser.add_argument('--items', type=int, default=3, help='items per seeded transaction')
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--endpoints', default=','.join(SCENARIOS))
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write results as JSON')
+    parser.add_argument('--save-baseline', help='write results as the new baseline')
+    parser.add_argument('--baseline', help='compare against a baseline and exit 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p95 increase over baseline')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    database_path = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    app = load_app(database_path)
+
+    seed_started = time.perf_counter()
+    seed(app, args.users, args.transactions, args.items, args.seed)
+    print(f'Seeded {args.users} users, {args.transactions} transactions in {time.perf_counter() - seed_started:.1f}s')
+
+    with app.app_context():
+        from models.models import db
+        counter = QueryCounter(db.engine)
+
+    from services.webhook_queue import webhook_queue
+    webhook_queue.for_app(app).start()
+    results = {}
+    try:
+        for name in args.endpoints.split(','):
+            results[name] = run_scenario(app, counter, name, args.requests, args.concurrency, args.users)
+    finally:
+        webhook_queue.for_app(app).stop()
+
+    print(f"{'endpoint':24} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'errors':>7}")
+    for name, result in results.items():
+        print(f"{name:24} {result['throughput_rps']:8.1f} {result['p50_ms']:8.2f} {result['p95_ms']:8.2f} "
+              f"{result['p99_ms']:8.2f} {result['queries_per_request']:8.2f} {result['errors']:7d}")
+
+    report = {
+        'parameters': {key: getattr(args, key) for key in ('users', 'transactions', 'items', 'requests', 'concurrency', 'seed')},
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(report, output, indent=2)
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as output:
+            json.dump(report, output, indent=2)
+        print(f'Baseline written to {args.save_baseline}')
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            sys.exit(1)
+        print('No regressions against baseline')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""Import and create_app() time, measured in fresh interpreters.
+
+Each run starts a new Python process, imports the app module and builds apps
+with create_app() under a few schema settings, then reports medians. A second
+create_app() in the same process shows the cost of an extra test app.
+
+    python -m benchmarks.boot_benchmark --runs 10
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r'''
+import json, sys, time
+started = time.perf_counter()
+import app as app_module
+imported = time.perf_counter() - started
+config = json.loads(sys.argv[1])
+started = time.perf_counter()
+app_module.create_app(config)
+first = time.perf_counter() - started
+started = time.perf_counter()
+app_module.create_app(config)
+second = time.perf_counter() - started
+print(json.dumps({'import': imported, 'create_app': first, 'second_create_app': second,
+                  'heavy_modules': sorted(name for name in ('stripe', 'authlib') if name in sys.modules)}))
+'''
+
+def probe(config):
+    env = {**os.environ, 'RATE_LIMIT_ENABLED': 'false'}
+    output = subprocess.run([sys.executable, '-c', PROBE, json.dumps(config)], cwd=BACKEND, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    database_path = os.path.join(tempfile.mkdtemp(), 'boot.db')
+    scenarios = {
+        'migrated db, AUTO_MIGRATE': {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database_path}', 'AUTO_MIGRATE': True},
+        'no schema step': {'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database_path}', 'AUTO_MIGRATE': False},
+        'in-memory, CREATE_SCHEMA': {'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'AUTO_MIGRATE': False, 'CREATE_SCHEMA': True},
+    }
+    # Migrate once up front so the first scenario measures the no-op check only
+    probe(scenarios['migrated db, AUTO_MIGRATE'])
+
+    print(f"{'scenario':28} {'import ms':>10} {'create_app ms':>14} {'2nd app ms':>11}  lazily skipped")
+    for name, config in scenarios.items():
+        results = [probe(config) for _ in range(args.runs)]
+        medians = {key: statistics.median(result[key] for result in results) * 1000
+                   for key in ('import', 'create_app', 'second_create_app')}
+        skipped = {'stripe', 'authlib'} - set(results[0]['heavy_modules'])
+        print(f"{name:28} {medians['import']:10.1f} {medians['create_app']:14.1f} "
+              f"{medians['second_create_app']:11.1f}  {', '.join(sorted(skipped)) or '-'}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""Local stand-in for Stripe webhook deliveries and the Stripe API.
+
+Builds checkout events shaped like Stripe's, signs them with STRIPE_WEBHOOK_SECRET
+and posts them, replaying a share of them to mimic Stripe retry storms. With
+--serve-api it instead runs a fake Stripe API (Checkout Session creation) with a
+configurable response latency; point the app at it with STRIPE_API_BASE.
+
+    python -m benchmarks.fake_stripe --url http://localhost:5000/api/webhook --count 500 --user-id 1
+    python -m benchmarks.fake_stripe --serve-api 12111 --latency 0.3
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import random
+import threading
+import time
+import uuid
+
+def sign_payload(payload, secret, timestamp=None):
+    # Same scheme stripe.Webhook.construct_event verifies: v1 = HMAC-SHA256("{t}.{payload}")
+    timestamp = int(timestamp or time.time())
+    signature = hmac.new(secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={signature}'
+
+def _event(event_type, data_object):
+    return {
+        'id': f'evt_{uuid.uuid4().hex[:24]}',
+        'object': 'event',
+        'api_version': '2023-10-16',
+        'created': int(time.time()),
+        'type': event_type,
+        'data': {'object': data_object}
+    }
+
+def checkout_completed_event(user_id, products, paid=True, session_id=None):
+    # products: [(name, unit_amount, quantity)]
+    line_items = [{
+        'id': f'li_{uuid.uuid4().hex[:24]}',
+        'object': 'item',
+        'description': name,
+        'quantity': quantity,
+        'amount_total': unit_amount * quantity,
+        'price': {'unit_amount': unit_amount, 'currency': 'pln'}
+    } for name, unit_amount, quantity in products]
+    return _event('checkout.session.completed', {
+        'id': session_id or f'cs_test_{uuid.uuid4().hex[:24]}',
+        'object': 'checkout.session',
+        'amount_total': sum(item['amount_total'] for item in line_items),
+        'currency': 'pln',
+        'payment_status': 'paid' if paid else 'unpaid',
+        'metadata': {'user_id': str(user_id)},
+        'line_items': {'object': 'list', 'data': line_items}
+    })
+
+def async_payment_event(session_id, succeeded=True):
+    event_type = 'checkout.session.async_payment_succeeded' if succeeded else 'checkout.session.async_payment_failed'
+    return _event(event_type, {'id': session_id, 'object': 'checkout.session'})
+
+def signed_request(event, secret):
+    payload = json.dumps(event)
+    return payload, {'Content-Type': 'application/json', 'Stripe-Signature': sign_payload(payload, secret)}
+
+def random_checkout(user_id):
+    products = [('Kubek', 2999, 1), ('Plakat', 1999, 2), ('Podkładka pod myszkę', 2000, 1)]
+    return checkout_completed_event(user_id, random.sample(products, random.randint(1, len(products))))
+
+class FakeStripeAPI(ThreadingHTTPServer):
+    # Answers POST /v1/checkout/sessions after `latency` seconds, like a slow upstream
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.2):
+        self.latency = latency
+        self.sessions_created = 0
+        self._lock = threading.Lock()
+        super().__init__(('127.0.0.1', port), _FakeStripeHandler)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='fake-stripe-api', daemon=True).start()
+        return self
+
+class _FakeStripeHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.server.latency)
+        if self.path != '/v1/checkout/sessions':
+            return self._respond(404, {'error': {'type': 'invalid_request_error', 'message': f'Unknown path {self.path}'}})
+        with self.server._lock:
+            self.server.sessions_created += 1
+        session_id = f'cs_test_{uuid.uuid4().hex[:24]}'
+        self._respond(200, {
+            'id': session_id,
+            'object': 'checkout.session',
+            'mode': 'payment',
+            'payment_status': 'unpaid',
+            'url': f'https://checkout.stripe.test/c/pay/{session_id}'
+        })
+
+    def _respond(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('Request-Id', f'req_{uuid.uuid4().hex[:14]}')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+def main():
+    import requests
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:5000/api/webhook')
+    parser.add_argument('--count', type=int, default=100)
+    parser.add_argument('--user-id', type=int, default=1)
+    parser.add_argument('--duplicates', type=float, default=0.3, help='share of events delivered twice')
+    parser.add_argument('--secret', default=os.environ.get('STRIPE_WEBHOOK_SECRET', 'whsec_test'))
+    parser.add_argument('--serve-api', type=int, metavar='PORT', help='run the fake Stripe API instead')
+    parser.add_argument('--latency', type=float, default=0.2, help='fake API response delay in seconds')
+    args = parser.parse_args()
+
+    if args.serve_api is not None:
+        server = FakeStripeAPI(args.serve_api, args.latency)
+        print(f'Fake Stripe API on {server.url} (latency {args.latency}s)')
+        server.serve_forever()
+        return
+
+    statuses = {}
+    started = time.perf_counter()
+    for _ in range(args.count):
+        payload, headers = signed_request(random_checkout(args.user_id), args.secret)
+        deliveries = 2 if random.random() < args.duplicates else 1
+        for _ in range(deliveries):
+            response = requests.post(args.url, data=payload, headers=headers)
+            status = response.json().get('status', response.status_code)
+            statuses[status] = statuses.get(status, 0) + 1
+    elapsed = time.perf_counter() - started
+    total = sum(statuses.values())
+    print(f'{total} deliveries in {elapsed:.2f}s ({total / elapsed:.0f}/s): {statuses}')
+
+if __name__ == '__main__':
+    main()
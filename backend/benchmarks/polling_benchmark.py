@@ -0,0 +1,92 @@
+"""Admin panel polling: bandwidth and server CPU with and without HTTP caching.
+
+Polls /api/admin/transactions the way the admin panel does and compares plain
+responses, gzip/brotli compressed responses and conditional requests
+(If-None-Match -> 304). A status change is made every --change-every polls so
+conditional polling also pays for real refreshes.
+
+    python -m benchmarks.polling_benchmark --transactions 20000 --limit 500 --polls 200
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.api_benchmark import load_app, seed, Session
+
+# name -> (Accept-Encoding, send If-None-Match)
+MODES = {
+    'plain': ('identity', False),
+    'gzip': ('gzip', False),
+    'brotli': ('br', False),
+    'conditional': ('identity', True),
+    'conditional+brotli': ('br, gzip', True),
+}
+
+def run_mode(session, admin, url, encoding, conditional, polls, change_every, transaction_ids):
+    etag = None
+    sent_bytes = not_modified = 0
+    cpu_started = time.process_time()
+    wall_started = time.perf_counter()
+    for poll in range(polls):
+        if change_every and poll and poll % change_every == 0:
+            admin.client.put(f'/api/admin/transactions/{random.choice(transaction_ids)}',
+                             json={'status': random.choice(['pending', 'approved', 'cancelled'])})
+        headers = {'Accept-Encoding': encoding}
+        if conditional and etag:
+            headers['If-None-Match'] = etag
+        response = session.client.get(url, headers=headers)
+        assert response.status_code in (200, 304), response.status_code
+        etag = response.headers.get('ETag', etag)
+        not_modified += response.status_code == 304
+        sent_bytes += len(response.data)
+    return {
+        'kb_per_poll': round(sent_bytes / polls / 1024, 2),
+        'cpu_ms_per_poll': round((time.process_time() - cpu_started) / polls * 1000, 2),
+        'wall_ms_per_poll': round((time.perf_counter() - wall_started) / polls * 1000, 2),
+        'not_modified': not_modified,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--transactions', type=int, default=10000)
+    parser.add_argument('--items', type=int, default=3, help='items per seeded transaction')
+    parser.add_argument('--limit', type=int, default=500, help='page size polled by the panel')
+    parser.add_argument('--polls', type=int, default=200, help='polls per mode')
+    parser.add_argument('--change-every', type=int, default=20, help='status change every N polls (0 = never)')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    app = load_app(os.path.join(tempfile.mkdtemp(), 'benchmark.db'))
+    seed(app, args.users, args.transactions, args.items, args.seed)
+
+    from services.compression import brotli
+    modes = {name: mode for name, mode in MODES.items() if brotli is not None or 'br' not in mode[0]}
+
+    # user1 is the seeded admin; a second session changes statuses between polls
+    poller = Session(app, 1, args.users)
+    admin = Session(app, 1, args.users)
+    url = f'/api/admin/transactions?limit={args.limit}'
+    transaction_ids = list(range(1, args.transactions + 1))
+
+    results = {}
+    for name, (encoding, conditional) in modes.items():
+        results[name] = run_mode(poller, admin, url, encoding, conditional,
+                                 args.polls, args.change_every, transaction_ids)
+
+    baseline = results['plain']
+    print(f"{'mode':20} {'KB/poll':>9} {'CPU ms':>8} {'wall ms':>8} {'304s':>6} {'bytes saved':>12} {'CPU saved':>10}")
+    for name, result in results.items():
+        bytes_saved = 1 - result['kb_per_poll'] / baseline['kb_per_poll'] if baseline['kb_per_poll'] else 0
+        cpu_saved = 1 - result['cpu_ms_per_poll'] / baseline['cpu_ms_per_poll'] if baseline['cpu_ms_per_poll'] else 0
+        print(f"{name:20} {result['kb_per_poll']:9.2f} {result['cpu_ms_per_poll']:8.2f} {result['wall_ms_per_poll']:8.2f} "
+              f"{result['not_modified']:6d} {bytes_saved:12.1%} {cpu_saved:10.1%}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""Checkout throughput under gunicorn worker classes with a slow Stripe upstream.
+
+Starts the fake Stripe API with a fixed response latency, runs the app under
+gunicorn (gunicorn.conf.py) once per worker class and fires concurrent
+/api/create-checkout-session requests at it. Sync workers are pinned for the
+whole upstream wait; gthread frees the process but not the thread; gevent
+yields while the Stripe call is in flight.
+
+    python -m benchmarks.serving_benchmark --latency 0.2 --requests 400 --concurrency 50
+    python -m benchmarks.serving_benchmark --worker-classes gthread,gevent --workers 4
+"""
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+from benchmarks.api_benchmark import load_app, seed, percentile
+from benchmarks.fake_stripe import FakeStripeAPI
+
+JWT_SECRET = 'benchmark-jwt-secret'
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_gunicorn(worker_class, workers, threads, database_path, stripe_url):
+    port = free_port()
+    env = {
+        **os.environ,
+        'GUNICORN_BIND': f'127.0.0.1:{port}',
+        'GUNICORN_WORKER_CLASS': worker_class,
+        'GUNICORN_WORKERS': str(workers),
+        'GUNICORN_THREADS': str(threads),
+        'DATABASE_URL': f'sqlite:///{database_path}',
+        'JWT_SECRET': JWT_SECRET,
+        'STRIPE_SECRET_KEY': 'sk_test_benchmark',
+        'STRIPE_API_BASE': stripe_url,
+        'RATE_LIMIT_ENABLED': 'false',
+        'AUTO_MIGRATE': 'false',
+    }
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    url = f'http://127.0.0.1:{port}'
+    import requests
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f'{url}/api/products', timeout=5).status_code == 200:
+                return process, url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'gunicorn ({worker_class}) did not start: {process.stderr.read().decode()[-2000:]}')
+
+def run_load(url, tokens, requests_total, concurrency):
+    import requests
+    local = threading.local()
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+
+    def one(index):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+        started = time.perf_counter()
+        response = local.session.post(
+            f'{url}/api/create-checkout-session',
+            json={'lineItems': [{'product_id': 1 + index % 3, 'quantity': 1}]},
+            headers={'Authorization': f'Bearer {tokens[index % len(tokens)]}'}
+        )
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            if response.status_code != 200:
+                errors[0] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(requests_total)))
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'throughput_rps': round(len(latencies) / wall, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'errors': errors[0],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--worker-classes', default='sync,gthread,gevent')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=8, help='threads per gthread worker')
+    parser.add_argument('--latency', type=float, default=0.2, help='fake Stripe response delay in seconds')
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--users', type=int, default=50)
+    args = parser.parse_args()
+
+    database_path = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+    os.environ['JWT_SECRET'] = JWT_SECRET
+    app = load_app(database_path)
+    seed(app, args.users, 0, 1, 42)
+    from models.models import User
+    from services.token_auth import token_auth
+    with app.app_context():
+        tokens = [token_auth.issue(user) for user in User.query.all()]
+
+    stripe_api = FakeStripeAPI(latency=args.latency).start()
+    print(f'Fake Stripe latency {args.latency * 1000:.0f} ms, {args.requests} requests at concurrency {args.concurrency}')
+    print(f"{'worker class':14} {'processes':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'errors':>7}")
+    for worker_class in args.worker_classes.split(','):
+        process, url = start_gunicorn(worker_class, args.workers, args.threads, database_path, stripe_api.url)
+        try:
+            result = run_load(url, tokens, args.requests, args.concurrency)
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+        print(f"{worker_class:14} {args.workers:9d} {result['throughput_rps']:8.1f} {result['p50_ms']:8.1f} "
+              f"{result['p95_ms']:8.1f} {result['errors']:7d}")
+    stripe_api.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Concurrent write throughput against SQLite: default engine vs tuned engine.
+
+Writers insert an offline transaction with two items and commit, readers run the
+user history query, mirroring create_offline_payment and get_user_transactions.
+
+    python -m benchmarks.write_throughput --writers 8 --readers 8 --seconds 10
+"""
+from sqlalchemy import create_engine, select, insert
+from sqlalchemy.exc import OperationalError
+from datetime import datetime
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.models import db, User, Transaction, TransactionItem
+from services.database import engine_options, sqlite_pragmas, configure_engine
+
+USERS = 200
+
+def build_engine(path, tuned):
+    uri = f'sqlite:///{path}'
+    if not tuned:
+        # What app.py used before: default options, rollback journal
+        return create_engine(uri)
+    engine = create_engine(uri, **engine_options(uri, {}))
+    configure_engine(engine, sqlite_pragmas({}))
+    return engine
+
+def seed(engine):
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(User.__table__), [{
+            'username': f'user{i}', 'email': f'user{i}@example.com', 'password': 'x',
+            'auth_method': 'local', 'created_at': datetime.utcnow(), 'is_admin': False
+        } for i in range(1, USERS + 1)])
+
+def writer(engine, stop, stats):
+    transactions, items = Transaction.__table__, TransactionItem.__table__
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            with engine.begin() as connection:
+                now = datetime.utcnow()
+                transaction_id = connection.execute(insert(transactions).values(
+                    user_id=random.randint(1, USERS), amount_minor=3000, currency='PLN',
+                    payment_method='offline', status='pending', created_at=now, updated_at=now,
+                    transfer_title='PAYMENT-BENCH'
+                )).inserted_primary_key[0]
+                connection.execute(insert(items), [
+                    {'transaction_id': transaction_id, 'product_name': 'Kubek', 'unit_price_minor': 1000, 'quantity': 2},
+                    {'transaction_id': transaction_id, 'product_name': 'Plakat', 'unit_price_minor': 1000, 'quantity': 1},
+                ])
+            stats['latencies'].append(time.perf_counter() - started)
+        except OperationalError as e:
+            if 'locked' not in str(e):
+                raise
+            stats['locked'] += 1
+
+def reader(engine, stop, stats):
+    transactions = Transaction.__table__
+    while not stop.is_set():
+        with engine.connect() as connection:
+            connection.execute(
+                select(transactions).where(transactions.c.user_id == random.randint(1, USERS))
+                .order_by(transactions.c.created_at.desc())
+            ).fetchall()
+        stats['reads'] += 1
+
+def run(tuned, writers, readers, seconds):
+    directory = tempfile.mkdtemp()
+    engine = build_engine(os.path.join(directory, 'bench.db'), tuned)
+    seed(engine)
+
+    stop = threading.Event()
+    stats = {'latencies': [], 'locked': 0, 'reads': 0}
+    threads = [threading.Thread(target=writer, args=(engine, stop, stats)) for _ in range(writers)]
+    threads += [threading.Thread(target=reader, args=(engine, stop, stats)) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    engine.dispose()
+
+    latencies = sorted(stats['latencies'])
+    p95 = latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0
+    return {
+        'writes_per_s': len(latencies) / seconds,
+        'reads_per_s': stats['reads'] / seconds,
+        'locked_errors': stats['locked'],
+        'write_p95_ms': p95,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--writers', type=int, default=8)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    for label, tuned in (('default', False), ('tuned', True)):
+        result = run(tuned, args.writers, args.readers, args.seconds)
+        print(f"{label:8} writes/s={result['writes_per_s']:8.1f} reads/s={result['reads_per_s']:8.1f} "
+              f"write_p95={result['write_p95_ms']:7.1f}ms locked={result['locked_errors']}")
+
+if __name__ == '__main__':
+    main()
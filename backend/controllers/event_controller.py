@@ -0,0 +1,46 @@
+from flask import current_app, request, jsonify, Response
+from flask_login import current_user, login_required
+from models.models import db
+from services.events import transaction_events, format_event, RESET
+import time
+
+class EventController:
+    @staticmethod
+    @login_required
+    def stream_transaction_events():
+        # The stream runs outside the app context, so it keeps this app's broker
+        broker = transaction_events.for_app(current_app)
+        user_id, admin = current_user.id, bool(current_user.is_admin)
+        try:
+            # EventSource sends Last-Event-ID on reconnect; ?last_event_id= covers a fresh page load
+            last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+            subscription, replay = broker.subscribe(user_id, admin, last_event_id)
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+        finally:
+            # The stream only reads the subscription queue; the request's session and pooled
+            # connection go back now instead of staying checked out for the whole stream
+            db.session.remove()
+
+        def generate():
+            # Streams end after EVENTS_MAX_STREAM_SECONDS so workers are recycled; the browser
+            # reconnects after `retry` and resumes from its last event id
+            deadline = time.monotonic() + broker.max_stream_seconds
+            try:
+                yield 'retry: 3000\n\n'
+                for event in replay:
+                    yield format_event(*event)
+                while time.monotonic() < deadline:
+                    event = subscription.get(timeout=min(broker.heartbeat, max(deadline - time.monotonic(), 0)))
+                    if subscription.overflowed:
+                        yield format_event(*RESET)
+                        return
+                    yield format_event(*event) if event else ': keep-alive\n\n'
+            finally:
+                broker.unsubscribe(subscription)
+
+        response = Response(generate(), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        # Keep reverse proxies (nginx) from buffering the stream
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
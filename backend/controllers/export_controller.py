@@ -0,0 +1,146 @@
+from flask import request, jsonify, Response, stream_with_context
+from flask_login import login_required
+from sqlalchemy import select, union_all
+from models.models import db, Transaction, TransactionItem, TransactionArchive, TransactionItemArchive, User
+from controllers.transaction_controller import admin_required, parse_date
+from services.money import to_major_units
+from datetime import datetime
+import csv
+import io
+import json
+
+EXPORT_BATCH_SIZE = 1000
+
+CSV_COLUMNS = [
+    'transaction_id', 'user_id', 'username', 'email', 'amount_minor', 'currency', 'payment_method',
+    'status', 'created_at', 'updated_at', 'transfer_title',
+    'item_id', 'product_name', 'unit_price_minor', 'quantity'
+]
+
+def format_timestamp(value):
+    return value.strftime('%Y-%m-%d %H:%M:%S') if value else None
+
+EXPORT_COLUMNS = ['id', 'user_id', 'amount_minor', 'currency', 'payment_method', 'status',
+                  'created_at', 'updated_at', 'transfer_title']
+ITEM_COLUMNS = ['transaction_id', 'id', 'product_name', 'unit_price_minor', 'quantity']
+
+def _export_select(model, since, watermark):
+    # Rows touched at or after the watermark are left for the next incremental export
+    statement = select(*[getattr(model, name).label(name) for name in EXPORT_COLUMNS], User.username, User.email).outerjoin(
+        User, User.id == model.user_id
+    ).where(model.updated_at < watermark)
+    if since:
+        statement = statement.where(model.updated_at >= since)
+    return statement
+
+def export_query(since, watermark, include_archived=True):
+    # The ledger covers archived transactions too. One UNION ALL statement reads both tables
+    # from the same snapshot, so a row archived mid-export is neither lost nor repeated
+    statement = _export_select(Transaction, since, watermark)
+    if include_archived:
+        statement = union_all(statement, _export_select(TransactionArchive, since, watermark))
+        columns = statement.selected_columns
+        statement = statement.order_by(columns.updated_at, columns.id)
+    else:
+        statement = statement.order_by(Transaction.updated_at, Transaction.id)
+    result = db.session.execute(statement, execution_options={'yield_per': EXPORT_BATCH_SIZE})
+    for rows in result.partitions():
+        # Items are loaded per yielded batch, from both item tables (ids are shared)
+        items = load_items([row.id for row in rows], include_archived)
+        for row in rows:
+            yield row, items.get(row.id, [])
+
+def load_items(transaction_ids, include_archived):
+    models = [TransactionItem, TransactionItemArchive] if include_archived else [TransactionItem]
+    statements = [
+        select(*[getattr(model, name).label(name) for name in ITEM_COLUMNS])
+        .where(model.transaction_id.in_(transaction_ids))
+        for model in models
+    ]
+    statement = union_all(*statements) if len(statements) > 1 else statements[0]
+    items = {}
+    for transaction_id, item_id, product_name, unit_price_minor, quantity in db.session.execute(
+        statement.order_by(statement.selected_columns.id)
+    ):
+        items.setdefault(transaction_id, []).append({
+            'id': item_id,
+            'product_name': product_name,
+            'product_price': to_major_units(unit_price_minor),
+            'unit_price_minor': unit_price_minor,
+            'quantity': quantity
+        })
+    return items
+
+def transaction_record(row, items):
+    return {
+        'id': row.id,
+        'user_id': row.user_id,
+        'username': row.username if row.username is not None else 'Unknown',
+        'email': row.email if row.email is not None else 'Unknown',
+        'amount': to_major_units(row.amount_minor),
+        'amount_minor': row.amount_minor,
+        'currency': row.currency,
+        'payment_method': row.payment_method,
+        'status': row.status,
+        'created_at': format_timestamp(row.created_at),
+        'updated_at': format_timestamp(row.updated_at),
+        'transfer_title': row.transfer_title,
+        'items': items
+    }
+
+def generate_ndjson(query):
+    for row, items in query:
+        yield json.dumps(transaction_record(row, items), ensure_ascii=False) + '\n'
+
+def generate_csv(query):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return data
+
+    writer.writerow(CSV_COLUMNS)
+    yield flush()
+    for row, items in query:
+        record = transaction_record(row, items)
+        head = [record[key] for key in (
+            'id', 'user_id', 'username', 'email', 'amount_minor', 'currency', 'payment_method',
+            'status', 'created_at', 'updated_at', 'transfer_title'
+        )]
+        if not record['items']:
+            writer.writerow(head + [None, None, None, None])
+        for item in record['items']:
+            writer.writerow(head + [item['id'], item['product_name'], item['unit_price_minor'], item['quantity']])
+        yield flush()
+
+class ExportController:
+    @staticmethod
+    @login_required
+    @admin_required
+    def export_transactions():
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in ['ndjson', 'csv']:
+            return jsonify({'error': 'Invalid format'}), 400
+
+        try:
+            since = parse_date(request.args['since']) if request.args.get('since') else None
+        except ValueError:
+            return jsonify({'error': 'Invalid since'}), 400
+
+        include_archived = request.args.get('include_archived', 'true').lower() == 'true'
+        watermark = datetime.utcnow()
+        query = export_query(since, watermark, include_archived)
+
+        if export_format == 'csv':
+            generator, mimetype = generate_csv(query), 'text/csv'
+        else:
+            generator, mimetype = generate_ndjson(query), 'application/x-ndjson'
+
+        response = Response(stream_with_context(generator), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename=transactions.{export_format}'
+        # Pass back as ?since= on the next call to fetch only newer changes
+        response.headers['X-Export-Watermark'] = watermark.isoformat()
+        return response
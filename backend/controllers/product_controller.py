@@ -0,0 +1,92 @@
+from flask import request, jsonify, Response
+from flask_login import login_required
+from models.models import db, Product
+from controllers.transaction_controller import admin_required
+from services.catalog import product_catalog, serialize_product
+from services.money import to_minor_units, normalize_currency
+
+EDITABLE_FIELDS = ('name', 'description', 'price_minor', 'currency', 'image', 'active')
+
+def apply_product_fields(product, data):
+    for field in EDITABLE_FIELDS:
+        if field not in data:
+            continue
+        value = data[field]
+        if field == 'name':
+            if not isinstance(value, str) or not value.strip():
+                raise ValueError('Invalid name')
+            value = value.strip()[:100]
+        elif field == 'price_minor':
+            value = to_minor_units(value)
+        elif field == 'currency':
+            value = normalize_currency(value)
+        elif field == 'active':
+            value = bool(value)
+        setattr(product, field, value)
+
+class ProductController:
+    @staticmethod
+    def get_products():
+        try:
+            snapshot = product_catalog.snapshot()
+            # Clients revalidate with If-None-Match and get an empty 304 while the catalog is unchanged.
+            # Weak tag: the compressor may re-encode the body, so it is not byte-identical per tag
+            if request.if_none_match.contains_weak(snapshot.etag):
+                response = Response(status=304)
+            else:
+                response = Response(snapshot.body, mimetype='application/json')
+            response.set_etag(snapshot.etag, weak=True)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    @staticmethod
+    @login_required
+    @admin_required
+    def create_product():
+        try:
+            data = request.json or {}
+            if 'name' not in data or 'price_minor' not in data:
+                return jsonify({'error': 'name and price_minor are required'}), 400
+            
+            product = Product(currency='PLN', active=True)
+            try:
+                apply_product_fields(product, data)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            db.session.add(product)
+            db.session.commit()
+            product_catalog.invalidate()
+            
+            return jsonify({'product': serialize_product(product)}), 201
+        
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 500
+
+    @staticmethod
+    @login_required
+    @admin_required
+    def update_product(product_id):
+        try:
+            product = db.session.get(Product, product_id)
+            if not product:
+                return jsonify({'error': 'Product not found'}), 404
+            
+            try:
+                apply_product_fields(product, request.json or {})
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            
+            # Products are deactivated rather than deleted; past transactions keep their names
+            db.session.commit()
+            product_catalog.invalidate()
+            
+            return jsonify({'product': {**serialize_product(product), 'active': product.active}}), 200
+        
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 500
@@ -0,0 +1,32 @@
+from flask import request, jsonify
+from flask_login import login_required
+from controllers.transaction_controller import admin_required
+from services.reconciliation import statement_reconciler, read_statement
+
+STATEMENT_FORMATS = ['csv', 'mt940']
+
+class ReconciliationController:
+    @staticmethod
+    @login_required
+    @admin_required
+    def import_statement():
+        statement_format = request.args.get('format')
+        if statement_format is not None and statement_format not in STATEMENT_FORMATS:
+            return jsonify({'error': 'Invalid format'}), 400
+        dry_run = request.args.get('dry_run', 'false').lower() == 'true'
+
+        # multipart upload (field "statement") or the raw file as the request body; either way
+        # it is parsed while being read, werkzeug spools large uploads to disk
+        upload = request.files.get('statement')
+        stream = upload.stream if upload else request.stream
+        if statement_format is None and upload and upload.filename:
+            extension = upload.filename.rsplit('.', 1)[-1].lower()
+            statement_format = 'mt940' if extension in ('sta', 'mt940') else 'csv' if extension == 'csv' else None
+
+        try:
+            statement_format, entries = read_statement(stream, statement_format, request.args.get('encoding', 'utf-8-sig'))
+            return jsonify(statement_reconciler.reconcile(entries, dry_run=dry_run, statement_format=statement_format)), 200
+        except (ValueError, LookupError) as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
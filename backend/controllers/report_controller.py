@@ -0,0 +1,121 @@
+from flask import request, jsonify
+from flask_login import login_required
+from sqlalchemy import func
+from models.models import db, Transaction, TransactionArchive, DailySales, DailyProductSales
+from controllers.transaction_controller import admin_required, apply_transaction_filters
+from services.money import to_major_units
+from datetime import date
+from collections import defaultdict
+
+def apply_rollup_filters(query, model, args):
+    # Rollups are keyed by day, so date filters take plain YYYY-MM-DD values
+    if args.get('date_from'):
+        query = query.filter(model.day >= date.fromisoformat(args['date_from']))
+    if args.get('date_to'):
+        query = query.filter(model.day <= date.fromisoformat(args['date_to']))
+    if args.get('status'):
+        query = query.filter(model.status == args['status'])
+    if args.get('payment_method'):
+        query = query.filter(model.payment_method == args['payment_method'])
+    if args.get('currency'):
+        query = query.filter(model.currency == args['currency'].upper())
+    return query
+
+class ReportController:
+    @staticmethod
+    @login_required
+    @admin_required
+    def get_totals():
+        try:
+            # Exact integer sums computed by the database, one row per (currency, status);
+            # archived transactions are summed separately and merged
+            sums = defaultdict(lambda: [0, 0])
+            for model in (Transaction, TransactionArchive):
+                query = db.session.query(
+                    model.currency,
+                    model.status,
+                    func.count(model.id),
+                    func.coalesce(func.sum(model.amount_minor), 0)
+                )
+                try:
+                    query = apply_transaction_filters(query, request.args, model)
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+
+                for currency, status, count, amount_minor in query.group_by(model.currency, model.status):
+                    sums[(currency, status)][0] += count
+                    sums[(currency, status)][1] += amount_minor
+            rows = [(currency, status, count, amount_minor) for (currency, status), (count, amount_minor) in sums.items()]
+
+            totals = [{
+                'currency': currency,
+                'status': status,
+                'count': count,
+                'amount_minor': amount_minor,
+                'amount': to_major_units(amount_minor)
+            } for currency, status, count, amount_minor in rows]
+
+            return jsonify({'totals': totals}), 200
+
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    @staticmethod
+    @login_required
+    @admin_required
+    def get_daily_sales():
+        try:
+            try:
+                query = apply_rollup_filters(DailySales.query, DailySales, request.args)
+            except ValueError:
+                return jsonify({'error': 'Invalid date'}), 400
+
+            rows = query.filter(DailySales.transaction_count != 0).order_by(
+                DailySales.day.desc(), DailySales.status, DailySales.payment_method
+            ).all()
+
+            return jsonify({'days': [{
+                'day': row.day.isoformat(),
+                'status': row.status,
+                'payment_method': row.payment_method,
+                'currency': row.currency,
+                'count': row.transaction_count,
+                'amount_minor': row.amount_minor,
+                'amount': to_major_units(row.amount_minor)
+            } for row in rows]}), 200
+
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    @staticmethod
+    @login_required
+    @admin_required
+    def get_product_sales():
+        try:
+            query = db.session.query(
+                DailyProductSales.product_name,
+                DailyProductSales.currency,
+                func.sum(DailyProductSales.quantity),
+                func.sum(DailyProductSales.revenue_minor)
+            )
+            try:
+                query = apply_rollup_filters(query, DailyProductSales, request.args)
+            except ValueError:
+                return jsonify({'error': 'Invalid date'}), 400
+
+            rows = query.group_by(
+                DailyProductSales.product_name, DailyProductSales.currency
+            ).having(func.sum(DailyProductSales.quantity) != 0).order_by(
+                func.sum(DailyProductSales.revenue_minor).desc()
+            ).all()
+
+            return jsonify({'products': [{
+                'product_name': product_name,
+                'currency': currency,
+                'quantity': quantity,
+                'revenue_minor': revenue_minor,
+                'revenue': to_major_units(revenue_minor)
+            } for product_name, currency, quantity, revenue_minor in rows]}), 200
+
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
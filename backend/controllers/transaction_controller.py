@@ -1,9 +1,35 @@
 from flask import request, jsonify
 from flask_login import current_user, login_required
-from models.models import db, Transaction, TransactionItem, User
-from datetime import datetime
+from sqlalchemy import and_, or_, insert, func
+from models.models import db, Transaction, TransactionItem, TransactionArchive, TransactionItemArchive, User
+from services.transaction_cache import history_cache
+from services.money import to_minor_units, to_major_units, normalize_currency
+from services.catalog import product_catalog
+from services.http_cache import make_etag, add_validators, not_modified
+from services.archive import archived_count
+from services.search import search_terms, matching_ids
+from services.status_updates import apply_status_updates, STATUSES
+from services.serialization import TransactionSerializer, parse_fields, project, HISTORY_FIELDS, ADMIN_FIELDS
+from services import reporting
+from datetime import datetime, timedelta
+import base64
+import json
 import uuid
 from functools import wraps
+from types import SimpleNamespace
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+BULK_MAX_ORDERS = 50000
+BULK_DEFAULT_CHUNK_SIZE = 1000
+BULK_MAX_STATUS_UPDATES = 5000
+
+BANK_DETAILS = {
+    'account_number': 'PL 12 3456 7890 1234 5678 9012 3456',
+    'bank_name': 'Example Bank',
+    'recipient': 'Gamer Shop Sp. z o.o.'
+}
 
 def admin_required(f):
     @wraps(f)
@@ -13,21 +39,175 @@ def admin_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def encode_cursor(transaction):
+    # Keyset position of the last row on a page: (created_at, id)
+    raw = json.dumps([transaction.created_at.isoformat(), transaction.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+# First archive page: a position before every row
+ARCHIVE_START_CURSOR = encode_cursor(SimpleNamespace(created_at=datetime.max, id=0))
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        created_at, transaction_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(transaction_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+def encode_id_cursor(transaction_id):
+    # Search results are ordered by id alone, which is what the full-text index can walk
+    return base64.urlsafe_b64encode(json.dumps([transaction_id]).encode()).decode().rstrip('=')
+
+def decode_id_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        transaction_id, = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return int(transaction_id)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+def parse_date(value, end=False):
+    # Accepts 'YYYY-MM-DD' or a full ISO timestamp; a bare end date covers the whole day
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+TRANSACTION_FILTERS = ('status', 'payment_method', 'user_id', 'date_from', 'date_to')
+
+def apply_transaction_filters(query, args, model=Transaction):
+    if args.get('status'):
+        query = query.filter(model.status == args['status'])
+    if args.get('payment_method'):
+        query = query.filter(model.payment_method == args['payment_method'])
+    if args.get('user_id'):
+        query = query.filter(model.user_id == int(args['user_id']))
+    if args.get('date_from'):
+        query = query.filter(model.created_at >= parse_date(args['date_from']))
+    if args.get('date_to'):
+        date_to = args['date_to']
+        if len(date_to) == 10:
+            query = query.filter(model.created_at < parse_date(date_to, end=True))
+        else:
+            query = query.filter(model.created_at <= parse_date(date_to))
+    return query
+
+def parse_line_items(line_items, allow_custom_prices=False):
+    # Items reference catalog products ({'product_id', 'quantity'}) and are priced from the
+    # catalog cache. Stripe-shaped price_data is only honoured for trusted (admin) imports.
+    # Returns (items, currency, total in minor units)
+    if not isinstance(line_items, list):
+        raise ValueError('lineItems must be a list')
+
+    items = []
+    currencies = set()
+    for item in line_items:
+        quantity = item.get('quantity', 1)
+        if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity < 1:
+            raise ValueError('Invalid quantity')
+        if item.get('product_id') is not None:
+            product = product_catalog.get_product(int(item['product_id']))
+            if product is None:
+                raise ValueError(f"Unknown product {item['product_id']}")
+            currencies.add(product['currency'])
+            items.append({
+                'product_name': product['name'],
+                'unit_price_minor': product['price_minor'],
+                'quantity': quantity
+            })
+        elif allow_custom_prices:
+            price_data = item.get('price_data', {})
+            currencies.add(normalize_currency(price_data.get('currency')))
+            items.append({
+                'product_name': price_data.get('product_data', {}).get('name', 'Unknown Product'),
+                'unit_price_minor': to_minor_units(price_data.get('unit_amount', 0)),
+                'quantity': quantity
+            })
+        else:
+            raise ValueError('Line items must reference a product_id')
+
+    if len(currencies) > 1:
+        raise ValueError('All line items must use the same currency')
+    currency = currencies.pop() if currencies else normalize_currency(None)
+    total_minor = sum(item['unit_price_minor'] * item['quantity'] for item in items)
+    return items, currency, total_minor
+
+def new_transfer_title():
+    return f"PAYMENT-{uuid.uuid4().hex[:8].upper()}"
+
+def insert_offline_orders(orders, created_at):
+    # orders: [{'user_id', 'transfer_title', 'currency', 'total_minor', 'items'}] already validated.
+    # One multi-row INSERT ... RETURNING for transactions and one executemany for items.
+    transaction_rows = [{
+        'user_id': order['user_id'],
+        'amount_minor': order['total_minor'],
+        'currency': order['currency'],
+        'payment_method': 'offline',
+        'status': 'pending',
+        'created_at': created_at,
+        'updated_at': created_at,
+        'transfer_title': order['transfer_title']
+    } for order in orders]
+    transaction_ids = db.session.execute(
+        insert(Transaction).returning(Transaction.id, sort_by_parameter_order=True),
+        transaction_rows
+    ).scalars().all()
+
+    item_rows = []
+    rollups = reporting.RollupDelta()
+    for order, transaction_id in zip(orders, transaction_ids):
+        order['transaction_id'] = transaction_id
+        for item in order['items']:
+            item_rows.append({**item, 'transaction_id': transaction_id})
+        rollups.add(SimpleNamespace(
+            created_at=created_at, payment_method='offline', currency=order['currency'],
+            amount_minor=order['total_minor']
+        ), [SimpleNamespace(**item) for item in order['items']], 'pending', 1)
+
+    if item_rows:
+        db.session.execute(insert(TransactionItem), item_rows)
+    rollups.apply()
+
+def parse_status_update(index, update):
+    # {'transaction_id' | 'transfer_title', 'status', optional 'expected_updated_at'}
+    if not isinstance(update, dict):
+        raise ValueError('Update must be an object')
+    if update.get('status') not in STATUSES:
+        raise ValueError('Invalid status')
+    has_id = update.get('transaction_id') is not None
+    has_title = bool(update.get('transfer_title'))
+    if has_id == has_title:
+        raise ValueError('Provide either transaction_id or transfer_title')
+
+    change = {'index': index, 'status': update['status']}
+    if has_id:
+        change['transaction_id'] = int(update['transaction_id'])
+    else:
+        # Generated titles are upper case; bank exports do not always keep the case
+        change['transfer_title'] = str(update['transfer_title']).strip().upper()
+    if update.get('expected_updated_at'):
+        change['expected_updated_at'] = datetime.fromisoformat(update['expected_updated_at'])
+    return change
+
 class TransactionController:
     @staticmethod
     @login_required
     def create_offline_payment():
         try:
             data = request.json
-            line_items = data.get('lineItems', [])
             
-            transfer_title = f"PAYMENT-{uuid.uuid4().hex[:8].upper()}"
+            try:
+                line_items, currency, total_minor = parse_line_items(data.get('lineItems', []))
+            except (ValueError, TypeError, AttributeError) as e:
+                return jsonify({'error': str(e)}), 400
             
-            total_amount = sum(item.get('price_data', {}).get('unit_amount', 0) / 100 for item in line_items)
+            transfer_title = new_transfer_title()
         
             transaction = Transaction(
                 user_id=current_user.id,
-                amount=total_amount,
+                amount_minor=total_minor,
+                currency=currency,
                 payment_method='offline',
                 status='pending',
                 transfer_title=transfer_title
@@ -36,29 +216,29 @@ class TransactionController:
             db.session.add(transaction)
             db.session.flush()  
             
+            transaction_items = []
             for item in line_items:
-                product_data = item.get('price_data', {}).get('product_data', {})
                 transaction_item = TransactionItem(
                     transaction_id=transaction.id,
-                    product_name=product_data.get('name', 'Unknown Product'),
-                    product_price=item.get('price_data', {}).get('unit_amount', 0) / 100,
-                    quantity=item.get('quantity', 1)
+                    product_name=item['product_name'],
+                    unit_price_minor=item['unit_price_minor'],
+                    quantity=item['quantity']
                 )
                 db.session.add(transaction_item)
+                transaction_items.append(transaction_item)
             
+            reporting.record_transaction_created(transaction, transaction_items)
             db.session.commit()
+            history_cache.invalidate(current_user.id)
             
             return jsonify({
                 'message': 'Płatność offline utworzona pomyślnie',
                 'transaction_id': transaction.id,
                 'transfer_title': transfer_title,
-                'amount': total_amount,
-                'bank_details': {
-                    'account_number': 'PL 12 3456 7890 1234 5678 9012 3456',
-                    'bank_name': 'Example Bank',
-                    'recipient': 'Gamer Shop Sp. z o.o.',
-                    'transfer_title': transfer_title
-                }
+                'amount': to_major_units(total_minor),
+                'amount_minor': total_minor,
+                'currency': currency,
+                'bank_details': {**BANK_DETAILS, 'transfer_title': transfer_title}
             }), 201
         
         except Exception as e:
@@ -67,74 +247,315 @@ class TransactionController:
     
     @staticmethod
     @login_required
-    def get_user_transactions():
+    def create_offline_payments_bulk():
         try:
-            transactions = Transaction.query.filter_by(user_id=current_user.id).order_by(Transaction.created_at.desc()).all()
-            
-            result = []
-            for transaction in transactions:
-                items = []
-                for item in transaction.items:
-                    items.append({
-                        'id': item.id,
-                        'product_name': item.product_name,
-                        'product_price': item.product_price,
-                        'quantity': item.quantity
-                    })
-                
-                result.append({
-                    'id': transaction.id,
-                    'amount': transaction.amount,
-                    'payment_method': transaction.payment_method,
-                    'status': transaction.status,
-                    'created_at': transaction.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                    'transfer_title': transaction.transfer_title,
+            data = request.json or {}
+            orders = data.get('orders')
+            if not isinstance(orders, list) or not orders:
+                return jsonify({'error': 'orders must be a non-empty list'}), 400
+            if len(orders) > BULK_MAX_ORDERS:
+                return jsonify({'error': f'At most {BULK_MAX_ORDERS} orders per request'}), 400
+
+            atomic = bool(data.get('atomic', False))
+            chunk_size = min(max(int(data.get('chunkSize', BULK_DEFAULT_CHUNK_SIZE)), 1), BULK_MAX_ORDERS)
+
+            # Validation pass: nothing is written until every order has been checked
+            results = []
+            valid = []
+            titles = set()
+            for index, order in enumerate(orders):
+                try:
+                    if not isinstance(order, dict):
+                        raise ValueError('Order must be an object')
+                    items, currency, total_minor = parse_line_items(
+                        order.get('lineItems', []), allow_custom_prices=current_user.is_admin
+                    )
+                    user_id = current_user.id
+                    if order.get('user_id') is not None:
+                        # Only admins may import orders on behalf of other users
+                        if not current_user.is_admin:
+                            raise ValueError('user_id requires admin privileges')
+                        user_id = int(order['user_id'])
+                except (ValueError, TypeError, AttributeError) as e:
+                    results.append({'index': index, 'status': 'invalid', 'error': str(e)})
+                    continue
+
+                transfer_title = new_transfer_title()
+                while transfer_title in titles:
+                    transfer_title = new_transfer_title()
+                titles.add(transfer_title)
+
+                result = {'index': index, 'status': 'pending'}
+                results.append(result)
+                valid.append({
+                    'result': result,
+                    'reference': order.get('reference'),
+                    'user_id': user_id,
+                    'transfer_title': transfer_title,
+                    'currency': currency,
+                    'total_minor': total_minor,
                     'items': items
                 })
-            
-            return jsonify({'transactions': result}), 200
-        
+
+            requested_users = {order['user_id'] for order in valid} - {current_user.id}
+            if requested_users:
+                existing = {row[0] for row in db.session.query(User.id).filter(User.id.in_(requested_users))}
+                for order in [order for order in valid if order['user_id'] not in existing | {current_user.id}]:
+                    order['result'].update({'status': 'invalid', 'error': 'Unknown user_id'})
+                    valid.remove(order)
+
+            if atomic and len(valid) != len(orders):
+                for result in results:
+                    if result['status'] == 'pending':
+                        result['status'] = 'skipped'
+                return jsonify({'created': 0, 'results': results}), 400
+
+            created = 0
+            created_at = datetime.utcnow()
+            for start in range(0, len(valid), chunk_size):
+                chunk = valid[start:start + chunk_size]
+                try:
+                    insert_offline_orders(chunk, created_at)
+                    if not atomic:
+                        db.session.commit()
+                except Exception as e:
+                    db.session.rollback()
+                    failed = valid if atomic else chunk
+                    for order in failed:
+                        order['result'].update({'status': 'failed', 'error': str(e)})
+                    if atomic:
+                        created = 0
+                        break
+                    continue
+                for order in chunk:
+                    order['result'].update({
+                        'status': 'created',
+                        'transaction_id': order['transaction_id'],
+                        'transfer_title': order['transfer_title'],
+                        'amount': to_major_units(order['total_minor']),
+                        'amount_minor': order['total_minor'],
+                        'currency': order['currency']
+                    })
+                    if order['reference'] is not None:
+                        order['result']['reference'] = order['reference']
+                created += len(chunk)
+            else:
+                if atomic:
+                    db.session.commit()
+
+            for user_id in {order['user_id'] for order in valid if order['result']['status'] == 'created'}:
+                history_cache.invalidate(user_id)
+
+            return jsonify({
+                'created': created,
+                'results': results,
+                'bank_details': BANK_DETAILS
+            }), 201 if created else 400
+
         except Exception as e:
+            db.session.rollback()
             return jsonify({'error': str(e)}), 500
-    
+
+    @staticmethod
+    @login_required
+    def get_user_transactions():
+        try:
+            user_id = current_user.id
+            try:
+                fields = parse_fields(request.args.get('fields'), HISTORY_FIELDS)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            if request.args.get('cursor'):
+                return TransactionController._archived_history_page(user_id, fields)
+
+            history = history_cache.get_or_load(
+                user_id,
+                lambda: TransactionController._serialize_user_history(user_id),
+                lambda: TransactionController._history_version(user_id)
+            )
+
+            # Validators travel with the cached history, so a cache hit answers a 304 after the
+            # version aggregate only.
+            # The cache holds every field; a sparse fieldset is a projection with its own ETag
+            etag = history['etag'] if fields == HISTORY_FIELDS else make_etag(history['etag'], *fields)
+            cached = not_modified(etag, history['last_modified'])
+            if cached:
+                return cached
+
+            # Archived (old, closed) transactions are paged in through next_cursor on demand
+            response = jsonify({
+                'transactions': project(history['transactions'], fields, HISTORY_FIELDS),
+                'archived_count': history['archived_count'],
+                'next_cursor': ARCHIVE_START_CURSOR if history['archived_count'] else None,
+                'has_more': bool(history['archived_count'])
+            })
+            return add_validators(response, etag, history['last_modified']), 200
+
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+
+    @staticmethod
+    def _archived_history_page(user_id, fields):
+        try:
+            limit = min(max(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+            cursor_created_at, cursor_id = decode_cursor(request.args['cursor'])
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # Keyset walk over ix_transaction_archive_user_created
+        serializer = TransactionSerializer(TransactionArchive, TransactionItemArchive, fields)
+        rows = serializer.query().filter(
+            TransactionArchive.user_id == user_id,
+            or_(
+                TransactionArchive.created_at < cursor_created_at,
+                and_(TransactionArchive.created_at == cursor_created_at, TransactionArchive.id < cursor_id)
+            )
+        ).order_by(TransactionArchive.created_at.desc(), TransactionArchive.id.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        return jsonify({
+            'transactions': serializer.serialize(rows),
+            'next_cursor': encode_cursor(rows[-1]) if has_more else None,
+            'has_more': has_more,
+            'archived': True
+        }), 200
+
+    @staticmethod
+    def _history_version(user_id):
+        # Shared across processes: every write path moves updated_at, and archiving or
+        # inserting changes the count. One range over ix_transaction_user_created
+        return tuple(db.session.query(func.count(Transaction.id), func.max(Transaction.updated_at)).filter(
+            Transaction.user_id == user_id
+        ).one())
+
+    @staticmethod
+    def _serialize_user_history(user_id):
+        # updated_at is selected after the serialized columns, for the validators only
+        serializer = TransactionSerializer(Transaction, TransactionItem, HISTORY_FIELDS)
+        rows = serializer.query(Transaction.updated_at).filter(
+            Transaction.user_id == user_id
+        ).order_by(Transaction.created_at.desc()).all()
+        archived = archived_count(user_id)
+
+        last_modified = max((row.updated_at for row in rows if row.updated_at), default=None)
+        return {
+            'transactions': serializer.serialize(rows),
+            'archived_count': archived,
+            'last_modified': last_modified,
+            'etag': make_etag('history', user_id, len(rows), archived, last_modified.isoformat() if last_modified else '')
+        }
+
     @staticmethod
     @login_required
     @admin_required
     def get_all_transactions():
         try:
-            transactions = Transaction.query.order_by(Transaction.created_at.desc()).all()
+            args = request.args
+            paginated = 'cursor' in args or 'limit' in args
+
+            try:
+                serializer = TransactionSerializer(Transaction, TransactionItem, parse_fields(args.get('fields'), ADMIN_FIELDS))
+                # updated_at rides along after the serialized columns for the page validator
+                query = apply_transaction_filters(serializer.query(Transaction.updated_at), args)
+                if paginated:
+                    limit = min(max(int(args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+                    if args.get('cursor'):
+                        cursor_created_at, cursor_id = decode_cursor(args['cursor'])
+                        query = query.filter(or_(
+                            Transaction.created_at < cursor_created_at,
+                            and_(Transaction.created_at == cursor_created_at, Transaction.id < cursor_id)
+                        ))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+            # Only the requested columns are selected, users joined in the same statement; items
+            # come in one batched IN query per page when asked for
+            query = query.order_by(Transaction.created_at.desc(), Transaction.id.desc())
+
+            if paginated:
+                rows = query.limit(limit + 1).all()
+            else:
+                rows = query.all()
+
+            # The validator covers exactly the rows fetched for this page (the extra row decides
+            # has_more) plus the cursor in the path: a changed, inserted or removed row on the
+            # page changes the tag, and no aggregate over the whole filtered set is needed.
+            # No Last-Modified: a row leaving the page does not move the newest updated_at
+            etag = make_etag('admin', request.full_path, *(f'{row.id}@{row[-1].isoformat() if row[-1] else ""}' for row in rows))
+            cached = not_modified(etag)
+            if cached:
+                return cached
+
+            if paginated:
+                has_more = len(rows) > limit
+                rows = rows[:limit]
             
-            result = []
-            for transaction in transactions:
-                user = User.query.get(transaction.user_id)
-                
-                items = []
-                for item in transaction.items:
-                    items.append({
-                        'id': item.id,
-                        'product_name': item.product_name,
-                        'product_price': item.product_price,
-                        'quantity': item.quantity
-                    })
-                
-                result.append({
-                    'id': transaction.id,
-                    'user_id': transaction.user_id,
-                    'username': user.username if user else 'Unknown',
-                    'email': user.email if user else 'Unknown',
-                    'amount': transaction.amount,
-                    'payment_method': transaction.payment_method,
-                    'status': transaction.status,
-                    'created_at': transaction.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-                    'transfer_title': transaction.transfer_title,
-                    'items': items
-                })
+            result = serializer.serialize(rows)
             
-            return jsonify({'transactions': result}), 200
+            if not paginated:
+                return add_validators(jsonify({'transactions': result}), etag), 200
+
+            response = jsonify({
+                'transactions': result,
+                'next_cursor': encode_cursor(rows[-1]) if has_more else None,
+                'has_more': has_more
+            })
+            return add_validators(response, etag), 200
         
         except Exception as e:
             return jsonify({'error': str(e)}), 500
     
+    @staticmethod
+    @login_required
+    @admin_required
+    def search_transactions():
+        try:
+            args = request.args
+            terms = search_terms(args.get('q'))
+            if not terms:
+                return jsonify({'error': 'Query parameter q is required'}), 400
+
+            # Archived transactions stay in the index and are searched too unless include_archived=false
+            sources = [(Transaction, TransactionItem)]
+            if args.get('include_archived', 'true').lower() == 'true':
+                sources.append((TransactionArchive, TransactionItemArchive))
+            try:
+                limit = min(max(int(args.get('limit', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+                before_id = decode_id_cursor(args['cursor']) if args.get('cursor') else None
+                fields = parse_fields(args.get('fields'), ADMIN_FIELDS)
+                queries = []
+                for model, item_model in sources:
+                    serializer = TransactionSerializer(model, item_model, fields)
+                    queries.append((model, serializer, apply_transaction_filters(serializer.query(), args, model)))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+            # Without row filters the limit goes into the index scan itself; with filters the
+            # matching ids are joined first and the page is cut after filtering
+            filtered = any(args.get(name) for name in TRANSACTION_FILTERS)
+            ids = matching_ids(db.session.get_bind(), terms, before_id, None if filtered else limit + 1)
+
+            # A transaction lives in exactly one of the tables, so the pages merge by id
+            pages = [(serializer, query.filter(model.id.in_(ids)).order_by(model.id.desc()).limit(limit + 1).all())
+                     for model, serializer, query in queries]
+            merged = sorted((row.id for _, rows in pages for row in rows), reverse=True)
+            has_more = len(merged) > limit
+            kept = set(merged[:limit])
+            records = {}
+            for serializer, rows in pages:
+                rows = [row for row in rows if row.id in kept]
+                records.update(zip((row.id for row in rows), serializer.serialize(rows)))
+
+            return jsonify({
+                'transactions': [records[transaction_id] for transaction_id in merged[:limit]],
+                'next_cursor': encode_id_cursor(merged[limit - 1]) if has_more else None,
+                'has_more': has_more
+            }), 200
+
+        except Exception as e:
+            return jsonify({'error': str(e)}), 500
+    
     @staticmethod
     @login_required
     @admin_required
@@ -143,18 +564,23 @@ class TransactionController:
             data = request.json
             new_status = data.get('status')
             
-            if new_status not in ['pending', 'approved', 'cancelled']:
+            if new_status not in STATUSES:
                 return jsonify({'error': 'Invalid status'}), 400
             
             transaction = Transaction.query.get(transaction_id)
             
             if not transaction:
+                if db.session.get(TransactionArchive, transaction_id):
+                    return jsonify({'error': 'Transaction is archived'}), 409
                 return jsonify({'error': 'Transaction not found'}), 404
             
+            old_status = transaction.status
             transaction.status = new_status
             transaction.updated_at = datetime.utcnow()
+            reporting.record_status_change(transaction, old_status, new_status)
             
             db.session.commit()
+            history_cache.invalidate(transaction.user_id)
             
             return jsonify({
                 'message': f'Transaction status updated to {new_status}',
@@ -164,4 +590,42 @@ class TransactionController:
         
         except Exception as e:
             db.session.rollback()
-            return jsonify({'error': str(e)}), 500
\ No newline at end of file
+            return jsonify({'error': str(e)}), 500
+
+    @staticmethod
+    @login_required
+    @admin_required
+    def update_transaction_statuses_bulk():
+        try:
+            data = request.json or {}
+            updates = data.get('updates')
+            if not isinstance(updates, list) or not updates:
+                return jsonify({'error': 'updates must be a non-empty list'}), 400
+            if len(updates) > BULK_MAX_STATUS_UPDATES:
+                return jsonify({'error': f'At most {BULK_MAX_STATUS_UPDATES} updates per request'}), 400
+
+            atomic = bool(data.get('atomic', False))
+            changes = []
+            invalid = []
+            for index, update in enumerate(updates):
+                try:
+                    changes.append(parse_status_update(index, update))
+                except (ValueError, TypeError) as e:
+                    invalid.append({'index': index, 'status': 'invalid', 'error': str(e)})
+
+            if atomic and invalid:
+                results = invalid + [{'index': change['index'], 'status': 'skipped'} for change in changes]
+                return jsonify({'updated': 0, 'results': sorted(results, key=lambda result: result['index'])}), 400
+
+            # Set-based: one SELECT per chunk of ids/titles and one UPDATE per target status
+            updated, results = apply_status_updates(changes, atomic=atomic) if changes else (0, [])
+            results = sorted(invalid + results, key=lambda result: result['index'])
+
+            if atomic and not updated and any(result['status'] not in ('unchanged', 'skipped') for result in results):
+                return jsonify({'updated': 0, 'results': results}), 409
+
+            return jsonify({'updated': updated, 'results': results}), 200
+
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 500
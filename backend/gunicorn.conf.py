@@ -0,0 +1,73 @@
+# gunicorn -c gunicorn.conf.py wsgi:app
+#
+# gevent workers (default when gevent is installed) patch sockets, so outbound Stripe
+# and OAuth calls yield to other requests while waiting on the network instead of
+# pinning a worker. gthread is the fallback: each slow upstream call holds one thread.
+import multiprocessing
+import os
+import subprocess
+import sys
+
+try:
+    import gevent  # noqa: F401
+    default_worker_class = 'gevent'
+except ImportError:
+    default_worker_class = 'gthread'
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:5000')
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', default_worker_class)
+cpus = multiprocessing.cpu_count()
+
+if worker_class == 'gevent':
+    # One process per core; concurrency comes from greenlets
+    workers = int(os.environ.get('GUNICORN_WORKERS', cpus))
+    worker_connections = int(os.environ.get('GUNICORN_WORKER_CONNECTIONS', 200))
+elif worker_class == 'gthread':
+    workers = int(os.environ.get('GUNICORN_WORKERS', cpus * 2 + 1))
+    threads = int(os.environ.get('GUNICORN_THREADS', 8))
+else:
+    # gunicorn silently turns sync workers with threads > 1 into gthread
+    workers = int(os.environ.get('GUNICORN_WORKERS', cpus * 2 + 1))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers now and then so slow leaks cannot build up
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+
+def on_starting(server):
+    # Migrate once, before any worker boots; wsgi.py creates the workers' apps with
+    # AUTO_MIGRATE off so they do not all race to upgrade the schema. The upgrade runs in
+    # a child process: importing the app here would create its module-level locks in the
+    # master, before gevent workers monkey-patch, leaving real OS locks in cooperative code
+    if os.environ.get('AUTO_MIGRATE', 'true').lower() == 'true':
+        subprocess.run(
+            [sys.executable, '-m', 'flask', '--app', 'app', 'db', 'upgrade'],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env=dict(os.environ, AUTO_MIGRATE='false'),
+            check=True
+        )
+
+def post_worker_init(worker):
+    # Webhook processing can run inside the web workers or separately via `flask webhooks work`
+    if os.environ.get('WEBHOOK_WORKERS_IN_WEB', 'false').lower() == 'true':
+        from app import webhook_queue
+        from wsgi import app
+        webhook_queue.for_app(app).start()
+    # Every worker runs the scheduler; the job_lock lease lets one of them run each job
+    if os.environ.get('SCHEDULER_ENABLED', 'true').lower() == 'true':
+        from app import job_scheduler
+        from wsgi import app
+        job_scheduler.for_app(app).start()
+
+def worker_exit(server, worker):
+    if os.environ.get('WEBHOOK_WORKERS_IN_WEB', 'false').lower() == 'true':
+        from app import webhook_queue
+        from wsgi import app
+        webhook_queue.for_app(app).stop()
+    if os.environ.get('SCHEDULER_ENABLED', 'true').lower() == 'true':
+        from app import job_scheduler
+        from wsgi import app
+        job_scheduler.for_app(app).stop()
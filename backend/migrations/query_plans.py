@@ -0,0 +1,90 @@
+from sqlalchemy import select, text, func
+from datetime import datetime
+from models.models import Transaction, TransactionItem, TransactionArchive
+
+# Hot query shapes as the controllers issue them, paired with the index each must use
+HOT_QUERIES = [
+    (
+        'user history',
+        select(Transaction).where(Transaction.user_id == 1).order_by(Transaction.created_at.desc()),
+        'ix_transaction_user_created',
+    ),
+    (
+        'history cache version',
+        select(func.count(Transaction.id), func.max(Transaction.updated_at)).where(Transaction.user_id == 1),
+        'ix_transaction_user_created',
+    ),
+    (
+        'admin feed page',
+        select(Transaction).where(Transaction.created_at < datetime(2100, 1, 1))
+        .order_by(Transaction.created_at.desc(), Transaction.id.desc()).limit(51),
+        'ix_transaction_created_id',
+    ),
+    (
+        'admin feed by status',
+        select(Transaction).where(Transaction.status == 'pending')
+        .order_by(Transaction.created_at.desc(), Transaction.id.desc()).limit(51),
+        'ix_transaction_status_created',
+    ),
+    (
+        'incremental export',
+        select(Transaction).where(Transaction.updated_at >= datetime(2000, 1, 1))
+        .order_by(Transaction.updated_at, Transaction.id),
+        'ix_transaction_updated_id',
+    ),
+    (
+        'transaction items',
+        select(TransactionItem).where(TransactionItem.transaction_id.in_([1, 2, 3])),
+        'ix_transaction_item_transaction_id',
+    ),
+    (
+        'archive candidates',
+        select(Transaction.id).where(Transaction.status.in_(['approved', 'cancelled']),
+                                     Transaction.created_at < datetime(2000, 1, 1),
+                                     Transaction.id < select(func.max(Transaction.id)).scalar_subquery()).limit(1000),
+        'ix_transaction_status_created',
+    ),
+    (
+        'incremental export of the archive',
+        select(TransactionArchive.id).where(TransactionArchive.updated_at >= datetime(2000, 1, 1))
+        .order_by(TransactionArchive.updated_at, TransactionArchive.id),
+        'ix_transaction_archive_updated_id',
+    ),
+    (
+        'archived history page',
+        select(TransactionArchive).where(TransactionArchive.user_id == 1, TransactionArchive.created_at < datetime(2100, 1, 1))
+        .order_by(TransactionArchive.created_at.desc(), TransactionArchive.id.desc()).limit(51),
+        'ix_transaction_archive_user_created',
+    ),
+    (
+        'bulk status lookup by title',
+        select(Transaction.id).where(Transaction.transfer_title.in_(['PAYMENT-1A2B3C4D', 'PAYMENT-5E6F7A8B'])),
+        'ix_transaction_transfer_title',
+    ),
+    (
+        'stale pending payments',
+        select(Transaction.id).where(Transaction.status == 'pending', Transaction.payment_method == 'offline',
+                                     Transaction.created_at < datetime(2000, 1, 1))
+        .order_by(Transaction.created_at).limit(500),
+        'ix_transaction_status_created',
+    ),
+]
+
+def explain(connection, statement):
+    sql = str(statement.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True}))
+    rows = connection.execute(text(f'EXPLAIN QUERY PLAN {sql}')).fetchall()
+    return [row[-1] for row in rows]
+
+def check_query_plans(engine):
+    # Returns (name, ok, plan lines) per hot query; only meaningful on SQLite
+    if engine.dialect.name != 'sqlite':
+        raise RuntimeError('EXPLAIN QUERY PLAN checks require SQLite')
+
+    results = []
+    with engine.connect() as connection:
+        for name, statement, index_name in HOT_QUERIES:
+            plan = explain(connection, statement)
+            uses_index = any(index_name in line for line in plan)
+            sorts_in_memory = any('USE TEMP B-TREE' in line for line in plan)
+            results.append((name, uses_index and not sorts_in_memory, plan))
+    return results
@@ -0,0 +1,106 @@
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, inspect, select, func, text
+from contextlib import contextmanager
+from datetime import datetime
+import importlib
+import pkgutil
+
+from migrations import versions
+
+metadata = MetaData()
+
+# pg_advisory_xact_lock key serializing upgrades across processes on PostgreSQL
+MIGRATION_LOCK_KEY = 4_004_017
+
+schema_migrations = Table(
+    'schema_migrations', metadata,
+    Column('revision', Integer, primary_key=True),
+    Column('description', String(200)),
+    Column('applied_at', DateTime, default=datetime.utcnow),
+)
+
+def load_migrations():
+    # Each module in migrations/versions defines revision, description, upgrade(conn) and downgrade(conn)
+    modules = []
+    for info in pkgutil.iter_modules(versions.__path__):
+        modules.append(importlib.import_module(f'{versions.__name__}.{info.name}'))
+    modules.sort(key=lambda module: module.revision)
+
+    revisions = [module.revision for module in modules]
+    if len(revisions) != len(set(revisions)):
+        raise RuntimeError(f'Duplicate migration revisions: {revisions}')
+    return modules
+
+def _revision(connection):
+    return connection.execute(select(func.max(schema_migrations.c.revision))).scalar() or 0
+
+def current_revision(engine):
+    if not inspect(engine).has_table('schema_migrations'):
+        return 0
+    with engine.connect() as connection:
+        return _revision(connection)
+
+@contextmanager
+def migration_transaction(engine):
+    # pysqlite runs DDL outside its implicit transactions, so on SQLite a migration failing
+    # halfway would keep its earlier statements while the revision stays behind. With the
+    # driver's transaction handling off and an explicit BEGIN, the schema change and the
+    # version bump commit or roll back together on every backend. The transaction also
+    # holds the migration lock (SQLite's write lock via IMMEDIATE, an advisory lock on
+    # PostgreSQL), so processes upgrading at the same time take turns
+    with engine.connect() as connection:
+        dbapi_connection = connection.connection.dbapi_connection
+        isolation_level = getattr(dbapi_connection, 'isolation_level', None)
+        manual = engine.dialect.name == 'sqlite' and isolation_level is not None
+        if manual:
+            dbapi_connection.isolation_level = None
+        try:
+            with connection.begin():
+                if manual:
+                    connection.exec_driver_sql('BEGIN IMMEDIATE')
+                elif engine.dialect.name == 'postgresql':
+                    connection.execute(text('SELECT pg_advisory_xact_lock(:key)'), {'key': MIGRATION_LOCK_KEY})
+                yield connection
+        finally:
+            if manual:
+                dbapi_connection.isolation_level = isolation_level
+
+def upgrade(engine, target=None, log=print):
+    with migration_transaction(engine) as connection:
+        metadata.create_all(connection, tables=[schema_migrations])
+    current = current_revision(engine)
+    applied = []
+
+    for migration in load_migrations():
+        if migration.revision <= current or (target is not None and migration.revision > target):
+            continue
+        with migration_transaction(engine) as connection:
+            # Applied by another process while this one waited for the lock
+            if _revision(connection) >= migration.revision:
+                continue
+            migration.upgrade(connection)
+            connection.execute(schema_migrations.insert().values(
+                revision=migration.revision,
+                description=migration.description,
+                applied_at=datetime.utcnow()
+            ))
+        log(f'Applied migration {migration.revision:04d}: {migration.description}')
+        applied.append(migration.revision)
+
+    return applied
+
+def downgrade(engine, target, log=print):
+    current = current_revision(engine)
+    reverted = []
+
+    for migration in reversed(load_migrations()):
+        if migration.revision > current or migration.revision <= target:
+            continue
+        with migration_transaction(engine) as connection:
+            migration.downgrade(connection)
+            connection.execute(schema_migrations.delete().where(
+                schema_migrations.c.revision == migration.revision
+            ))
+        log(f'Reverted migration {migration.revision:04d}: {migration.description}')
+        reverted.append(migration.revision)
+
+    return reverted
@@ -0,0 +1,48 @@
+from sqlalchemy import MetaData, Table, Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Index
+
+revision = 1
+description = 'initial schema'
+
+# Frozen copy of the tables as db.create_all() produced them before migrations existed,
+# so databases created that way are adopted without changes
+metadata = MetaData()
+
+user = Table(
+    'user', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('username', String(64), nullable=False),
+    Column('email', String(120), nullable=False),
+    Column('password', String(128), nullable=False),
+    Column('auth_method', String(20)),
+    Column('created_at', DateTime),
+    Column('is_admin', Boolean),
+    Index('ix_user_username', 'username', unique=True),
+    Index('ix_user_email', 'email', unique=True),
+)
+
+transaction = Table(
+    'transaction', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('user_id', Integer, ForeignKey('user.id'), nullable=False),
+    Column('amount', Float, nullable=False),
+    Column('payment_method', String(50), nullable=False),
+    Column('status', String(20)),
+    Column('created_at', DateTime),
+    Column('updated_at', DateTime),
+    Column('transfer_title', String(200)),
+)
+
+transaction_item = Table(
+    'transaction_item', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('transaction_id', Integer, ForeignKey('transaction.id'), nullable=False),
+    Column('product_name', String(100), nullable=False),
+    Column('product_price', Float, nullable=False),
+    Column('quantity', Integer),
+)
+
+def upgrade(connection):
+    metadata.create_all(connection, checkfirst=True)
+
+def downgrade(connection):
+    metadata.drop_all(connection, checkfirst=True)
@@ -0,0 +1,27 @@
+from sqlalchemy import text
+
+revision = 2
+description = 'indexes for transaction hot paths'
+
+# (name, table, columns) - each one matches a query shape used by the controllers
+INDEXES = [
+    # get_user_transactions: WHERE user_id = ? ORDER BY created_at DESC
+    ('ix_transaction_user_created', 'transaction', ['user_id', 'created_at']),
+    # get_all_transactions keyset: ORDER BY created_at DESC, id DESC
+    ('ix_transaction_created_id', 'transaction', ['created_at', 'id']),
+    # get_all_transactions?status=: WHERE status = ? ORDER BY created_at DESC
+    ('ix_transaction_status_created', 'transaction', ['status', 'created_at']),
+    # export watermark: WHERE updated_at >= ? ORDER BY updated_at, id
+    ('ix_transaction_updated_id', 'transaction', ['updated_at', 'id']),
+    # transaction.items / selectinload: WHERE transaction_id IN (...)
+    ('ix_transaction_item_transaction_id', 'transaction_item', ['transaction_id']),
+]
+
+def upgrade(connection):
+    for name, table, columns in INDEXES:
+        column_list = ', '.join(columns)
+        connection.execute(text(f'CREATE INDEX IF NOT EXISTS {name} ON "{table}" ({column_list})'))
+
+def downgrade(connection):
+    for name, _, _ in reversed(INDEXES):
+        connection.execute(text(f'DROP INDEX IF EXISTS {name}'))
@@ -0,0 +1,30 @@
+from sqlalchemy import text
+
+revision = 3
+description = 'integer minor-unit money with currency code'
+
+# Stored totals are converted as-is: offline orders created before this revision
+# ignored item quantity, but the stored amount is what the customer was asked to transfer.
+def upgrade(connection):
+    for statement in [
+        'ALTER TABLE "transaction" ADD COLUMN amount_minor INTEGER NOT NULL DEFAULT 0',
+        "ALTER TABLE \"transaction\" ADD COLUMN currency VARCHAR(3) NOT NULL DEFAULT 'PLN'",
+        'UPDATE "transaction" SET amount_minor = CAST(ROUND(amount * 100) AS INTEGER)',
+        'ALTER TABLE "transaction" DROP COLUMN amount',
+        'ALTER TABLE transaction_item ADD COLUMN unit_price_minor INTEGER NOT NULL DEFAULT 0',
+        'UPDATE transaction_item SET unit_price_minor = CAST(ROUND(product_price * 100) AS INTEGER)',
+        'ALTER TABLE transaction_item DROP COLUMN product_price',
+    ]:
+        connection.execute(text(statement))
+
+def downgrade(connection):
+    for statement in [
+        'ALTER TABLE transaction_item ADD COLUMN product_price FLOAT NOT NULL DEFAULT 0',
+        'UPDATE transaction_item SET product_price = unit_price_minor / 100.0',
+        'ALTER TABLE transaction_item DROP COLUMN unit_price_minor',
+        'ALTER TABLE "transaction" ADD COLUMN amount FLOAT NOT NULL DEFAULT 0',
+        'UPDATE "transaction" SET amount = amount_minor / 100.0',
+        'ALTER TABLE "transaction" DROP COLUMN currency',
+        'ALTER TABLE "transaction" DROP COLUMN amount_minor',
+    ]:
+        connection.execute(text(statement))
@@ -0,0 +1,47 @@
+from sqlalchemy import MetaData, Table, Column, Integer, String, Date, text
+
+revision = 4
+description = 'daily sales rollup tables'
+
+metadata = MetaData()
+
+daily_sales = Table(
+    'daily_sales', metadata,
+    Column('day', Date, primary_key=True),
+    Column('status', String(20), primary_key=True),
+    Column('payment_method', String(50), primary_key=True),
+    Column('currency', String(3), primary_key=True),
+    Column('transaction_count', Integer, nullable=False, default=0),
+    Column('amount_minor', Integer, nullable=False, default=0),
+)
+
+daily_product_sales = Table(
+    'daily_product_sales', metadata,
+    Column('day', Date, primary_key=True),
+    Column('product_name', String(100), primary_key=True),
+    Column('status', String(20), primary_key=True),
+    Column('payment_method', String(50), primary_key=True),
+    Column('currency', String(3), primary_key=True),
+    Column('quantity', Integer, nullable=False, default=0),
+    Column('revenue_minor', Integer, nullable=False, default=0),
+)
+
+def upgrade(connection):
+    metadata.create_all(connection)
+    # Seed from existing history
+    connection.execute(text("""
+        INSERT INTO daily_sales (day, status, payment_method, currency, transaction_count, amount_minor)
+        SELECT DATE(created_at), COALESCE(status, 'pending'), payment_method, currency, COUNT(*), SUM(amount_minor)
+        FROM "transaction"
+        GROUP BY DATE(created_at), COALESCE(status, 'pending'), payment_method, currency
+    """))
+    connection.execute(text("""
+        INSERT INTO daily_product_sales (day, product_name, status, payment_method, currency, quantity, revenue_minor)
+        SELECT DATE(t.created_at), i.product_name, COALESCE(t.status, 'pending'), t.payment_method, t.currency,
+               SUM(COALESCE(i.quantity, 1)), SUM(i.unit_price_minor * COALESCE(i.quantity, 1))
+        FROM transaction_item i JOIN "transaction" t ON t.id = i.transaction_id
+        GROUP BY DATE(t.created_at), i.product_name, COALESCE(t.status, 'pending'), t.payment_method, t.currency
+    """))
+
+def downgrade(connection):
+    metadata.drop_all(connection)
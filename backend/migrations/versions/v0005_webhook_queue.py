@@ -0,0 +1,32 @@
+from sqlalchemy import MetaData, Table, Column, Integer, String, Text, DateTime, Index, text
+
+revision = 5
+description = 'stripe webhook event queue'
+
+metadata = MetaData()
+
+webhook_event = Table(
+    'webhook_event', metadata,
+    Column('id', String(255), primary_key=True),
+    Column('type', String(100), nullable=False),
+    Column('payload', Text, nullable=False),
+    Column('status', String(20), nullable=False, default='pending'),
+    Column('attempts', Integer, nullable=False, default=0),
+    Column('last_error', String(500)),
+    Column('received_at', DateTime, nullable=False),
+    Column('claimed_by', String(32)),
+    Column('claimed_at', DateTime),
+    Column('processed_at', DateTime),
+    Index('ix_webhook_event_status_received', 'status', 'received_at'),
+    Index('ix_webhook_event_claimed_by', 'claimed_by'),
+)
+
+def upgrade(connection):
+    metadata.create_all(connection)
+    connection.execute(text('ALTER TABLE "transaction" ADD COLUMN external_id VARCHAR(255)'))
+    connection.execute(text('CREATE UNIQUE INDEX ix_transaction_external_id ON "transaction" (external_id)'))
+
+def downgrade(connection):
+    connection.execute(text('DROP INDEX ix_transaction_external_id'))
+    connection.execute(text('ALTER TABLE "transaction" DROP COLUMN external_id'))
+    metadata.drop_all(connection)
@@ -0,0 +1,10 @@
+from sqlalchemy import text
+
+revision = 6
+description = 'user token version for JWT revocation'
+
+def upgrade(connection):
+    connection.execute(text('ALTER TABLE "user" ADD COLUMN token_version INTEGER NOT NULL DEFAULT 0'))
+
+def downgrade(connection):
+    connection.execute(text('ALTER TABLE "user" DROP COLUMN token_version'))
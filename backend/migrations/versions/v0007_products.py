@@ -0,0 +1,37 @@
+from sqlalchemy import MetaData, Table, Column, Integer, String, Boolean, DateTime
+from datetime import datetime
+
+revision = 7
+description = 'product catalog'
+
+metadata = MetaData()
+
+product = Table(
+    'product', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('name', String(100), nullable=False),
+    Column('description', String(255)),
+    Column('price_minor', Integer, nullable=False),
+    Column('currency', String(3), nullable=False, default='PLN'),
+    Column('image', String(100)),
+    Column('active', Boolean, nullable=False, default=True),
+    Column('updated_at', DateTime),
+)
+
+# Products previously hard-coded in src/Shop.jsx
+SEED = [
+    (1, 'Podkładka pod myszkę', 'Gamingowa podkładka pod myszkę', 2000, 'podkladka'),
+    (2, 'Gamingowy Kubek', 'Idealny na kawkę przy ulubionej grze', 1500, 'kubek'),
+    (3, 'Plakat Wiedźmin 3 - Dziki Gon', 'Panorama Novigrad', 4000, 'plakat'),
+]
+
+def upgrade(connection):
+    metadata.create_all(connection)
+    now = datetime.utcnow()
+    connection.execute(product.insert(), [{
+        'id': product_id, 'name': name, 'description': text, 'price_minor': price_minor,
+        'currency': 'PLN', 'image': image, 'active': True, 'updated_at': now
+    } for product_id, name, text, price_minor, image in SEED])
+
+def downgrade(connection):
+    metadata.drop_all(connection)
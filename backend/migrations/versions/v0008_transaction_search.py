@@ -0,0 +1,155 @@
+from sqlalchemy import text
+
+revision = 8
+description = 'full-text search index over transactions'
+
+# Frozen copy of the index DDL as services/search.py defined it at this revision, so later
+# changes to the live definitions do not change what this migration does
+
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS transaction_search USING fts5(
+        transfer_title, username, email, products, tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS transaction_search_insert AFTER INSERT ON "transaction" BEGIN
+        INSERT INTO transaction_search (rowid, transfer_title, username, email, products) VALUES (
+            NEW.id, NEW.transfer_title,
+            (SELECT username FROM "user" WHERE id = NEW.user_id),
+            (SELECT email FROM "user" WHERE id = NEW.user_id),
+            (SELECT group_concat(product_name, ' ') FROM transaction_item WHERE transaction_id = NEW.id)
+        );
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transaction_search_update AFTER UPDATE OF transfer_title, user_id ON "transaction" BEGIN
+        UPDATE transaction_search SET
+            transfer_title = NEW.transfer_title,
+            username = (SELECT username FROM "user" WHERE id = NEW.user_id),
+            email = (SELECT email FROM "user" WHERE id = NEW.user_id)
+        WHERE rowid = NEW.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transaction_search_delete AFTER DELETE ON "transaction" BEGIN
+        DELETE FROM transaction_search WHERE rowid = OLD.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transaction_search_item_insert AFTER INSERT ON transaction_item BEGIN
+        UPDATE transaction_search SET products = (
+            SELECT group_concat(product_name, ' ') FROM transaction_item WHERE transaction_id = NEW.transaction_id
+        ) WHERE rowid = NEW.transaction_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transaction_search_item_update AFTER UPDATE OF product_name, transaction_id ON transaction_item BEGIN
+        UPDATE transaction_search SET products = (
+            SELECT group_concat(product_name, ' ') FROM transaction_item WHERE transaction_id = transaction_search.rowid
+        ) WHERE rowid IN (OLD.transaction_id, NEW.transaction_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transaction_search_item_delete AFTER DELETE ON transaction_item BEGIN
+        UPDATE transaction_search SET products = (
+            SELECT group_concat(product_name, ' ') FROM transaction_item WHERE transaction_id = OLD.transaction_id
+        ) WHERE rowid = OLD.transaction_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transaction_search_user_update AFTER UPDATE OF username, email ON "user" BEGIN
+        UPDATE transaction_search SET username = NEW.username, email = NEW.email
+        WHERE rowid IN (SELECT id FROM "transaction" WHERE user_id = NEW.id);
+    END""",
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS transaction_search_user_update',
+    'DROP TRIGGER IF EXISTS transaction_search_item_delete',
+    'DROP TRIGGER IF EXISTS transaction_search_item_update',
+    'DROP TRIGGER IF EXISTS transaction_search_item_insert',
+    'DROP TRIGGER IF EXISTS transaction_search_delete',
+    'DROP TRIGGER IF EXISTS transaction_search_update',
+    'DROP TRIGGER IF EXISTS transaction_search_insert',
+    'DROP TABLE IF EXISTS transaction_search',
+]
+
+SQLITE_REBUILD = """
+    INSERT INTO transaction_search (rowid, transfer_title, username, email, products)
+    SELECT t.id, t.transfer_title, u.username, u.email,
+           (SELECT group_concat(product_name, ' ') FROM transaction_item WHERE transaction_id = t.id)
+    FROM "transaction" t LEFT JOIN "user" u ON u.id = t.user_id
+"""
+
+# Punctuation is folded to spaces before to_tsvector so "PAYMENT-1A2B" and "bob@example.com"
+# split into the same words FTS5's unicode61 tokenizer produces
+POSTGRES_DOCUMENT = """
+    to_tsvector('simple', regexp_replace(concat_ws(' ', t.transfer_title, u.username, u.email,
+        (SELECT string_agg(i.product_name, ' ') FROM transaction_item i WHERE i.transaction_id = t.id)
+    ), '[^[:alnum:]]+', ' ', 'g'))
+"""
+
+POSTGRES_DDL = [
+    """CREATE TABLE IF NOT EXISTS transaction_search (
+        transaction_id INTEGER PRIMARY KEY REFERENCES "transaction" (id) ON DELETE CASCADE,
+        document TSVECTOR NOT NULL
+    )""",
+    'CREATE INDEX IF NOT EXISTS ix_transaction_search_document ON transaction_search USING GIN (document)',
+    f"""CREATE OR REPLACE FUNCTION transaction_search_refresh(target INTEGER) RETURNS VOID AS $$
+        INSERT INTO transaction_search (transaction_id, document)
+        SELECT t.id, {POSTGRES_DOCUMENT}
+        FROM "transaction" t LEFT JOIN "user" u ON u.id = t.user_id
+        WHERE t.id = target
+        ON CONFLICT (transaction_id) DO UPDATE SET document = EXCLUDED.document
+    $$ LANGUAGE sql""",
+    """CREATE OR REPLACE FUNCTION transaction_search_on_transaction() RETURNS TRIGGER AS $$
+    BEGIN
+        PERFORM transaction_search_refresh(NEW.id);
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION transaction_search_on_item() RETURNS TRIGGER AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM transaction_search_refresh(OLD.transaction_id);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM transaction_search_refresh(NEW.transaction_id);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION transaction_search_on_user() RETURNS TRIGGER AS $$
+    BEGIN
+        PERFORM transaction_search_refresh(t.id) FROM "transaction" t WHERE t.user_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    'DROP TRIGGER IF EXISTS transaction_search_transaction ON "transaction"',
+    """CREATE TRIGGER transaction_search_transaction AFTER INSERT OR UPDATE OF transfer_title, user_id ON "transaction"
+        FOR EACH ROW EXECUTE FUNCTION transaction_search_on_transaction()""",
+    'DROP TRIGGER IF EXISTS transaction_search_item ON transaction_item',
+    """CREATE TRIGGER transaction_search_item AFTER INSERT OR UPDATE OF product_name, transaction_id OR DELETE ON transaction_item
+        FOR EACH ROW EXECUTE FUNCTION transaction_search_on_item()""",
+    'DROP TRIGGER IF EXISTS transaction_search_user ON "user"',
+    """CREATE TRIGGER transaction_search_user AFTER UPDATE OF username, email ON "user"
+        FOR EACH ROW EXECUTE FUNCTION transaction_search_on_user()""",
+]
+
+POSTGRES_DROP = [
+    'DROP TRIGGER IF EXISTS transaction_search_user ON "user"',
+    'DROP TRIGGER IF EXISTS transaction_search_item ON transaction_item',
+    'DROP TRIGGER IF EXISTS transaction_search_transaction ON "transaction"',
+    'DROP FUNCTION IF EXISTS transaction_search_on_user()',
+    'DROP FUNCTION IF EXISTS transaction_search_on_item()',
+    'DROP FUNCTION IF EXISTS transaction_search_on_transaction()',
+    'DROP FUNCTION IF EXISTS transaction_search_refresh(INTEGER)',
+    'DROP TABLE IF EXISTS transaction_search',
+]
+
+POSTGRES_REBUILD = f"""
+    INSERT INTO transaction_search (transaction_id, document)
+    SELECT t.id, {POSTGRES_DOCUMENT}
+    FROM "transaction" t LEFT JOIN "user" u ON u.id = t.user_id
+"""
+
+def _is_postgres(connection):
+    return connection.dialect.name == 'postgresql'
+
+def upgrade(connection):
+    for statement in POSTGRES_DDL if _is_postgres(connection) else SQLITE_DDL:
+        connection.execute(text(statement))
+    # Index existing history; triggers maintain it from here on
+    connection.execute(text(POSTGRES_REBUILD if _is_postgres(connection) else SQLITE_REBUILD))
+    if not _is_postgres(connection):
+        connection.execute(text("INSERT INTO transaction_search (transaction_search) VALUES ('optimize')"))
+
+def downgrade(connection):
+    for statement in POSTGRES_DROP if _is_postgres(connection) else SQLITE_DROP:
+        connection.execute(text(statement))
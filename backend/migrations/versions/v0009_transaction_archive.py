@@ -0,0 +1,59 @@
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, Index, text
+
+revision = 9
+description = 'archive tables for closed transactions'
+
+metadata = MetaData()
+
+transaction_archive = Table(
+    'transaction_archive', metadata,
+    Column('id', Integer, primary_key=True, autoincrement=False),
+    Column('user_id', Integer, nullable=False),
+    Column('amount_minor', Integer, nullable=False),
+    Column('currency', String(3), nullable=False, default='PLN'),
+    Column('payment_method', String(50), nullable=False),
+    Column('status', String(20)),
+    Column('created_at', DateTime),
+    Column('updated_at', DateTime),
+    Column('transfer_title', String(200)),
+    Column('external_id', String(255)),
+    Column('archived_at', DateTime, nullable=False),
+    Index('ix_transaction_archive_user_created', 'user_id', 'created_at', 'id'),
+    Index('ix_transaction_archive_external_id', 'external_id', unique=True),
+)
+
+transaction_item_archive = Table(
+    'transaction_item_archive', metadata,
+    Column('id', Integer, primary_key=True, autoincrement=False),
+    Column('transaction_id', Integer, nullable=False),
+    Column('product_name', String(100), nullable=False),
+    Column('unit_price_minor', Integer, nullable=False),
+    Column('quantity', Integer, default=1),
+    Index('ix_transaction_item_archive_transaction_id', 'transaction_id'),
+)
+
+transaction_archive_summary = Table(
+    'transaction_archive_summary', metadata,
+    Column('user_id', Integer, primary_key=True),
+    Column('currency', String(3), primary_key=True),
+    Column('transaction_count', Integer, nullable=False, default=0),
+    Column('amount_minor', Integer, nullable=False, default=0),
+)
+
+def upgrade(connection):
+    metadata.create_all(connection)
+
+def downgrade(connection):
+    # Archived rows go back to the hot tables instead of being dropped with the archive
+    connection.execute(text("""
+        INSERT INTO "transaction" (id, user_id, amount_minor, currency, payment_method, status,
+                                   created_at, updated_at, transfer_title, external_id)
+        SELECT id, user_id, amount_minor, currency, payment_method, status,
+               created_at, updated_at, transfer_title, external_id
+        FROM transaction_archive
+    """))
+    connection.execute(text("""
+        INSERT INTO transaction_item (id, transaction_id, product_name, unit_price_minor, quantity)
+        SELECT id, transaction_id, product_name, unit_price_minor, quantity FROM transaction_item_archive
+    """))
+    metadata.drop_all(connection)
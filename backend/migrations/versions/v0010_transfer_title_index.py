@@ -0,0 +1,11 @@
+from sqlalchemy import text
+
+revision = 10
+description = 'transfer title index for matching bank transfers'
+
+def upgrade(connection):
+    # Bulk status updates and reconciliation look transactions up by transfer_title
+    connection.execute(text('CREATE INDEX IF NOT EXISTS ix_transaction_transfer_title ON "transaction" (transfer_title)'))
+
+def downgrade(connection):
+    connection.execute(text('DROP INDEX IF EXISTS ix_transaction_transfer_title'))
@@ -0,0 +1,35 @@
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, Index, text
+
+revision = 11
+description = 'job scheduler lease and run history, overdue flag on transactions'
+
+metadata = MetaData()
+
+job_lock = Table(
+    'job_lock', metadata,
+    Column('name', String(50), primary_key=True),
+    Column('owner', String(100)),
+    Column('locked_until', DateTime, nullable=False),
+)
+
+job_run = Table(
+    'job_run', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('job', String(50), nullable=False),
+    Column('owner', String(100), nullable=False),
+    Column('status', String(20), nullable=False),
+    Column('started_at', DateTime, nullable=False),
+    Column('finished_at', DateTime),
+    Column('rows_processed', Integer, nullable=False, default=0),
+    Column('batches', Integer, nullable=False, default=0),
+    Column('error', String(500)),
+    Index('ix_job_run_job_started', 'job', 'started_at'),
+)
+
+def upgrade(connection):
+    metadata.create_all(connection)
+    connection.execute(text('ALTER TABLE "transaction" ADD COLUMN overdue_at TIMESTAMP'))
+
+def downgrade(connection):
+    connection.execute(text('ALTER TABLE "transaction" DROP COLUMN overdue_at'))
+    metadata.drop_all(connection)
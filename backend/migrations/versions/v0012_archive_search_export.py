@@ -0,0 +1,120 @@
+from sqlalchemy import text
+
+revision = 12
+description = 'archived transactions in search and ledger export'
+
+# Frozen copies of the search definitions introduced here (services/search.py holds the live ones)
+SQLITE_INDEX_ARCHIVED = """
+    INSERT INTO transaction_search (rowid, transfer_title, username, email, products)
+    SELECT t.id, t.transfer_title, u.username, u.email,
+           (SELECT group_concat(product_name, ' ') FROM transaction_item_archive WHERE transaction_id = t.id)
+    FROM transaction_archive t LEFT JOIN "user" u ON u.id = t.user_id
+"""
+
+SQLITE_TRIGGERS = [
+    """CREATE TRIGGER transaction_search_insert AFTER INSERT ON "transaction" BEGIN
+        DELETE FROM transaction_search WHERE rowid = NEW.id;
+        INSERT INTO transaction_search (rowid, transfer_title, username, email, products) VALUES (
+            NEW.id, NEW.transfer_title,
+            (SELECT username FROM "user" WHERE id = NEW.user_id),
+            (SELECT email FROM "user" WHERE id = NEW.user_id),
+            (SELECT group_concat(product_name, ' ') FROM transaction_item WHERE transaction_id = NEW.id)
+        );
+    END""",
+    """CREATE TRIGGER transaction_search_user_update AFTER UPDATE OF username, email ON "user" BEGIN
+        UPDATE transaction_search SET username = NEW.username, email = NEW.email
+        WHERE rowid IN (SELECT id FROM "transaction" WHERE user_id = NEW.id
+                        UNION ALL SELECT id FROM transaction_archive WHERE user_id = NEW.id);
+    END""",
+]
+
+POSTGRES_INDEX_ARCHIVED = """
+    INSERT INTO transaction_search (transaction_id, document)
+    SELECT t.id, to_tsvector('simple', regexp_replace(concat_ws(' ', t.transfer_title, u.username, u.email,
+        (SELECT string_agg(i.product_name, ' ') FROM transaction_item_archive i WHERE i.transaction_id = t.id)
+    ), '[^[:alnum:]]+', ' ', 'g'))
+    FROM transaction_archive t LEFT JOIN "user" u ON u.id = t.user_id
+"""
+
+POSTGRES_DDL = [
+    # Archived documents outlive their hot row, so the cascade becomes a delete trigger
+    'ALTER TABLE transaction_search DROP CONSTRAINT IF EXISTS transaction_search_transaction_id_fkey',
+    """CREATE OR REPLACE FUNCTION transaction_search_on_delete() RETURNS TRIGGER AS $$
+    BEGIN
+        DELETE FROM transaction_search WHERE transaction_id = OLD.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    f"""CREATE OR REPLACE FUNCTION transaction_search_on_user() RETURNS TRIGGER AS $$
+    BEGIN
+        PERFORM transaction_search_refresh(t.id) FROM "transaction" t WHERE t.user_id = NEW.id;
+        {POSTGRES_INDEX_ARCHIVED} WHERE t.user_id = NEW.id
+        ON CONFLICT (transaction_id) DO UPDATE SET document = EXCLUDED.document;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    'DROP TRIGGER IF EXISTS transaction_search_transaction_delete ON "transaction"',
+    """CREATE TRIGGER transaction_search_transaction_delete AFTER DELETE ON "transaction"
+        FOR EACH ROW EXECUTE FUNCTION transaction_search_on_delete()""",
+]
+
+# Definitions from revision 8 restored on downgrade; the current ones read transaction_archive,
+# which a further downgrade drops
+SQLITE_PREVIOUS = [
+    """CREATE TRIGGER transaction_search_insert AFTER INSERT ON "transaction" BEGIN
+        INSERT INTO transaction_search (rowid, transfer_title, username, email, products) VALUES (
+            NEW.id, NEW.transfer_title,
+            (SELECT username FROM "user" WHERE id = NEW.user_id),
+            (SELECT email FROM "user" WHERE id = NEW.user_id),
+            (SELECT group_concat(product_name, ' ') FROM transaction_item WHERE transaction_id = NEW.id)
+        );
+    END""",
+    """CREATE TRIGGER transaction_search_user_update AFTER UPDATE OF username, email ON "user" BEGIN
+        UPDATE transaction_search SET username = NEW.username, email = NEW.email
+        WHERE rowid IN (SELECT id FROM "transaction" WHERE user_id = NEW.id);
+    END""",
+]
+
+POSTGRES_PREVIOUS = [
+    'DROP TRIGGER IF EXISTS transaction_search_transaction_delete ON "transaction"',
+    'DROP FUNCTION IF EXISTS transaction_search_on_delete()',
+    """CREATE OR REPLACE FUNCTION transaction_search_on_user() RETURNS TRIGGER AS $$
+    BEGIN
+        PERFORM transaction_search_refresh(t.id) FROM "transaction" t WHERE t.user_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    """ALTER TABLE transaction_search ADD CONSTRAINT transaction_search_transaction_id_fkey
+        FOREIGN KEY (transaction_id) REFERENCES "transaction" (id) ON DELETE CASCADE""",
+]
+
+def upgrade(connection):
+    # Incremental ledger export reads the archive by updated_at, like the hot table
+    connection.execute(text(
+        'CREATE INDEX IF NOT EXISTS ix_transaction_archive_updated_id ON transaction_archive (updated_at, id)'
+    ))
+    if connection.dialect.name == 'postgresql':
+        for statement in POSTGRES_DDL:
+            connection.execute(text(statement))
+        connection.execute(text(POSTGRES_INDEX_ARCHIVED + """
+            WHERE NOT EXISTS (SELECT 1 FROM transaction_search s WHERE s.transaction_id = t.id)"""))
+    else:
+        connection.execute(text('DROP TRIGGER IF EXISTS transaction_search_insert'))
+        connection.execute(text('DROP TRIGGER IF EXISTS transaction_search_user_update'))
+        for statement in SQLITE_TRIGGERS:
+            connection.execute(text(statement))
+        connection.execute(text(SQLITE_INDEX_ARCHIVED + """
+            WHERE NOT EXISTS (SELECT 1 FROM transaction_search s WHERE s.rowid = t.id)"""))
+
+def downgrade(connection):
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text('DELETE FROM transaction_search WHERE transaction_id NOT IN (SELECT id FROM "transaction")'))
+        for statement in POSTGRES_PREVIOUS:
+            connection.execute(text(statement))
+    else:
+        connection.execute(text('DELETE FROM transaction_search WHERE rowid IN (SELECT id FROM transaction_archive)'))
+        connection.execute(text('DROP TRIGGER IF EXISTS transaction_search_insert'))
+        connection.execute(text('DROP TRIGGER IF EXISTS transaction_search_user_update'))
+        for statement in SQLITE_PREVIOUS:
+            connection.execute(text(statement))
+    connection.execute(text('DROP INDEX IF EXISTS ix_transaction_archive_updated_id'))
@@ -12,6 +12,7 @@ class User(db.Model, UserMixin):
     auth_method = db.Column(db.String(20), default='local') 
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_admin = db.Column(db.Boolean, default=False) 
+    token_version = db.Column(db.Integer, nullable=False, default=0)  # bumped to revoke issued JWTs
     
     def __repr__(self):
         return f'<User {self.username}>'
@@ -19,26 +20,181 @@ class User(db.Model, UserMixin):
 class Transaction(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount_minor = db.Column(db.Integer, nullable=False)  # grosze/cents
+    currency = db.Column(db.String(3), nullable=False, default='PLN')
     payment_method = db.Column(db.String(50), nullable=False) 
     status = db.Column(db.String(20), default='pending')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     transfer_title = db.Column(db.String(200))
+    external_id = db.Column(db.String(255))  # Stripe checkout session id
+    overdue_at = db.Column(db.DateTime)  # set by the pending expiry job when PENDING_EXPIRY_ACTION=flag
     
     user = db.relationship('User', backref=db.backref('transactions', lazy=True))
     
+    # Kept in sync with migrations/versions/v0002_transaction_indexes.py and v0010_transfer_title_index.py
+    __table_args__ = (
+        db.Index('ix_transaction_user_created', 'user_id', 'created_at'),
+        db.Index('ix_transaction_created_id', 'created_at', 'id'),
+        db.Index('ix_transaction_status_created', 'status', 'created_at'),
+        db.Index('ix_transaction_updated_id', 'updated_at', 'id'),
+        db.Index('ix_transaction_external_id', 'external_id', unique=True),
+        db.Index('ix_transaction_transfer_title', 'transfer_title'),
+    )
+    
     def __repr__(self):
         return f'<Transaction {self.id} - {self.status}>'
         
 class TransactionItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    transaction_id = db.Column(db.Integer, db.ForeignKey('transaction.id'), nullable=False)
+    transaction_id = db.Column(db.Integer, db.ForeignKey('transaction.id'), nullable=False, index=True)
     product_name = db.Column(db.String(100), nullable=False)
-    product_price = db.Column(db.Float, nullable=False)
+    unit_price_minor = db.Column(db.Integer, nullable=False)  # grosze/cents
     quantity = db.Column(db.Integer, default=1)
     
     transaction = db.relationship('Transaction', backref=db.backref('items', lazy=True))
     
     def __repr__(self):
         return f'<TransactionItem {self.product_name}>'
+
+# Closed transactions moved out of the hot tables by services/archive.py (`flask archive run`).
+# Same columns as Transaction/TransactionItem; ids are kept, so an archived order keeps its number.
+class TransactionArchive(db.Model):
+    __tablename__ = 'transaction_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    amount_minor = db.Column(db.Integer, nullable=False)
+    currency = db.Column(db.String(3), nullable=False, default='PLN')
+    payment_method = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.String(20))
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime)
+    transfer_title = db.Column(db.String(200))
+    external_id = db.Column(db.String(255))
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    
+    items = db.relationship('TransactionItemArchive', lazy=True,
+                            primaryjoin='TransactionArchive.id == foreign(TransactionItemArchive.transaction_id)')
+    
+    # Kept in sync with migrations/versions/v0009_transaction_archive.py and v0012
+    __table_args__ = (
+        db.Index('ix_transaction_archive_user_created', 'user_id', 'created_at', 'id'),
+        db.Index('ix_transaction_archive_external_id', 'external_id', unique=True),
+        db.Index('ix_transaction_archive_updated_id', 'updated_at', 'id'),
+    )
+    
+    def __repr__(self):
+        return f'<TransactionArchive {self.id} - {self.status}>'
+
+class TransactionItemArchive(db.Model):
+    __tablename__ = 'transaction_item_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    transaction_id = db.Column(db.Integer, nullable=False, index=True)
+    product_name = db.Column(db.String(100), nullable=False)
+    unit_price_minor = db.Column(db.Integer, nullable=False)
+    quantity = db.Column(db.Integer, default=1)
+    
+    def __repr__(self):
+        return f'<TransactionItemArchive {self.product_name}>'
+
+# Per-user totals of what was archived; answers "how much history is there" without touching the archive
+class TransactionArchiveSummary(db.Model):
+    __tablename__ = 'transaction_archive_summary'
+    user_id = db.Column(db.Integer, primary_key=True)
+    currency = db.Column(db.String(3), primary_key=True)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+    amount_minor = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<TransactionArchiveSummary {self.user_id} {self.currency}>'
+
+# Daily rollups maintained by services/reporting.py; rebuilt with `flask reports backfill`
+class DailySales(db.Model):
+    __tablename__ = 'daily_sales'
+    day = db.Column(db.Date, primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    payment_method = db.Column(db.String(50), primary_key=True)
+    currency = db.Column(db.String(3), primary_key=True)
+    transaction_count = db.Column(db.Integer, nullable=False, default=0)
+    amount_minor = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DailySales {self.day} {self.status} {self.payment_method}>'
+
+class DailyProductSales(db.Model):
+    __tablename__ = 'daily_product_sales'
+    day = db.Column(db.Date, primary_key=True)
+    product_name = db.Column(db.String(100), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    payment_method = db.Column(db.String(50), primary_key=True)
+    currency = db.Column(db.String(3), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue_minor = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<DailyProductSales {self.day} {self.product_name}>'
+
+class WebhookEvent(db.Model):
+    id = db.Column(db.String(255), primary_key=True)  # Stripe event id
+    type = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.String(500))
+    received_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_by = db.Column(db.String(32))
+    claimed_at = db.Column(db.DateTime)
+    processed_at = db.Column(db.DateTime)
+    
+    __table_args__ = (
+        db.Index('ix_webhook_event_status_received', 'status', 'received_at'),
+        db.Index('ix_webhook_event_claimed_by', 'claimed_by'),
+    )
+    
+    def __repr__(self):
+        return f'<WebhookEvent {self.id} {self.type} - {self.status}>'
+
+# Background jobs run by services/scheduler.py. A job runs in one process at a time: the
+# process holding the lease row until locked_until. Every run is recorded in job_run.
+class JobLock(db.Model):
+    __tablename__ = 'job_lock'
+    name = db.Column(db.String(50), primary_key=True)
+    owner = db.Column(db.String(100))
+    locked_until = db.Column(db.DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f'<JobLock {self.name} {self.owner}>'
+
+class JobRun(db.Model):
+    __tablename__ = 'job_run'
+    id = db.Column(db.Integer, primary_key=True)
+    job = db.Column(db.String(50), nullable=False)
+    owner = db.Column(db.String(100), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='running')  # running, succeeded, failed
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    rows_processed = db.Column(db.Integer, nullable=False, default=0)
+    batches = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.String(500))
+    
+    # Kept in sync with migrations/versions/v0011_job_scheduler.py
+    __table_args__ = (
+        db.Index('ix_job_run_job_started', 'job', 'started_at'),
+    )
+    
+    def __repr__(self):
+        return f'<JobRun {self.job} {self.status}>'
+
+# Served through services/catalog.py; payments are priced from here, not from the client
+class Product(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    description = db.Column(db.String(255))
+    price_minor = db.Column(db.Integer, nullable=False)  # grosze/cents
+    currency = db.Column(db.String(3), nullable=False, default='PLN')
+    image = db.Column(db.String(100))  # asset key resolved by the frontend
+    active = db.Column(db.Boolean, nullable=False, default=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<Product {self.id} {self.name}>'
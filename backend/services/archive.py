@@ -0,0 +1,131 @@
+from sqlalchemy import select, insert, func, literal
+from datetime import datetime, timedelta
+from models.models import (db, Transaction, TransactionItem, TransactionArchive, TransactionItemArchive,
+                           TransactionArchiveSummary)
+from services.database import dialect_insert
+from services.transaction_cache import history_cache
+from services.search import index_archived
+from services.extensions import AppExtension
+import threading
+
+# Only closed transactions are archived; pending ones can still be paid or cancelled
+ARCHIVED_STATUSES = ('approved', 'cancelled')
+
+TRANSACTION_COLUMNS = ['id', 'user_id', 'amount_minor', 'currency', 'payment_method', 'status',
+                       'created_at', 'updated_at', 'transfer_title', 'external_id']
+ITEM_COLUMNS = ['id', 'transaction_id', 'product_name', 'unit_price_minor', 'quantity']
+
+class TransactionArchiver:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.archived = 0
+        self.last_run = None
+
+    def init_app(self, app):
+        self.after_days = app.config.get('ARCHIVE_AFTER_DAYS', 365)
+        self.batch_size = app.config.get('ARCHIVE_BATCH_SIZE', 1000)
+        app.extensions['transaction_archiver'] = self
+
+    def _move_batch(self, cutoff, batch_size, archived_at):
+        # Range scans of ix_transaction_status_created, one per status; no ORDER BY, which would
+        # sort the whole candidate set. Each batch commits on its own so writers are never
+        # blocked for longer than one batch. SQLite numbers new rows max(id) + 1, so the newest
+        # transaction and the owner of the newest item stay hot: an archived id is never reused
+        newest = select(func.max(Transaction.id)).scalar_subquery()
+        newest_item_owner = select(TransactionItem.transaction_id).order_by(TransactionItem.id.desc()).limit(1).scalar_subquery()
+        candidates = select(Transaction.id).where(
+            Transaction.status.in_(ARCHIVED_STATUSES), Transaction.created_at < cutoff,
+            Transaction.id < newest, Transaction.id != func.coalesce(newest_item_owner, 0)
+        ).limit(batch_size)
+        ids = db.session.execute(candidates).scalars().all()
+        if not ids:
+            return 0, set()
+
+        # The filter is repeated in the copy: a row reopened since the SELECT stays hot
+        db.session.execute(insert(TransactionArchive).from_select(
+            TRANSACTION_COLUMNS + ['archived_at'],
+            select(*[Transaction.__table__.c[name] for name in TRANSACTION_COLUMNS], literal(archived_at)).where(
+                Transaction.id.in_(ids), Transaction.status.in_(ARCHIVED_STATUSES)
+            )
+        ))
+        moved = select(TransactionArchive.id).where(TransactionArchive.id.in_(ids))
+        db.session.execute(insert(TransactionItemArchive).from_select(
+            ITEM_COLUMNS,
+            select(*[TransactionItem.__table__.c[name] for name in ITEM_COLUMNS]).where(
+                TransactionItem.transaction_id.in_(moved)
+            )
+        ))
+
+        totals = db.session.execute(
+            select(TransactionArchive.user_id, TransactionArchive.currency,
+                   func.count(TransactionArchive.id), func.sum(TransactionArchive.amount_minor))
+            .where(TransactionArchive.id.in_(ids))
+            .group_by(TransactionArchive.user_id, TransactionArchive.currency)
+        ).all()
+        for user_id, currency, count, amount_minor in totals:
+            statement = dialect_insert(db.session.get_bind(), TransactionArchiveSummary.__table__).values(
+                user_id=user_id, currency=currency, transaction_count=count, amount_minor=amount_minor
+            )
+            db.session.execute(statement.on_conflict_do_update(
+                index_elements=['user_id', 'currency'],
+                set_={
+                    'transaction_count': TransactionArchiveSummary.transaction_count + statement.excluded.transaction_count,
+                    'amount_minor': TransactionArchiveSummary.amount_minor + statement.excluded.amount_minor
+                }
+            ))
+
+        db.session.query(TransactionItem).filter(TransactionItem.transaction_id.in_(moved)).delete(synchronize_session=False)
+        db.session.query(Transaction).filter(Transaction.id.in_(moved)).delete(synchronize_session=False)
+        # The delete triggers dropped their search documents; archived orders stay searchable
+        index_archived(db.session.connection(), ids)
+        db.session.commit()
+        return sum(count for _, _, count, _ in totals), {user_id for user_id, _, _, _ in totals}
+
+    def run(self, older_than_days=None, batch_size=None, max_batches=None, now=None):
+        # Rollups are not touched: archiving changes where a row lives, not its status or amount
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(days=self.after_days if older_than_days is None else older_than_days)
+        batch_size = batch_size or self.batch_size
+
+        archived = 0
+        batches = 0
+        users = set()
+        with self._lock:
+            while max_batches is None or batches < max_batches:
+                try:
+                    count, batch_users = self._move_batch(cutoff, batch_size, now)
+                except Exception:
+                    db.session.rollback()
+                    raise
+                if not count:
+                    break
+                archived += count
+                batches += 1
+                users |= batch_users
+                for user_id in batch_users:
+                    history_cache.invalidate(user_id)
+
+            self.runs += 1
+            self.archived += archived
+            self.last_run = {'at': now.isoformat(), 'cutoff': cutoff.isoformat(), 'archived': archived,
+                             'batches': batches, 'users': len(users)}
+        return self.last_run
+
+    def stats(self):
+        archived_total = db.session.query(func.coalesce(func.sum(TransactionArchiveSummary.transaction_count), 0)).scalar()
+        return {
+            'after_days': self.after_days,
+            'batch_size': self.batch_size,
+            'runs': self.runs,
+            'archived_by_this_process': self.archived,
+            'archived_total': archived_total,
+            'last_run': self.last_run
+        }
+
+def archived_count(user_id):
+    return db.session.query(
+        func.coalesce(func.sum(TransactionArchiveSummary.transaction_count), 0)
+    ).filter(TransactionArchiveSummary.user_id == user_id).scalar()
+
+transaction_archiver = AppExtension('transaction_archiver', TransactionArchiver)
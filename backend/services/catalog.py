@@ -0,0 +1,87 @@
+from models.models import Product
+from services.money import to_major_units
+from services.extensions import AppExtension
+import hashlib
+import json
+import threading
+import time
+
+class CatalogSnapshot:
+    # Immutable view of the catalog: pre-serialized response body plus id lookup for pricing
+    def __init__(self, products, body, etag, expires_at):
+        self.products = products
+        self.body = body
+        self.etag = etag
+        self.expires_at = expires_at
+
+def serialize_product(product):
+    return {
+        'id': product.id,
+        'name': product.name,
+        'description': product.description,
+        'price': to_major_units(product.price_minor),
+        'price_minor': product.price_minor,
+        'currency': product.currency,
+        'image': product.image
+    }
+
+class ProductCatalog:
+    def __init__(self):
+        self.ttl = 60
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._snapshot = None
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        # Writes invalidate this process immediately; other workers reload within the TTL
+        self.ttl = app.config.get('CATALOG_CACHE_TTL', 60)
+        app.extensions['product_catalog'] = self
+
+    def _load(self):
+        rows = Product.query.filter_by(active=True).order_by(Product.id).all()
+        products = {product.id: serialize_product(product) for product in rows}
+        body = json.dumps({'products': list(products.values())}, ensure_ascii=False, separators=(',', ':'))
+        # Content hash, so every worker derives the same ETag for the same catalog
+        etag = hashlib.sha256(body.encode('utf-8')).hexdigest()[:32]
+        return CatalogSnapshot(products, body, etag, time.monotonic() + self.ttl)
+
+    def snapshot(self):
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.expires_at > time.monotonic():
+            with self._lock:
+                self.hits += 1
+            return snapshot
+
+        with self._lock:
+            self.misses += 1
+            version = self._version
+        snapshot = self._load()
+        with self._lock:
+            # Skip the store if the catalog changed while we were loading
+            if self._version == version:
+                self._snapshot = snapshot
+        return snapshot
+
+    def get_product(self, product_id):
+        return self.snapshot().products.get(product_id)
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+            self._snapshot = None
+            self.invalidations += 1
+
+    def stats(self):
+        snapshot = self._snapshot
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'products': len(snapshot.products) if snapshot else None,
+            'etag': snapshot.etag if snapshot else None
+        }
+
+product_catalog = AppExtension('product_catalog', ProductCatalog)
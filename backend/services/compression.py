@@ -0,0 +1,75 @@
+from flask import request
+from services.extensions import AppExtension
+import gzip
+import threading
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+class ResponseCompressor:
+    # Compresses buffered JSON responses above COMPRESS_MIN_SIZE; brotli is used when the
+    # package is installed and the client accepts it, gzip otherwise
+    def __init__(self):
+        self.min_size = 1024
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.responses = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('COMPRESS_ENABLED', True)
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', 1024)
+        self.gzip_level = app.config.get('COMPRESS_GZIP_LEVEL', 6)
+        self.brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', 4)
+        self.mimetypes = set(app.config.get('COMPRESS_MIMETYPES', ['application/json']))
+        app.after_request(self._after_request)
+        app.extensions['response_compressor'] = self
+
+    def _choose_encoding(self):
+        accepted = request.accept_encodings
+        if brotli is not None and accepted['br']:
+            return 'br'
+        if accepted['gzip']:
+            return 'gzip'
+        return None
+
+    def _after_request(self, response):
+        if (not self.enabled or response.status_code != 200 or response.direct_passthrough
+                or response.is_streamed or 'Content-Encoding' in response.headers
+                or response.mimetype not in self.mimetypes):
+            return response
+
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self._choose_encoding()
+        if encoding is None:
+            return response
+
+        if encoding == 'br':
+            compressed = brotli.compress(data, quality=self.brotli_quality)
+        else:
+            compressed = gzip.compress(data, compresslevel=self.gzip_level)
+        response.set_data(compressed)
+        response.headers['Content-Encoding'] = encoding
+
+        with self._lock:
+            self.bytes_in += len(data)
+            self.bytes_out += len(compressed)
+            self.responses[encoding] = self.responses.get(encoding, 0) + 1
+        return response
+
+    def stats(self):
+        return {
+            'brotli_available': brotli is not None,
+            'responses': dict(self.responses),
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'ratio': round(self.bytes_out / self.bytes_in, 4) if self.bytes_in else None
+        }
+
+response_compressor = AppExtension('response_compressor', ResponseCompressor)
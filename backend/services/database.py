@@ -0,0 +1,62 @@
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+import os
+
+def _env_bool(environ, name, default):
+    return environ.get(name, str(default)).lower() in ('1', 'true', 'yes')
+
+def database_uri(environ=os.environ):
+    uri = environ.get('DATABASE_URL', 'sqlite:///users.db')
+    # Heroku-style URLs use the scheme SQLAlchemy dropped in 1.4
+    if uri.startswith('postgres://'):
+        uri = 'postgresql://' + uri[len('postgres://'):]
+    return uri
+
+def is_sqlite_memory(uri):
+    return uri in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in uri
+
+def engine_options(uri, environ=os.environ):
+    options = {
+        'pool_pre_ping': _env_bool(environ, 'DB_POOL_PRE_PING', True),
+        'pool_recycle': int(environ.get('DB_POOL_RECYCLE', 1800)),
+    }
+
+    if uri.startswith('sqlite'):
+        # pysqlite waits this long on a locked database before raising "database is locked"
+        options['connect_args'] = {
+            'timeout': int(environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)) / 1000,
+            'check_same_thread': False
+        }
+        if is_sqlite_memory(uri):
+            # In-memory databases get a StaticPool from Flask-SQLAlchemy
+            return options
+
+    options['pool_size'] = int(environ.get('DB_POOL_SIZE', 10))
+    options['max_overflow'] = int(environ.get('DB_MAX_OVERFLOW', 20))
+    options['pool_timeout'] = int(environ.get('DB_POOL_TIMEOUT', 30))
+    return options
+
+def sqlite_pragmas(environ=os.environ):
+    return {
+        'journal_mode': environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),
+    }
+
+def configure_engine(engine, pragmas):
+    # WAL lets readers run alongside the single writer, busy_timeout makes writers
+    # queue instead of failing, synchronous=NORMAL is durable under WAL except on power loss
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+def dialect_insert(bind, table):
+    # INSERT supporting ON CONFLICT for the dialects we run on
+    insert = postgresql.insert if bind.dialect.name == 'postgresql' else sqlite.insert
+    return insert(table)
@@ -0,0 +1,223 @@
+from sqlalchemy import select
+from datetime import datetime, timedelta
+from models.models import db, Transaction, User
+from services.extensions import AppExtension
+from services.money import to_major_units
+import json
+import queue
+import threading
+
+# Transaction change feed for Server-Sent Events. One poller thread per process follows
+# ix_transaction_updated_id and fans deltas out to subscribers of 'admin' and 'user:<id>'.
+# Reading the table instead of hooking the write paths means changes made by other gunicorn
+# workers, `flask webhooks work` and bulk Core inserts are pushed as well, for one indexed
+# query per interval per process while anyone is listening.
+# Event ids are the (updated_at, transaction id) position, so a client can resume from
+# Last-Event-ID on any worker. Deltas are full row snapshots, so replaying one twice is harmless.
+
+def event_id(updated_at, transaction_id):
+    return f'{updated_at.isoformat()}/{transaction_id}'
+
+def parse_event_id(value):
+    try:
+        updated_at, transaction_id = value.rsplit('/', 1)
+        return datetime.fromisoformat(updated_at), int(transaction_id)
+    except (ValueError, AttributeError):
+        return None
+
+def serialize_delta(row):
+    return {
+        'id': row.id,
+        'user_id': row.user_id,
+        'username': row.username,
+        'email': row.email,
+        'status': row.status,
+        'payment_method': row.payment_method,
+        'amount': to_major_units(row.amount_minor),
+        'amount_minor': row.amount_minor,
+        'currency': row.currency,
+        'transfer_title': row.transfer_title,
+        'created_at': row.created_at.strftime('%Y-%m-%d %H:%M:%S') if row.created_at else None,
+        'updated_at': row.updated_at.isoformat()
+    }
+
+def format_event(event_type, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id else []
+    lines.append(f'event: {event_type}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+RESET = ('reset', {'reason': 'resync'}, None)
+
+class Subscription:
+    def __init__(self, topics, buffer_size):
+        self.topics = topics
+        self.overflowed = False
+        self._queue = queue.Queue(maxsize=buffer_size)
+
+    def deliver(self, event):
+        # A subscriber that cannot keep up is not allowed to grow memory: its stream ends with
+        # a reset event and the client reloads the list once
+        try:
+            self._queue.put_nowait(event)
+            return True
+        except queue.Full:
+            self.overflowed = True
+            return False
+
+    def get(self, timeout):
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+class TransactionEventBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._seen = {}
+        self._watermark = None
+        self._poller = None
+        self._stop = threading.Event()
+        self.published = 0
+        self.dropped = 0
+        self.polls = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.poll_interval = app.config.get('EVENTS_POLL_INTERVAL', 1.0)
+        self.buffer_size = app.config.get('EVENTS_SUBSCRIBER_BUFFER', 100)
+        self.heartbeat = app.config.get('EVENTS_HEARTBEAT_SECONDS', 15)
+        self.max_stream_seconds = app.config.get('EVENTS_MAX_STREAM_SECONDS', 300)
+        self.resume_limit = app.config.get('EVENTS_RESUME_LIMIT', 500)
+        self.poll_batch = app.config.get('EVENTS_POLL_BATCH', 1000)
+        # Rows whose updated_at was taken before a slower concurrent commit landed are caught
+        # by re-reading this window; already published (id, updated_at) pairs are skipped
+        self.overlap = timedelta(seconds=app.config.get('EVENTS_OVERLAP_SECONDS', 5))
+        app.extensions['transaction_events'] = self
+
+    def _changes(self, since, user_id=None, limit=None):
+        statement = select(
+            Transaction.id, Transaction.user_id, Transaction.status, Transaction.payment_method,
+            Transaction.amount_minor, Transaction.currency, Transaction.transfer_title,
+            Transaction.created_at, Transaction.updated_at, User.username, User.email
+        ).outerjoin(User, User.id == Transaction.user_id).where(
+            Transaction.updated_at >= since
+        ).order_by(Transaction.updated_at, Transaction.id).limit(limit)
+        if user_id is not None:
+            statement = statement.where(Transaction.user_id == user_id)
+        return db.session.execute(statement).all()
+
+    def _replay_start(self, updated_at):
+        # A crafted id near datetime.min would overflow; clamped, it replays from the start
+        # (or resets past resume_limit) instead of failing the request
+        try:
+            return updated_at - self.overlap
+        except OverflowError:
+            return datetime.min
+
+    def subscribe(self, user_id, admin, last_event_id=None):
+        # Registered before the replay query, so nothing committed in between is lost
+        topics = {f'user:{user_id}'} | ({'admin'} if admin else set())
+        subscription = Subscription(topics, self.buffer_size)
+        with self._lock:
+            self._subscribers.add(subscription)
+        self._ensure_poller()
+
+        replay = []
+        try:
+            if last_event_id:
+                position = parse_event_id(last_event_id)
+                rows = self._changes(self._replay_start(position[0]), None if admin else user_id, self.resume_limit + 1) if position else None
+                if rows is None or len(rows) > self.resume_limit:
+                    replay.append(RESET)
+                else:
+                    replay.extend(('transaction', serialize_delta(row), event_id(row.updated_at, row.id)) for row in rows)
+        except Exception:
+            # A failed replay must not leave a subscriber nobody reads from
+            self.unsubscribe(subscription)
+            raise
+        return subscription, replay
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def publish(self, event, user_id=None):
+        topics = {'admin', f'user:{user_id}'} if user_id is not None else None
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            if topics is None or subscription.topics & topics:
+                if not subscription.deliver(event):
+                    with self._lock:
+                        self.dropped += 1
+        with self._lock:
+            self.published += 1
+
+    def _ensure_poller(self):
+        with self._lock:
+            if self._poller is not None:
+                return
+            self._stop.clear()
+            self._poller = threading.Thread(target=self._run, name='transaction-events', daemon=True)
+            self._poller.start()
+
+    def _run(self):
+        with self.app.app_context():
+            while not self._stop.wait(self.poll_interval):
+                with self._lock:
+                    if not self._subscribers:
+                        # Idle processes stop polling; the next subscriber starts a new thread
+                        self._poller = None
+                        self._watermark = None
+                        return
+                try:
+                    self.poll_once()
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception('Transaction event poll failed')
+                finally:
+                    db.session.remove()
+        with self._lock:
+            self._poller = None
+
+    def poll_once(self, now=None):
+        if self._watermark is None:
+            # Start from the present; older changes are served through Last-Event-ID replay
+            self._watermark = now or datetime.utcnow()
+        rows = self._changes(self._watermark - self.overlap, limit=self.poll_batch)
+        self.polls += 1
+
+        fresh = [row for row in rows if (row.id, row.updated_at) not in self._seen]
+        for row in fresh:
+            self._seen[(row.id, row.updated_at)] = row.updated_at
+            self.publish(('transaction', serialize_delta(row), event_id(row.updated_at, row.id)), row.user_id)
+
+        if rows:
+            self._watermark = max(self._watermark, rows[-1].updated_at)
+            if len(rows) == self.poll_batch and not fresh:
+                # More changes share the window than one batch holds (bulk import): skip past
+                # them and tell every client to reload instead of streaming thousands of deltas
+                self._watermark = rows[-1].updated_at + timedelta(microseconds=1)
+                self.publish(RESET)
+
+        horizon = self._watermark - self.overlap * 2
+        for key in [key for key, updated_at in self._seen.items() if updated_at < horizon]:
+            del self._seen[key]
+        return len(fresh)
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'subscribers': len(self._subscribers),
+                'published': self.published,
+                'dropped': self.dropped,
+                'polls': self.polls,
+                'polling': self._poller is not None
+            }
+
+transaction_events = AppExtension('transaction_events', TransactionEventBroker)
@@ -0,0 +1,77 @@
+from sqlalchemy import select, update
+from datetime import datetime, timedelta
+from models.models import db, Transaction
+from services.status_updates import apply_status_updates, TARGET_COLUMNS
+from services.extensions import AppExtension
+
+# Offline payments nobody paid for within PENDING_EXPIRY_HOURS are cancelled (or, with
+# PENDING_EXPIRY_ACTION=flag, only marked overdue_at) so the pending set, which every admin
+# listing by status scans, stops growing. Runs as the 'expire_pending' scheduler job.
+EXPIRY_ACTIONS = ('cancel', 'flag')
+
+class PendingExpirer:
+    def init_app(self, app):
+        self.after_hours = app.config.get('PENDING_EXPIRY_HOURS', 72)
+        self.action = app.config.get('PENDING_EXPIRY_ACTION', 'cancel')
+        if self.action not in EXPIRY_ACTIONS:
+            raise ValueError(f'PENDING_EXPIRY_ACTION must be one of {", ".join(EXPIRY_ACTIONS)}')
+        self.batch_size = app.config.get('PENDING_EXPIRY_BATCH_SIZE', 500)
+        app.extensions['pending_expirer'] = self
+
+    def _candidates(self, cutoff, after, batch_size):
+        # Oldest first along ix_transaction_status_created. Rows already handled drop out of the
+        # range (cancelled) or are skipped by the overdue_at filter; `after` moves the scan past
+        # them so a run never re-reads what it has flagged
+        statement = select(*TARGET_COLUMNS).where(
+            Transaction.status == 'pending',
+            Transaction.payment_method == 'offline',
+            Transaction.created_at < cutoff
+        ).order_by(Transaction.created_at).limit(batch_size)
+        if after is not None:
+            statement = statement.where(Transaction.created_at >= after)
+        if self.action == 'flag':
+            statement = statement.where(Transaction.overdue_at.is_(None))
+        return db.session.execute(statement).all()
+
+    def run(self, renew=None, older_than_hours=None, batch_size=None, max_batches=None, now=None):
+        now = now or datetime.utcnow()
+        cutoff = now - timedelta(hours=self.after_hours if older_than_hours is None else older_than_hours)
+        batch_size = batch_size or self.batch_size
+
+        processed = conflicts = batches = 0
+        after = None
+        while max_batches is None or batches < max_batches:
+            rows = self._candidates(cutoff, after, batch_size)
+            if not rows:
+                break
+            if self.action == 'cancel':
+                # Same path as an admin cancelling them: rollups, history cache and the status
+                # guard, so a payment approved meanwhile is left alone
+                count, results = apply_status_updates(
+                    [{'index': position, 'transaction_id': row.id, 'status': 'cancelled'}
+                     for position, row in enumerate(rows)],
+                    now=now, targets={row.id: row for row in rows}
+                )
+                conflicts += sum(1 for result in results if result['status'] == 'conflict')
+            else:
+                count = db.session.execute(
+                    update(Transaction).where(
+                        Transaction.id.in_([row.id for row in rows]),
+                        Transaction.status == 'pending',
+                        Transaction.overdue_at.is_(None)
+                    ).values(overdue_at=now, updated_at=now)
+                    .execution_options(synchronize_session=False)
+                ).rowcount
+                db.session.commit()
+            processed += count
+            batches += 1
+            after = rows[-1].created_at
+            if renew is not None:
+                renew()
+            if len(rows) < batch_size:
+                break
+
+        return {'processed': processed, 'batches': batches, 'conflicts': conflicts,
+                'action': self.action, 'cutoff': cutoff.isoformat()}
+
+pending_expirer = AppExtension('pending_expirer', PendingExpirer)
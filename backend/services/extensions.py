@@ -0,0 +1,33 @@
+from flask import current_app
+
+class AppExtension:
+    # Module-level handle for an extension whose state belongs to one app. init_app(app)
+    # builds a fresh instance in app.extensions[name] and attribute access is forwarded to
+    # the instance of current_app, so a second create_app() cannot reconfigure the first
+    def __init__(self, name, factory):
+        self._name = name
+        self._factory = factory
+
+    def init_app(self, app, *args):
+        instance = self._factory()
+        instance.init_app(app, *args)
+        app.extensions[self._name] = instance
+        return instance
+
+    def for_app(self, app):
+        return app.extensions[self._name]
+
+    def _get(self):
+        return current_app.extensions[self._name]
+
+    def __getattr__(self, attribute):
+        return getattr(self._get(), attribute)
+
+    def __setattr__(self, attribute, value):
+        if attribute.startswith('_'):
+            super().__setattr__(attribute, value)
+        else:
+            setattr(self._get(), attribute, value)
+
+    def __repr__(self):
+        return f'<AppExtension {self._name}>'
@@ -0,0 +1,15 @@
+from werkzeug.security import generate_password_hash, check_password_hash
+import time
+
+# Runs inside the password hashing pool processes. Kept free of app imports: the pool
+# workers are started from a forkserver and only need werkzeug to import this module.
+# Tasks report their own start time so the caller can tell queueing delay apart from
+# hashing cost.
+
+def hash_task(password, method):
+    started = time.time()
+    return generate_password_hash(password, method=method), started, time.time() - started
+
+def check_task(pwhash, password):
+    started = time.time()
+    return check_password_hash(pwhash, password), started, time.time() - started
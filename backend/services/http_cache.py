@@ -0,0 +1,33 @@
+from flask import request, Response
+from datetime import timezone
+import hashlib
+
+# Conditional GET helpers. Validators are computed before the response body so that a
+# matching If-None-Match / If-Modified-Since skips loading and serializing the payload.
+# ETags are weak: the same representation may be sent gzip, brotli or identity encoded.
+
+def make_etag(*parts):
+    return hashlib.sha1(':'.join(str(part) for part in parts).encode('utf-8')).hexdigest()[:24]
+
+def _as_utc(value):
+    return value.replace(tzinfo=timezone.utc, microsecond=0) if value else None
+
+def add_validators(response, etag, last_modified=None):
+    response.set_etag(etag, weak=True)
+    if last_modified:
+        response.last_modified = _as_utc(last_modified)
+    # Private data: browsers may keep it but must revalidate on every use
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def not_modified(etag, last_modified=None):
+    # If-None-Match takes precedence; Last-Modified has one-second resolution only
+    if request.if_none_match:
+        matched = request.if_none_match.contains_weak(etag)
+    elif last_modified and request.if_modified_since:
+        matched = _as_utc(last_modified) <= request.if_modified_since
+    else:
+        matched = False
+    if not matched:
+        return None
+    return add_validators(Response(status=304), etag, last_modified)
@@ -0,0 +1,178 @@
+from flask import g, request, has_request_context, Response
+from flask_login import current_user
+from sqlalchemy import event
+from collections import Counter, defaultdict
+from services.extensions import AppExtension
+import bisect
+import hmac
+import threading
+import time
+
+DURATION_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0]
+QUERY_BUCKETS = [0, 1, 2, 5, 10, 20, 50, 100, 200]
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def exposition(self, name, labels=''):
+        lines = []
+        cumulative = 0
+        prefix = f'{labels},' if labels else ''
+        suffix = f'{{{labels}}}' if labels else ''
+        for bound, count in zip(self.buckets + [float('inf')], self.counts):
+            cumulative += count
+            le = '+Inf' if bound == float('inf') else repr(bound)
+            lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {cumulative}')
+        lines.append(f'{name}_sum{suffix} {self.sum:.6f}')
+        lines.append(f'{name}_count{suffix} {self.count}')
+        return lines
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+class RequestMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._durations = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+        self._sql_durations = defaultdict(lambda: Histogram(DURATION_BUCKETS))
+        self._queries = defaultdict(lambda: Histogram(QUERY_BUCKETS))
+        self._requests = Counter()
+        self._n_plus_one = Counter()
+        self._collectors = []
+        self._histograms = []
+
+    def init_app(self, app, engine):
+        self.app = app
+        self.query_threshold = app.config.get('SQL_QUERY_WARN_THRESHOLD', 20)
+        self.server_timing = app.config.get('SERVER_TIMING_HEADER', True)
+        self.metrics_token = app.config.get('METRICS_TOKEN')
+        # Collectors are registered per app; a new app (tests, factory reuse) starts clean
+        self._collectors = []
+        self._histograms = []
+
+        event.listen(engine, 'before_cursor_execute', self._before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_cursor_execute)
+        event.listen(engine, 'handle_error', self._handle_error)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+        app.extensions['request_metrics'] = self
+
+    def add_collector(self, collector):
+        # collector() returns (name, type, help, [(labels, value)]) tuples for extra gauges/counters
+        self._collectors.append(collector)
+
+    def add_histogram(self, name, help_text, histogram):
+        # Histograms owned by other services, e.g. password hashing latency
+        self._histograms.append((name, help_text, histogram))
+
+    def _before_request(self):
+        g.request_started = time.perf_counter()
+        g.sql_count = 0
+        g.sql_time = 0.0
+        g.sql_statements = Counter()
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        # Worker threads (webhooks, scheduler) run SQL without a request to attribute it to
+        if has_request_context() and 'sql_count' in g:
+            g.sql_count += 1
+            g.sql_time += elapsed
+            g.sql_statements[statement] += 1
+
+    def _handle_error(self, exception_context):
+        started = exception_context.connection.info.get('query_started') if exception_context.connection else None
+        if started:
+            started.pop()
+
+    def _after_request(self, response):
+        if 'request_started' not in g:
+            return response
+        duration = time.perf_counter() - g.request_started
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        method = request.method
+
+        with self._lock:
+            self._durations[(endpoint, method)].observe(duration)
+            self._sql_durations[(endpoint, method)].observe(g.sql_time)
+            self._queries[(endpoint, method)].observe(g.sql_count)
+            self._requests[(endpoint, method, response.status_code)] += 1
+
+        if g.sql_count > self.query_threshold:
+            statement, repeats = g.sql_statements.most_common(1)[0]
+            with self._lock:
+                self._n_plus_one[endpoint] += 1
+            self.app.logger.warning(
+                'Possible N+1 on %s %s: %d SQL statements (%.1f ms); most repeated x%d: %s',
+                method, endpoint, g.sql_count, g.sql_time * 1000, repeats, ' '.join(statement.split())[:200]
+            )
+
+        if self.server_timing:
+            response.headers.add('Server-Timing', f'app;dur={duration * 1000:.1f}')
+            response.headers.add('Server-Timing', f'db;dur={g.sql_time * 1000:.1f};desc="{g.sql_count} queries"')
+        return response
+
+    def exposition(self):
+        lines = []
+        with self._lock:
+            for name, help_text, histograms in (
+                ('http_request_duration_seconds', 'Request wall time', self._durations),
+                ('http_request_sql_duration_seconds', 'Time spent in SQL per request', self._sql_durations),
+                ('http_request_sql_queries', 'SQL statements per request', self._queries),
+            ):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for (endpoint, method), histogram in sorted(histograms.items()):
+                    lines.extend(histogram.exposition(name, f'endpoint="{_escape(endpoint)}",method="{method}"'))
+
+            lines.append('# HELP http_requests_total Requests by endpoint and status')
+            lines.append('# TYPE http_requests_total counter')
+            for (endpoint, method, status), count in sorted(self._requests.items()):
+                lines.append(f'http_requests_total{{endpoint="{_escape(endpoint)}",method="{method}",status="{status}"}} {count}')
+
+            lines.append('# HELP http_request_n_plus_one_total Requests over the SQL statement threshold')
+            lines.append('# TYPE http_request_n_plus_one_total counter')
+            for endpoint, count in sorted(self._n_plus_one.items()):
+                lines.append(f'http_request_n_plus_one_total{{endpoint="{_escape(endpoint)}"}} {count}')
+
+        for name, help_text, histogram in self._histograms:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} histogram')
+            lines.extend(histogram.exposition(name))
+
+        for collector in self._collectors:
+            for name, metric_type, help_text, samples in collector():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {metric_type}')
+                for labels, value in samples:
+                    label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                    lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def _metrics_allowed(self):
+        # Scrapers send METRICS_TOKEN as a Bearer token; otherwise only a logged-in admin.
+        # Without a token configured the endpoint is closed to anonymous clients
+        # Compared as bytes: compare_digest rejects str with non-ASCII characters
+        if self.metrics_token and hmac.compare_digest(request.headers.get('Authorization', '').encode(),
+                                                      f'Bearer {self.metrics_token}'.encode()):
+            return True
+        return current_user.is_authenticated and current_user.is_admin
+
+    def metrics_view(self):
+        if not self._metrics_allowed():
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+        return Response(self.exposition(), mimetype='text/plain; version=0.0.4')
+
+request_metrics = AppExtension('request_metrics', RequestMetrics)
@@ -0,0 +1,26 @@
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+DEFAULT_CURRENCY = 'PLN'
+
+def to_minor_units(value):
+    # Stripe-style unit_amount: a whole number of grosze/cents. Values such as
+    # 1999.0000000002 coming from client-side float math are rounded to the nearest unit.
+    if isinstance(value, bool):
+        raise ValueError('Invalid amount')
+    try:
+        amount = Decimal(str(value)).quantize(Decimal(1), rounding=ROUND_HALF_UP)
+    except (InvalidOperation, ValueError, TypeError):
+        raise ValueError('Invalid amount')
+    if amount < 0:
+        raise ValueError('Invalid amount')
+    return int(amount)
+
+def to_major_units(amount_minor):
+    # For JSON display only; sums and comparisons stay on the integer value
+    return amount_minor / 100 if amount_minor is not None else None
+
+def normalize_currency(value):
+    currency = (value or DEFAULT_CURRENCY).upper()
+    if len(currency) != 3 or not currency.isalpha():
+        raise ValueError('Invalid currency')
+    return currency
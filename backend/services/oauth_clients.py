@@ -0,0 +1,88 @@
+from flask import current_app
+import threading
+import time
+
+GOOGLE_METADATA_URL = 'https://accounts.google.com/.well-known/openid-configuration'
+
+def _google(config):
+    return {
+        'client_id': config.get('GOOGLE_CLIENT_ID'),
+        'client_secret': config.get('GOOGLE_CLIENT_SECRET'),
+        'server_metadata_url': GOOGLE_METADATA_URL,
+        'client_kwargs': {'scope': 'openid email profile', 'default_timeout': config.get('OAUTH_TIMEOUT', 10)},
+    }
+
+def _github(config):
+    return {
+        'client_id': config.get('GITHUB_CLIENT_ID'),
+        'client_secret': config.get('GITHUB_CLIENT_SECRET'),
+        'access_token_url': 'https://github.com/login/oauth/access_token',
+        'access_token_params': None,
+        'authorize_url': 'https://github.com/login/oauth/authorize',
+        'authorize_params': None,
+        'api_base_url': 'https://api.github.com/',
+        'client_kwargs': {'scope': 'user:email', 'default_timeout': config.get('OAUTH_TIMEOUT', 10)},
+    }
+
+PROVIDERS = {
+    'google': _google,
+    'github': _github,
+}
+
+# OpenID discovery documents, shared by every app in the process: url -> (metadata, expires_at)
+_metadata_cache = {}
+_metadata_lock = threading.Lock()
+
+def openid_metadata(url, ttl, timeout):
+    entry = _metadata_cache.get(url)
+    if entry and entry[1] > time.monotonic():
+        return entry[0]
+    import requests
+    with _metadata_lock:
+        entry = _metadata_cache.get(url)
+        if entry and entry[1] > time.monotonic():
+            return entry[0]
+        response = requests.get(url, timeout=timeout)
+        response.raise_for_status()
+        metadata = response.json()
+        metadata['_loaded_at'] = time.time()
+        _metadata_cache[url] = (metadata, time.monotonic() + ttl)
+        return metadata
+
+class LazyOAuth:
+    # Providers are registered on the first OAuth request instead of at boot; authlib
+    # itself is imported then too
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.extensions['lazy_oauth'] = self
+        app.extensions['oauth_clients'] = {}
+
+    def _registry(self, app):
+        registry = app.extensions.get('authlib.integrations.flask_client')
+        if registry is None:
+            from authlib.integrations.flask_client import OAuth
+            registry = OAuth(app)
+        return registry
+
+    def client(self, name):
+        app = current_app._get_current_object()
+        clients = app.extensions['oauth_clients']
+        client = clients.get(name)
+        if client is None:
+            with self._lock:
+                client = clients.get(name)
+                if client is None:
+                    client = self._registry(app).register(name=name, **PROVIDERS[name](app.config))
+                    clients[name] = client
+
+        metadata_url = getattr(client, '_server_metadata_url', None)
+        if metadata_url:
+            # Pre-populating server_metadata stops authlib from fetching it per client
+            client.server_metadata.update(openid_metadata(
+                metadata_url, app.config.get('OAUTH_METADATA_TTL', 86400), app.config.get('OAUTH_TIMEOUT', 10)
+            ))
+        return client
+
+oauth_clients = LazyOAuth()
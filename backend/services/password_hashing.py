@@ -0,0 +1,125 @@
+from werkzeug.security import generate_password_hash
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from services.instrumentation import Histogram, DURATION_BUCKETS
+from services.hashing_worker import hash_task, check_task
+from services.extensions import AppExtension
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+
+WORKER_MODULE = 'services.hashing_worker'
+
+def _pool_context():
+    # The pool is created lazily, when scheduler, webhook and request threads already run;
+    # forking then could copy a lock held by one of them. A forkserver is started from a
+    # clean single-threaded process and preloads only the slim task module (spawn where
+    # forkserver is unavailable, e.g. Windows). Pool workers still import the __main__
+    # script as __mp_main__ (gunicorn's launcher, or app.py without running its main
+    # block), so scripts that hash with workers > 0 need an `if __name__ == '__main__'` guard
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload([WORKER_MODULE])
+        return context
+    return multiprocessing.get_context('spawn')
+
+class HashingBusy(Exception):
+    pass
+
+class PasswordHasher:
+    def __init__(self):
+        self._executor = None
+        self._executor_pid = None
+        self._executor_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.hash_seconds = Histogram(DURATION_BUCKETS)
+        self.queue_wait_seconds = Histogram(DURATION_BUCKETS)
+        self.rejected = 0
+        self.rehashed = 0
+
+    def init_app(self, app):
+        self.method = app.config.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+        # 0 workers hashes inline on the request thread (tests, single-process tools)
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 1)
+        self.max_pending = app.config.get('PASSWORD_HASH_MAX_PENDING', max(self.workers, 1) * 4)
+        self.queue_timeout = app.config.get('PASSWORD_HASH_QUEUE_TIMEOUT', 2.0)
+        self._prefix = None
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        app.extensions['password_hasher'] = self
+
+    def _get_executor(self):
+        with self._executor_lock:
+            # A pool inherited from a parent process (e.g. gunicorn preload) is unusable
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=_pool_context())
+                self._executor_pid = os.getpid()
+                atexit.register(self._executor.shutdown, wait=False, cancel_futures=True)
+            return self._executor
+
+    def _reset_executor(self, executor):
+        with self._executor_lock:
+            if self._executor is executor:
+                self._executor = None
+
+    def _run(self, task, *args):
+        submitted = time.time()
+        # Bounded admission: past max_pending in-flight hashes callers wait, then give up
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._stats_lock:
+                self.rejected += 1
+            raise HashingBusy()
+        try:
+            if self.workers:
+                executor = self._get_executor()
+                try:
+                    result, started, duration = executor.submit(task, *args).result()
+                except BrokenProcessPool:
+                    # A killed worker breaks the whole pool; start a fresh one on the next call
+                    self._reset_executor(executor)
+                    raise
+            else:
+                result, started, duration = task(*args)
+        finally:
+            self._slots.release()
+
+        with self._stats_lock:
+            self.queue_wait_seconds.observe(max(started - submitted, 0.0))
+            self.hash_seconds.observe(duration)
+        return result
+
+    def hash(self, password):
+        return self._run(hash_task, password, self.method)
+
+    def verify(self, pwhash, password):
+        return self._run(check_task, pwhash, password)
+
+    def _method_prefix(self):
+        # Werkzeug expands short names ('pbkdf2' -> 'pbkdf2:sha256:600000', 'scrypt' ->
+        # 'scrypt:32768:8:1'); the stored prefix is the expanded one. Derived from one real
+        # hash on first use rather than in init_app, which would add a full hash to every boot
+        if self._prefix is None:
+            self._prefix = generate_password_hash('', method=self.method).split('$', 1)[0]
+        return self._prefix
+
+    def needs_rehash(self, pwhash):
+        # Werkzeug hashes are "method$salt$hash"; rehash when the configured method changed
+        return pwhash.split('$', 1)[0] != self._method_prefix()
+
+    def record_rehash(self):
+        with self._stats_lock:
+            self.rehashed += 1
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'rejected': self.rejected,
+            'rehashed': self.rehashed,
+            'hashes': self.hash_seconds.count,
+            'avg_hash_ms': round(self.hash_seconds.sum / self.hash_seconds.count * 1000, 2) if self.hash_seconds.count else 0.0,
+            'avg_queue_wait_ms': round(self.queue_wait_seconds.sum / self.queue_wait_seconds.count * 1000, 2) if self.queue_wait_seconds.count else 0.0
+        }
+
+password_hasher = AppExtension('password_hasher', PasswordHasher)
@@ -0,0 +1,173 @@
+from flask import request, jsonify
+from flask_login import current_user
+from services.extensions import AppExtension
+from collections import Counter
+from functools import wraps
+import math
+import threading
+import time
+
+class RateLimit:
+    # `count` requests per `period` seconds, with bursts of up to `count`
+    def __init__(self, count, period):
+        if count < 1 or period <= 0:
+            raise ValueError('Invalid rate limit')
+        self.count = count
+        self.period = period
+        self.interval = period / count
+
+    @classmethod
+    def parse(cls, value):
+        # '10/60' -> 10 requests per 60 seconds
+        count, period = str(value).split('/')
+        return cls(int(count), float(period))
+
+    def __repr__(self):
+        return f'<RateLimit {self.count}/{self.period:g}s>'
+
+def _gcra(tat, now, limit):
+    # Token bucket expressed as GCRA: the bucket is one timestamp, the "theoretical
+    # arrival time" of the next request. Returns (new tat or None, retry_after)
+    tat = max(tat if tat is not None else now, now)
+    new_tat = tat + limit.interval
+    if new_tat - now > limit.period:
+        return None, new_tat - limit.period - now
+    return new_tat, 0.0
+
+class InProcessBucketStore:
+    # Lock-free: each take is a dict read and a dict write, both atomic under the GIL.
+    # Two threads racing on one key may both pass, which costs at most one extra request
+    # per racing thread and never blocks a worker.
+    def __init__(self, sweep_every=10000):
+        self._tats = {}
+        self._sweep_every = sweep_every
+        self._takes = 0
+
+    def take(self, key, limit):
+        now = time.monotonic()
+        new_tat, retry_after = _gcra(self._tats.get(key), now, limit)
+        if new_tat is None:
+            return False, retry_after
+        self._tats[key] = new_tat
+        self._takes += 1
+        if self._takes % self._sweep_every == 0:
+            self._sweep(now)
+        return True, 0.0
+
+    def _sweep(self, now):
+        # Buckets whose timestamp is in the past are full again and can be forgotten
+        for key, tat in list(self._tats.items()):
+            if tat < now and self._tats.get(key) == tat:
+                self._tats.pop(key, None)
+
+    def __len__(self):
+        return len(self._tats)
+
+class LocalSharedBucketStore:
+    # Stand-in for a store shared by all workers (e.g. Redis running the same GCRA in a
+    # Lua script): atomic per call and keyed on wall-clock time. Used in tests and on
+    # single-process deployments that want exact limits.
+    def __init__(self):
+        self._tats = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, limit):
+        with self._lock:
+            now = time.time()
+            new_tat, retry_after = _gcra(self._tats.get(key), now, limit)
+            if new_tat is None:
+                return False, retry_after
+            self._tats[key] = new_tat
+            return True, 0.0
+
+    def __len__(self):
+        return len(self._tats)
+
+def _client_ip():
+    # The proxy's address unless TRUSTED_PROXIES installs ProxyFix in create_app
+    return request.remote_addr
+
+def _posted_username():
+    # Read from the body without touching the database
+    username = (request.get_json(silent=True) or {}).get('username')
+    return username.strip().lower() if isinstance(username, str) and username.strip() else None
+
+def _current_user_id():
+    return current_user.id if current_user.is_authenticated else None
+
+KEY_FUNCTIONS = {
+    'ip': _client_ip,
+    'username': _posted_username,
+    'user': _current_user_id,
+}
+
+class RateLimiter:
+    # Any object with take(key, limit) -> (allowed, retry_after) can replace the
+    # in-process store through RATE_LIMIT_BACKEND or set_backend()
+    def __init__(self, store=None):
+        self.store = store or InProcessBucketStore()
+        self.enabled = True
+        self.rules = {}
+        self.rejected = Counter()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('RATE_LIMIT_ENABLED', True)
+        backend = app.config.get('RATE_LIMIT_BACKEND')
+        if backend is not None:
+            self.set_backend(backend)
+        self.rules = {
+            rule: {key: RateLimit.parse(limit) for key, limit in limits.items() if limit}
+            for rule, limits in app.config.get('RATE_LIMITS', {}).items()
+        }
+        app.extensions['rate_limiter'] = self
+
+    def set_backend(self, store):
+        self.store = store
+
+    def check(self, rule):
+        # Returns seconds to wait when any bucket of the rule is empty, else None
+        for key_name, limit in self.rules.get(rule, {}).items():
+            identity = KEY_FUNCTIONS[key_name]()
+            if identity is None:
+                continue
+            allowed, retry_after = self.store.take(f'{rule}:{key_name}:{identity}', limit)
+            if not allowed:
+                with self._lock:
+                    self.rejected[(rule, key_name)] += 1
+                return retry_after
+        return None
+
+    def throttled(self, rule):
+        # 429 response when the request is over the limit, else None
+        if not self.enabled:
+            return None
+        retry_after = self.check(rule)
+        if retry_after is None:
+            return None
+        response = jsonify({'message': 'Zbyt wiele prób, spróbuj ponownie później'})
+        response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+        return response, 429
+
+    def stats(self):
+        return {
+            'enabled': self.enabled,
+            'backend': type(self.store).__name__,
+            'rules': {rule: {key: repr(limit) for key, limit in limits.items()} for rule, limits in self.rules.items()},
+            'rejected': {f'{rule}:{key}': count for (rule, key), count in self.rejected.items()},
+            'tracked_keys': len(self.store) if hasattr(self.store, '__len__') else None
+        }
+
+class RateLimiterExtension(AppExtension):
+    def limit(self, rule):
+        # Apply directly under @app.route so throttled requests never reach the view,
+        # the database or the password hasher. Views are decorated at import time, before
+        # any app exists, so the limiter is looked up per request
+        def decorator(f):
+            @wraps(f)
+            def decorated_function(*args, **kwargs):
+                return self._get().throttled(rule) or f(*args, **kwargs)
+            return decorated_function
+        return decorator
+
+rate_limiter = RateLimiterExtension('rate_limiter', RateLimiter)
@@ -0,0 +1,335 @@
+from sqlalchemy import select
+from collections import namedtuple, Counter
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from models.models import db, Transaction
+from services.status_updates import apply_status_updates, TARGET_COLUMNS
+from services.extensions import AppExtension
+import csv
+import io
+import itertools
+import re
+import threading
+import time
+
+# Bank statement import for offline payments. The statement is read line by line and never
+# held in memory; pending offline payments are loaded once into dicts keyed by the code of
+# their PAYMENT-XXXXXXXX transfer title, so matching an entry is a few dict lookups.
+# Matches are approved in batches through apply_status_updates, guarded by the status
+# read here, so a payment cancelled or paid by card in the meantime is reported as a conflict.
+
+StatementEntry = namedtuple('StatementEntry', ['line', 'amount_minor', 'currency', 'description'])
+# A line that could not be parsed. Parsing is lazy and approvals are committed in batches, so
+# a bad line is reported as 'invalid' instead of aborting an import that has already approved
+InvalidLine = namedtuple('InvalidLine', ['line', 'error', 'description'])
+
+TITLE_PREFIX = 'PAYMENT'
+TOKEN = re.compile(r'[0-9A-Z]+')
+# Characters banks and people commonly put in place of the hex digits of a code
+CONFUSABLES = str.maketrans({'O': '0', 'I': '1', 'L': '1'})
+
+CSV_COLUMNS = {
+    'description': ('title', 'transfer_title', 'tytul', 'tytuł', 'tytuł operacji', 'tytul operacji',
+                    'description', 'opis', 'opis operacji'),
+    'amount': ('amount', 'kwota', 'kwota operacji'),
+    'currency': ('currency', 'waluta'),
+}
+
+MT940_BALANCE = re.compile(r'^:6[02][FM]:[CD]\d{6}([A-Z]{3})')
+MT940_STATEMENT_LINE = re.compile(r'^:61:\d{6}(?:\d{4})?(R?[CD])[A-Z]?(\d+(?:,\d{0,2})?)')
+
+def parse_amount(value):
+    # "1 234,56", "1234.56", "1,234.56" and "-50,00" to signed minor units
+    text = (value or '').strip().replace('\xa0', '').replace(' ', '')
+    if ',' in text and '.' in text:
+        text = text.replace(',', '')
+    text = text.replace(',', '.')
+    try:
+        return int((Decimal(text) * 100).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+    except InvalidOperation:
+        raise ValueError(f'Invalid amount: {value}')
+
+def parse_csv(lines):
+    lines = iter(lines)
+    header_line = next(lines, '')
+    delimiter = max(';,\t', key=header_line.count)
+    header = [name.strip().lower() for name in next(csv.reader([header_line], delimiter=delimiter))]
+    positions = {}
+    for field, aliases in CSV_COLUMNS.items():
+        positions[field] = next((header.index(alias) for alias in aliases if alias in header), None)
+    if positions['description'] is None or positions['amount'] is None:
+        raise ValueError('Statement is missing a title or amount column')
+
+    for line, row in enumerate(csv.reader(lines, delimiter=delimiter), start=2):
+        if not any(row):
+            continue
+        try:
+            amount_minor = parse_amount(row[positions['amount']])
+            description = row[positions['description']]
+            currency = row[positions['currency']].strip().upper() if positions['currency'] is not None else None
+        except IndexError:
+            yield InvalidLine(line, 'Missing columns', ','.join(row))
+            continue
+        except ValueError as e:
+            yield InvalidLine(line, str(e), ','.join(row))
+            continue
+        yield StatementEntry(line, amount_minor, currency or None, description)
+
+def parse_mt940(lines):
+    # :61: statement lines carry the amount and its C/D mark; the following :86: field (wrapped
+    # over several lines) carries the transfer title. The currency comes from the :60F: balance.
+    currency = None
+    current = None
+    for line, text in enumerate(lines, start=1):
+        text = text.rstrip('\r\n')
+        if text.startswith(':'):
+            balance = MT940_BALANCE.match(text)
+            if balance:
+                currency = balance.group(1)
+            if text.startswith(':86:') and current is not None:
+                current['description'] = [text[4:]]
+                continue
+            if current is not None:
+                yield StatementEntry(current['line'], current['amount_minor'], currency, ''.join(current['description']))
+                current = None
+            if text.startswith(':61:'):
+                statement_line = MT940_STATEMENT_LINE.match(text)
+                if not statement_line:
+                    # Its :86: continuation is skipped along with it (current stays None)
+                    yield InvalidLine(line, 'Invalid :61: statement line', text)
+                    continue
+                amount_minor = parse_amount(statement_line.group(2))
+                # Debits and reversed credits never pay for an order
+                sign = 1 if statement_line.group(1) == 'C' else -1
+                current = {'line': line, 'amount_minor': sign * amount_minor, 'description': []}
+        elif current is not None and current['description'] and not text.startswith('-}'):
+            # Continuation of :86:, wrapped at a fixed width, so a code may be split across lines
+            current['description'].append(text)
+    if current is not None:
+        yield StatementEntry(current['line'], current['amount_minor'], currency, ''.join(current['description']))
+
+def read_statement(stream, statement_format=None, encoding='utf-8-sig'):
+    lines = io.TextIOWrapper(stream, encoding=encoding, newline='')
+    first = next(lines, '')
+    if statement_format is None:
+        statement_format = 'mt940' if first.lstrip().startswith((':', '{')) else 'csv'
+    lines = itertools.chain([first], lines)
+    if statement_format == 'mt940':
+        return statement_format, parse_mt940(lines)
+    if statement_format == 'csv':
+        return statement_format, parse_csv(lines)
+    raise ValueError('Invalid format')
+
+def candidate_codes(description):
+    # Alphanumeric runs of the title; "PAYMENT1A2B3C4D" loses its glued prefix
+    for token in TOKEN.findall((description or '').upper()):
+        if token.startswith(TITLE_PREFIX) and len(token) > len(TITLE_PREFIX):
+            token = token[len(TITLE_PREFIX):]
+        if token != TITLE_PREFIX:
+            yield token.translate(CONFUSABLES)
+
+class PendingIndex:
+    def __init__(self, rows):
+        # by_code: exact code -> row. by_mask: code with one position replaced by '*' -> rows,
+        # which finds one substituted, missing or extra character with a handful of lookups;
+        # built on the first entry that has no exact match
+        self.by_code = {}
+        self._by_mask = None
+        for row in rows:
+            code = row.transfer_title.upper()
+            if code.startswith(TITLE_PREFIX + '-'):
+                code = code[len(TITLE_PREFIX) + 1:]
+            self.by_code[code] = row
+
+    @property
+    def by_mask(self):
+        if self._by_mask is None:
+            self._by_mask = {}
+            for code, row in self.by_code.items():
+                for position in range(len(code)):
+                    self._by_mask.setdefault(code[:position] + '*' + code[position + 1:], []).append(row)
+        return self._by_mask
+
+    def __len__(self):
+        return len(self.by_code)
+
+    def exact(self, codes):
+        for code in codes:
+            row = self.by_code.get(code)
+            if row is not None:
+                return row
+        return None
+
+    def fuzzy(self, codes, amount_minor, currency):
+        # Codes one typo away (substituted, missing, extra or swapped character) that also agree
+        # on amount and currency; only a single candidate counts as a match
+        found = {}
+
+        def consider(row):
+            if row.amount_minor == amount_minor and (currency is None or row.currency == currency):
+                found[row.id] = row
+
+        for code in codes:
+            if not 7 <= len(code) <= 9:
+                continue
+            for position in range(len(code) + 1):
+                for row in self.by_mask.get(code[:position] + '*' + code[position + 1:], ()):
+                    consider(row)
+                for row in self.by_mask.get(code[:position] + '*' + code[position:], ()):
+                    consider(row)
+            for position in range(len(code)):
+                variants = [code[:position] + code[position + 1:]]
+                if position < len(code) - 1:
+                    variants.append(code[:position] + code[position + 1] + code[position] + code[position + 2:])
+                for variant in variants:
+                    row = self.by_code.get(variant)
+                    if row is not None:
+                        consider(row)
+        return list(found.values())
+
+def load_pending_index(batch_size=5000):
+    # Range scan of ix_transaction_status_created. The rows double as the approval targets, so
+    # approving a batch does not read them again
+    statement = select(*TARGET_COLUMNS).where(Transaction.status == 'pending', Transaction.transfer_title.isnot(None))
+    return PendingIndex(db.session.execute(statement, execution_options={'yield_per': batch_size}))
+
+def read_entries(entries):
+    # Errors raised by the lazy parser are handed over as a final item instead of propagating
+    try:
+        yield from entries
+    except (ValueError, LookupError) as e:
+        yield e
+
+class StatementReconciler:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.runs = 0
+        self.approved = 0
+        self.last_run = None
+
+    def init_app(self, app):
+        self.batch_size = app.config.get('RECONCILE_BATCH_SIZE', 1000)
+        self.approve_fuzzy = app.config.get('RECONCILE_APPROVE_FUZZY', True)
+        self.report_limit = app.config.get('RECONCILE_REPORT_LIMIT', 200)
+        app.extensions['statement_reconciler'] = self
+
+    def reconcile(self, entries, dry_run=False, statement_format=None):
+        started = time.perf_counter()
+        # One import at a time per process: two overlapping statements would approve the
+        # same payments twice over; across processes the updated_at guard reports a conflict
+        with self._lock:
+            index = load_pending_index()
+            outcomes = Counter()
+            matches = Counter()
+            review = []
+            flagged = 0
+            claimed = set()
+            batch = []
+            lines = 0
+            error = None
+
+            def record(entry, outcome, match=None, row=None):
+                nonlocal flagged
+                outcomes[outcome] += 1
+                if match:
+                    matches[match] += 1
+                if outcome in ('approved', 'would_approve', 'ignored') and match != 'fuzzy':
+                    return
+                # Everything a person should look at, fuzzy approvals included
+                flagged += 1
+                if len(review) < self.report_limit:
+                    invalid = isinstance(entry, InvalidLine)
+                    review.append({
+                        'line': entry.line,
+                        'amount_minor': None if invalid else entry.amount_minor,
+                        'currency': None if invalid else entry.currency,
+                        'description': entry.description[:200],
+                        'outcome': outcome,
+                        'match': match,
+                        'transaction_id': row.id if row is not None else None,
+                        'transfer_title': row.transfer_title if row is not None else None,
+                        **({'error': entry.error} if invalid else {})
+                    })
+
+            def flush():
+                if not batch:
+                    return
+                if dry_run:
+                    for entry, row, match in batch:
+                        record(entry, 'would_approve', match, row)
+                else:
+                    _, results = apply_status_updates([
+                        {'index': position, 'transaction_id': row.id, 'status': 'approved',
+                         'expected_updated_at': row.updated_at}
+                        for position, (_, row, _) in enumerate(batch)
+                    ], targets={row.id: row for _, row, _ in batch})
+                    for (entry, row, match), result in zip(batch, results):
+                        record(entry, 'approved' if result['status'] == 'updated' else result['status'], match, row)
+                batch.clear()
+
+            for entry in read_entries(entries):
+                if isinstance(entry, Exception):
+                    # Unreadable past this point (e.g. a decoding error). Before the first entry
+                    # nothing has been approved and the caller gets the error; later the batches
+                    # already committed are reported, `entries` says how far reading got
+                    if not lines:
+                        raise entry
+                    error = str(entry)
+                    break
+                lines += 1
+                if isinstance(entry, InvalidLine):
+                    record(entry, 'invalid')
+                    continue
+                if entry.amount_minor <= 0:
+                    record(entry, 'ignored')
+                    continue
+
+                codes = list(candidate_codes(entry.description))
+                row = index.exact(codes)
+                match = 'exact'
+                if row is not None and (row.amount_minor != entry.amount_minor or
+                                        (entry.currency is not None and row.currency != entry.currency)):
+                    # Right title, wrong amount: a partial or over-payment is for a person to decide
+                    record(entry, 'amount_mismatch', match, row)
+                    continue
+                if row is None:
+                    candidates = index.fuzzy(codes, entry.amount_minor, entry.currency)
+                    if len(candidates) > 1:
+                        record(entry, 'ambiguous')
+                        continue
+                    if not candidates:
+                        record(entry, 'unmatched')
+                        continue
+                    row, match = candidates[0], 'fuzzy'
+                    if not self.approve_fuzzy:
+                        record(entry, 'needs_review', match, row)
+                        continue
+
+                if row.id in claimed:
+                    # Paid twice; the second transfer needs a refund, not another approval
+                    record(entry, 'duplicate', match, row)
+                    continue
+                claimed.add(row.id)
+                batch.append((entry, row, match))
+                if len(batch) >= self.batch_size:
+                    flush()
+            flush()
+
+            self.runs += 1
+            self.approved += outcomes['approved']
+            self.last_run = {
+                'format': statement_format,
+                'dry_run': dry_run,
+                'entries': lines,
+                'pending_indexed': len(index),
+                'outcomes': dict(outcomes),
+                'matches': dict(matches),
+                'error': error,
+                'seconds': round(time.perf_counter() - started, 3)
+            }
+            truncated = flagged > len(review)
+        return {**self.last_run, 'review': review, 'review_truncated': truncated}
+
+    def stats(self):
+        return {'runs': self.runs, 'approved': self.approved, 'last_run': self.last_run}
+
+statement_reconciler = AppExtension('statement_reconciler', StatementReconciler)
@@ -0,0 +1,117 @@
+from sqlalchemy import func, select, union_all
+from collections import defaultdict
+from datetime import datetime
+from models.models import (db, Transaction, TransactionItem, TransactionArchive, TransactionItemArchive,
+                           DailySales, DailyProductSales)
+from services.database import dialect_insert
+
+# Rollups are updated inside the caller's session, so they commit or roll back
+# together with the transaction change that produced them.
+
+def _upsert(model, keys, deltas):
+    table = model.__table__
+    statement = dialect_insert(db.session.get_bind(), table).values(**keys, **deltas)
+    statement = statement.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={column: table.c[column] + statement.excluded[column] for column in deltas}
+    )
+    db.session.execute(statement)
+
+class RollupDelta:
+    # Accumulates signed changes so a batch of transactions costs one upsert per rollup key.
+    # Transactions and items only need the attributes read below, so bulk paths can pass
+    # lightweight objects instead of ORM instances.
+    def __init__(self):
+        self.sales = defaultdict(lambda: [0, 0])
+        self.products = defaultdict(lambda: [0, 0])
+
+    def add(self, transaction, items, status, sign):
+        day = (transaction.created_at or datetime.utcnow()).date()
+        status = status or 'pending'
+
+        sales = self.sales[(day, status, transaction.payment_method, transaction.currency)]
+        sales[0] += sign
+        sales[1] += sign * transaction.amount_minor
+
+        for item in items:
+            quantity = item.quantity or 1
+            product = self.products[(day, item.product_name, status, transaction.payment_method, transaction.currency)]
+            product[0] += sign * quantity
+            product[1] += sign * item.unit_price_minor * quantity
+        return self
+
+    def apply(self):
+        for (day, status, payment_method, currency), (count, amount_minor) in self.sales.items():
+            _upsert(DailySales, {
+                'day': day,
+                'status': status,
+                'payment_method': payment_method,
+                'currency': currency
+            }, {
+                'transaction_count': count,
+                'amount_minor': amount_minor
+            })
+        for (day, product_name, status, payment_method, currency), (quantity, revenue_minor) in self.products.items():
+            _upsert(DailyProductSales, {
+                'day': day,
+                'product_name': product_name,
+                'status': status,
+                'payment_method': payment_method,
+                'currency': currency
+            }, {
+                'quantity': quantity,
+                'revenue_minor': revenue_minor
+            })
+
+def record_transaction_created(transaction, items):
+    RollupDelta().add(transaction, items, transaction.status, 1).apply()
+
+def record_status_change(transaction, old_status, new_status):
+    if (old_status or 'pending') == (new_status or 'pending'):
+        return
+    items = transaction.items
+    RollupDelta().add(transaction, items, old_status, -1).add(transaction, items, new_status, 1).apply()
+
+def rebuild_rollups():
+    # Full recomputation from history, archived transactions included; run after imports or to repair drift
+    transactions = union_all(
+        select(Transaction.id, Transaction.status, Transaction.payment_method, Transaction.currency,
+               Transaction.created_at, Transaction.amount_minor),
+        select(TransactionArchive.id, TransactionArchive.status, TransactionArchive.payment_method,
+               TransactionArchive.currency, TransactionArchive.created_at, TransactionArchive.amount_minor)
+    ).subquery()
+    items = union_all(
+        select(TransactionItem.transaction_id, TransactionItem.product_name, TransactionItem.unit_price_minor,
+               TransactionItem.quantity),
+        select(TransactionItemArchive.transaction_id, TransactionItemArchive.product_name,
+               TransactionItemArchive.unit_price_minor, TransactionItemArchive.quantity)
+    ).subquery()
+
+    status = func.coalesce(transactions.c.status, 'pending')
+    quantity = func.coalesce(items.c.quantity, 1)
+    day = func.date(transactions.c.created_at)
+
+    db.session.query(DailySales).delete()
+    db.session.query(DailyProductSales).delete()
+
+    db.session.execute(DailySales.__table__.insert().from_select(
+        ['day', 'status', 'payment_method', 'currency', 'transaction_count', 'amount_minor'],
+        select(
+            day, status, transactions.c.payment_method, transactions.c.currency,
+            func.count(transactions.c.id), func.sum(transactions.c.amount_minor)
+        ).group_by(day, status, transactions.c.payment_method, transactions.c.currency)
+    ))
+    db.session.execute(DailyProductSales.__table__.insert().from_select(
+        ['day', 'product_name', 'status', 'payment_method', 'currency', 'quantity', 'revenue_minor'],
+        select(
+            day, items.c.product_name, status, transactions.c.payment_method, transactions.c.currency,
+            func.sum(quantity), func.sum(items.c.unit_price_minor * quantity)
+        ).join(transactions, transactions.c.id == items.c.transaction_id)
+        .group_by(day, items.c.product_name, status, transactions.c.payment_method, transactions.c.currency)
+    ))
+    db.session.commit()
+
+    return {
+        'daily_sales': DailySales.query.count(),
+        'daily_product_sales': DailyProductSales.query.count()
+    }
@@ -0,0 +1,191 @@
+from sqlalchemy import select, update, delete, or_
+from collections import namedtuple, Counter
+from datetime import datetime, timedelta
+from models.models import db, JobLock, JobRun
+from services.database import dialect_insert
+from services.extensions import AppExtension
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# In-process job scheduler: one thread per process wakes up every SCHEDULER_TICK_SECONDS and
+# runs the jobs that are due. Every gunicorn worker runs it, so a job is guarded by a lease
+# row in job_lock: whoever moves locked_until forward runs it, everyone else skips. A process
+# that dies mid-run simply lets the lease expire. Due-ness is read from job_run, so a job that
+# just ran in another process is not repeated here.
+
+Job = namedtuple('Job', ['name', 'func', 'interval'])
+
+class JobScheduler:
+    def __init__(self):
+        self.app = None
+        self._jobs = {}
+        self._next_due = {}
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._token = uuid.uuid4().hex[:8]
+        self.runs = Counter()
+        self.rows = Counter()
+        self.last_runs = {}
+
+    def init_app(self, app):
+        self.app = app
+        self.tick = app.config.get('SCHEDULER_TICK_SECONDS', 30)
+        self.lease = timedelta(seconds=app.config.get('SCHEDULER_LOCK_SECONDS', 600))
+        self.history = timedelta(days=app.config.get('SCHEDULER_HISTORY_DAYS', 30))
+        app.extensions['job_scheduler'] = self
+
+    def register(self, name, func, interval):
+        # func(renew) returns {'processed': rows, 'batches': n, ...}; long jobs call renew()
+        # between batches to keep their lease
+        self._jobs[name] = Job(name, func, interval)
+
+    @property
+    def jobs(self):
+        return dict(self._jobs)
+
+    @property
+    def owner(self):
+        # Read per call: with gunicorn --preload the module is imported before the fork
+        return f'{socket.gethostname()}:{os.getpid()}:{self._token}'
+
+    def _acquire(self, name, now):
+        db.session.execute(dialect_insert(db.session.get_bind(), JobLock.__table__).values(
+            name=name, owner=None, locked_until=datetime(1970, 1, 1)
+        ).on_conflict_do_nothing(index_elements=['name']))
+        acquired = db.session.execute(
+            update(JobLock).where(
+                JobLock.name == name,
+                or_(JobLock.locked_until < now, JobLock.owner == self.owner)
+            ).values(owner=self.owner, locked_until=now + self.lease)
+            .execution_options(synchronize_session=False)
+        ).rowcount == 1
+        db.session.commit()
+        return acquired
+
+    def _release(self, name):
+        db.session.execute(
+            update(JobLock).where(JobLock.name == name, JobLock.owner == self.owner)
+            .values(owner=None, locked_until=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    def last_finished(self, name):
+        return db.session.execute(
+            select(JobRun.finished_at).where(JobRun.job == name, JobRun.finished_at.isnot(None))
+            .order_by(JobRun.started_at.desc()).limit(1)
+        ).scalar()
+
+    def run_job(self, name, force=False, now=None):
+        # Returns the finished run as a dict, or None when another process holds the lease or
+        # (without force) the job ran recently enough somewhere else
+        job = self._jobs[name]
+        now = now or datetime.utcnow()
+        if not self._acquire(name, now):
+            return None
+        try:
+            finished = self.last_finished(name)
+            if not force and finished is not None and finished > now - timedelta(seconds=job.interval):
+                self._next_due[name] = finished + timedelta(seconds=job.interval)
+                return None
+
+            run = JobRun(job=name, owner=self.owner, status='running', started_at=now)
+            db.session.add(run)
+            db.session.commit()
+            run_id = run.id
+
+            started = time.perf_counter()
+            try:
+                result = job.func(lambda: self._acquire(name, datetime.utcnow())) or {}
+                status, error = 'succeeded', None
+            except Exception as e:
+                db.session.rollback()
+                logger.exception('Job %s failed', name)
+                result, status, error = {}, 'failed', str(e)[:500]
+
+            finished_at = datetime.utcnow()
+            db.session.execute(
+                update(JobRun).where(JobRun.id == run_id).values(
+                    status=status, finished_at=finished_at, error=error,
+                    rows_processed=result.get('processed', 0), batches=result.get('batches', 0)
+                ).execution_options(synchronize_session=False)
+            )
+            # Run history is kept for SCHEDULER_HISTORY_DAYS; ix_job_run_job_started range delete
+            db.session.execute(delete(JobRun).where(JobRun.job == name, JobRun.started_at < finished_at - self.history))
+            db.session.commit()
+            self._next_due[name] = finished_at + timedelta(seconds=job.interval)
+
+            summary = {'id': run_id, 'job': name, 'status': status, 'started_at': now.isoformat(),
+                       'finished_at': finished_at.isoformat(), 'seconds': round(time.perf_counter() - started, 3),
+                       'rows_processed': result.get('processed', 0), 'batches': result.get('batches', 0),
+                       'error': error}
+            with self._lock:
+                self.runs[(name, status)] += 1
+                self.rows[name] += summary['rows_processed']
+                self.last_runs[name] = summary
+            return summary
+        finally:
+            self._release(name)
+
+    def run_pending(self, now=None):
+        now = now or datetime.utcnow()
+        ran = []
+        for name in list(self._jobs):
+            if self._next_due.get(name, now) > now:
+                continue
+            summary = self.run_job(name, now=now)
+            if summary:
+                ran.append(summary)
+        return ran
+
+    def _run(self):
+        with self.app.app_context():
+            while not self._stop.is_set():
+                try:
+                    self.run_pending()
+                except Exception:
+                    logger.exception('Scheduler error')
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+                self._stop.wait(self.tick)
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='job-scheduler', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def recent_runs(self, name=None, limit=50):
+        statement = select(JobRun).order_by(JobRun.started_at.desc()).limit(limit)
+        if name:
+            statement = statement.where(JobRun.job == name)
+        return db.session.execute(statement).scalars().all()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'owner': self.owner,
+                'running': self._thread is not None and self._thread.is_alive(),
+                'jobs': {name: job.interval for name, job in self._jobs.items()},
+                'runs': {f'{name}:{status}': count for (name, status), count in self.runs.items()},
+                'rows': dict(self.rows),
+                'last_runs': dict(self.last_runs)
+            }
+
+job_scheduler = AppExtension('job_scheduler', JobScheduler)
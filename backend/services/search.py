@@ -0,0 +1,233 @@
+from sqlalchemy import table, column, select, text, func, bindparam, inspect
+import re
+
+# Full-text index over transactions: transfer title, the owner's username and email and the
+# purchased product names, one document per transaction keyed by its id. Triggers keep it in
+# sync, so ORM writes, bulk Core inserts and raw SQL are all covered. Archived transactions
+# stay searchable: the archiver indexes them again from the archive tables (index_archived)
+# once the hot-table triggers have dropped their documents.
+# SQLite: FTS5 table with the transaction id as rowid. PostgreSQL: tsvector table with a GIN index.
+# The live DDL lives here because CREATE_SCHEMA (db.create_all) needs it too; migrations keep
+# frozen copies of the definitions as they were at their revision.
+
+WORD = re.compile(r'[^\W_]+', re.UNICODE)
+MAX_TERMS = 8
+
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS transaction_search USING fts5(
+        transfer_title, username, email, products, tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS transaction_search_insert AFTER INSERT ON "transaction" BEGIN
+        DELETE FROM transaction_search WHERE rowid = NEW.id;
+        INSERT INTO transaction_search (rowid, transfer_title, username, email, products) VALUES (
+            NEW.id, NEW.transfer_title,
+            (SELECT username FROM "user" WHERE id = NEW.user_id),
+            (SELECT email FROM "user" WHERE id = NEW.user_id),
+            (SELECT group_concat(product_name, ' ') FROM transaction_item WHERE transaction_id = NEW.id)
+        );
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transaction_search_update AFTER UPDATE OF transfer_title, user_id ON "transaction" BEGIN
+        UPDATE transaction_search SET
+            transfer_title = NEW.transfer_title,
+            username = (SELECT username FROM "user" WHERE id = NEW.user_id),
+            email = (SELECT email FROM "user" WHERE id = NEW.user_id)
+        WHERE rowid = NEW.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transaction_search_delete AFTER DELETE ON "transaction" BEGIN
+        DELETE FROM transaction_search WHERE rowid = OLD.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transaction_search_item_insert AFTER INSERT ON transaction_item BEGIN
+        UPDATE transaction_search SET products = (
+            SELECT group_concat(product_name, ' ') FROM transaction_item WHERE transaction_id = NEW.transaction_id
+        ) WHERE rowid = NEW.transaction_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transaction_search_item_update AFTER UPDATE OF product_name, transaction_id ON transaction_item BEGIN
+        UPDATE transaction_search SET products = (
+            SELECT group_concat(product_name, ' ') FROM transaction_item WHERE transaction_id = transaction_search.rowid
+        ) WHERE rowid IN (OLD.transaction_id, NEW.transaction_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transaction_search_item_delete AFTER DELETE ON transaction_item BEGIN
+        UPDATE transaction_search SET products = (
+            SELECT group_concat(product_name, ' ') FROM transaction_item WHERE transaction_id = OLD.transaction_id
+        ) WHERE rowid = OLD.transaction_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS transaction_search_user_update AFTER UPDATE OF username, email ON "user" BEGIN
+        UPDATE transaction_search SET username = NEW.username, email = NEW.email
+        WHERE rowid IN (SELECT id FROM "transaction" WHERE user_id = NEW.id
+                        UNION ALL SELECT id FROM transaction_archive WHERE user_id = NEW.id);
+    END""",
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS transaction_search_user_update',
+    'DROP TRIGGER IF EXISTS transaction_search_item_delete',
+    'DROP TRIGGER IF EXISTS transaction_search_item_update',
+    'DROP TRIGGER IF EXISTS transaction_search_item_insert',
+    'DROP TRIGGER IF EXISTS transaction_search_delete',
+    'DROP TRIGGER IF EXISTS transaction_search_update',
+    'DROP TRIGGER IF EXISTS transaction_search_insert',
+    'DROP TABLE IF EXISTS transaction_search',
+]
+
+SQLITE_INDEX = """
+    INSERT INTO transaction_search (rowid, transfer_title, username, email, products)
+    SELECT t.id, t.transfer_title, u.username, u.email,
+           (SELECT group_concat(product_name, ' ') FROM {items} WHERE transaction_id = t.id)
+    FROM {transactions} t LEFT JOIN "user" u ON u.id = t.user_id
+"""
+SQLITE_REBUILD = SQLITE_INDEX.format(transactions='"transaction"', items='transaction_item')
+SQLITE_INDEX_ARCHIVED = SQLITE_INDEX.format(transactions='transaction_archive', items='transaction_item_archive')
+
+# Punctuation is folded to spaces before to_tsvector so "PAYMENT-1A2B" and "bob@example.com"
+# split into the same words FTS5's unicode61 tokenizer produces
+POSTGRES_DOCUMENT_TEMPLATE = """
+    to_tsvector('simple', regexp_replace(concat_ws(' ', t.transfer_title, u.username, u.email,
+        (SELECT string_agg(i.product_name, ' ') FROM {items} i WHERE i.transaction_id = t.id)
+    ), '[^[:alnum:]]+', ' ', 'g'))
+"""
+POSTGRES_DOCUMENT = POSTGRES_DOCUMENT_TEMPLATE.format(items='transaction_item')
+POSTGRES_INDEX_ARCHIVED = f"""
+    INSERT INTO transaction_search (transaction_id, document)
+    SELECT t.id, {POSTGRES_DOCUMENT_TEMPLATE.format(items='transaction_item_archive')}
+    FROM transaction_archive t LEFT JOIN "user" u ON u.id = t.user_id
+"""
+
+POSTGRES_DDL = [
+    """CREATE TABLE IF NOT EXISTS transaction_search (
+        transaction_id INTEGER PRIMARY KEY,
+        document TSVECTOR NOT NULL
+    )""",
+    'CREATE INDEX IF NOT EXISTS ix_transaction_search_document ON transaction_search USING GIN (document)',
+    f"""CREATE OR REPLACE FUNCTION transaction_search_refresh(target INTEGER) RETURNS VOID AS $$
+        INSERT INTO transaction_search (transaction_id, document)
+        SELECT t.id, {POSTGRES_DOCUMENT}
+        FROM "transaction" t LEFT JOIN "user" u ON u.id = t.user_id
+        WHERE t.id = target
+        ON CONFLICT (transaction_id) DO UPDATE SET document = EXCLUDED.document
+    $$ LANGUAGE sql""",
+    """CREATE OR REPLACE FUNCTION transaction_search_on_transaction() RETURNS TRIGGER AS $$
+    BEGIN
+        PERFORM transaction_search_refresh(NEW.id);
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION transaction_search_on_delete() RETURNS TRIGGER AS $$
+    BEGIN
+        DELETE FROM transaction_search WHERE transaction_id = OLD.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    """CREATE OR REPLACE FUNCTION transaction_search_on_item() RETURNS TRIGGER AS $$
+    BEGIN
+        IF TG_OP IN ('UPDATE', 'DELETE') THEN
+            PERFORM transaction_search_refresh(OLD.transaction_id);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM transaction_search_refresh(NEW.transaction_id);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    f"""CREATE OR REPLACE FUNCTION transaction_search_on_user() RETURNS TRIGGER AS $$
+    BEGIN
+        PERFORM transaction_search_refresh(t.id) FROM "transaction" t WHERE t.user_id = NEW.id;
+        {POSTGRES_INDEX_ARCHIVED} WHERE t.user_id = NEW.id
+        ON CONFLICT (transaction_id) DO UPDATE SET document = EXCLUDED.document;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    'DROP TRIGGER IF EXISTS transaction_search_transaction ON "transaction"',
+    """CREATE TRIGGER transaction_search_transaction AFTER INSERT OR UPDATE OF transfer_title, user_id ON "transaction"
+        FOR EACH ROW EXECUTE FUNCTION transaction_search_on_transaction()""",
+    'DROP TRIGGER IF EXISTS transaction_search_transaction_delete ON "transaction"',
+    """CREATE TRIGGER transaction_search_transaction_delete AFTER DELETE ON "transaction"
+        FOR EACH ROW EXECUTE FUNCTION transaction_search_on_delete()""",
+    'DROP TRIGGER IF EXISTS transaction_search_item ON transaction_item',
+    """CREATE TRIGGER transaction_search_item AFTER INSERT OR UPDATE OF product_name, transaction_id OR DELETE ON transaction_item
+        FOR EACH ROW EXECUTE FUNCTION transaction_search_on_item()""",
+    'DROP TRIGGER IF EXISTS transaction_search_user ON "user"',
+    """CREATE TRIGGER transaction_search_user AFTER UPDATE OF username, email ON "user"
+        FOR EACH ROW EXECUTE FUNCTION transaction_search_on_user()""",
+]
+
+POSTGRES_DROP = [
+    'DROP TRIGGER IF EXISTS transaction_search_user ON "user"',
+    'DROP TRIGGER IF EXISTS transaction_search_item ON transaction_item',
+    'DROP TRIGGER IF EXISTS transaction_search_transaction_delete ON "transaction"',
+    'DROP TRIGGER IF EXISTS transaction_search_transaction ON "transaction"',
+    'DROP FUNCTION IF EXISTS transaction_search_on_user()',
+    'DROP FUNCTION IF EXISTS transaction_search_on_delete()',
+    'DROP FUNCTION IF EXISTS transaction_search_on_item()',
+    'DROP FUNCTION IF EXISTS transaction_search_on_transaction()',
+    'DROP FUNCTION IF EXISTS transaction_search_refresh(INTEGER)',
+    'DROP TABLE IF EXISTS transaction_search',
+]
+
+POSTGRES_REBUILD = f"""
+    INSERT INTO transaction_search (transaction_id, document)
+    SELECT t.id, {POSTGRES_DOCUMENT}
+    FROM "transaction" t LEFT JOIN "user" u ON u.id = t.user_id
+"""
+
+def _is_postgres(connection):
+    return connection.dialect.name == 'postgresql'
+
+def install_search_index(connection):
+    for statement in POSTGRES_DDL if _is_postgres(connection) else SQLITE_DDL:
+        connection.execute(text(statement))
+
+def drop_search_index(connection):
+    for statement in POSTGRES_DROP if _is_postgres(connection) else SQLITE_DROP:
+        connection.execute(text(statement))
+
+def rebuild_search_index(connection):
+    # Full reindex from history; the triggers keep it current afterwards
+    connection.execute(text('DELETE FROM transaction_search'))
+    if _is_postgres(connection):
+        connection.execute(text(POSTGRES_REBUILD))
+    else:
+        connection.execute(text(SQLITE_REBUILD))
+    # The archive tables appear in a later migration than the index
+    if inspect(connection).has_table('transaction_archive'):
+        connection.execute(text(POSTGRES_INDEX_ARCHIVED if _is_postgres(connection) else SQLITE_INDEX_ARCHIVED))
+    if not _is_postgres(connection):
+        # Merge the b-tree segments written by the bulk insert
+        connection.execute(text("INSERT INTO transaction_search (transaction_search) VALUES ('optimize')"))
+    return connection.execute(text('SELECT COUNT(*) FROM transaction_search')).scalar()
+
+def index_archived(connection, transaction_ids):
+    # Documents for transactions just moved to the archive; deleting the hot rows dropped them
+    statement = POSTGRES_INDEX_ARCHIVED if _is_postgres(connection) else SQLITE_INDEX_ARCHIVED
+    connection.execute(
+        text(statement + ' WHERE t.id IN :ids').bindparams(bindparam('ids', expanding=True)),
+        {'ids': list(transaction_ids)}
+    )
+
+def search_terms(query):
+    # Words of the query, lowercased; punctuation only separates words, so user input can
+    # never inject FTS5 or tsquery operators
+    return [word.lower() for word in WORD.findall(query or '')][:MAX_TERMS]
+
+def matching_ids(bind, terms, before_id=None, limit=None):
+    # Select of transaction ids whose document contains every term as a word prefix, newest
+    # id first. FTS5 walks its rowids in descending order, so with a limit it stops early
+    # instead of collecting every match.
+    if _is_postgres(bind):
+        index = table('transaction_search', column('transaction_id'), column('document'))
+        key = index.c.transaction_id
+        statement = select(key.label('id')).where(
+            index.c.document.op('@@')(func.to_tsquery('simple', ' & '.join(f'{term}:*' for term in terms)))
+        )
+    else:
+        index = table('transaction_search', column('rowid'))
+        key = index.c.rowid
+        statement = select(key.label('id')).where(
+            text('transaction_search MATCH :match').bindparams(match=' AND '.join(f'"{term}"*' for term in terms))
+        )
+
+    if before_id is not None:
+        statement = statement.where(key < before_id)
+    statement = statement.order_by(key.desc())
+    if limit is not None:
+        statement = statement.limit(limit)
+    return statement
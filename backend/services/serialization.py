@@ -0,0 +1,164 @@
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import null, select
+from models.models import db, User
+from services.money import to_major_units
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Transaction payloads built from selected columns (row tuples) instead of ORM objects, with
+# sparse fieldsets: ?fields=id,status,amount leaves out everything else, and `items` costs a
+# query only when asked for. Output keys and formats match what the endpoints always returned.
+
+ITEM_BATCH_SIZE = 500
+
+def format_timestamp(value):
+    # Same text as strftime('%Y-%m-%d %H:%M:%S') for naive datetimes, without the format parser
+    return value.isoformat(' ', 'seconds') if value else None
+
+def format_isoformat(value):
+    return value.isoformat() if value else None
+
+# Output field -> (model attribute, formatter)
+TRANSACTION_FIELDS = {
+    'id': ('id', None),
+    'user_id': ('user_id', None),
+    'amount': ('amount_minor', to_major_units),
+    'amount_minor': ('amount_minor', None),
+    'currency': ('currency', None),
+    'payment_method': ('payment_method', None),
+    'status': ('status', None),
+    'created_at': ('created_at', format_timestamp),
+    'transfer_title': ('transfer_title', None),
+    'updated_at': ('updated_at', format_isoformat),
+    'overdue_at': ('overdue_at', format_isoformat),
+}
+USER_FIELDS = ('username', 'email')
+
+HISTORY_FIELDS = ('id', 'amount', 'amount_minor', 'currency', 'payment_method', 'status', 'created_at',
+                  'transfer_title', 'items')
+ADMIN_FIELDS = ('id', 'user_id', 'username', 'email', 'amount', 'amount_minor', 'currency', 'payment_method',
+                'status', 'created_at', 'transfer_title', 'updated_at', 'overdue_at', 'items')
+
+def parse_fields(value, allowed):
+    # ?fields= as a tuple in the canonical order of `allowed`; id is always included
+    if not value:
+        return allowed
+    requested = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = requested - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(name for name in allowed if name in requested or name == 'id')
+
+def project(records, fields, allowed):
+    # Sparse view of already serialized records (e.g. the cached history)
+    if fields == allowed:
+        return records
+    return [{name: record[name] for name in fields} for record in records]
+
+class TransactionSerializer:
+    def __init__(self, model, item_model, fields):
+        self.model = model
+        self.item_model = item_model
+        self.fields = fields
+        self.with_items = 'items' in fields
+        self.with_user = any(name in USER_FIELDS for name in fields)
+
+        # id and created_at are always selected: they are the keyset cursor
+        attributes = ['id', 'created_at']
+        for name in fields:
+            if name in TRANSACTION_FIELDS and TRANSACTION_FIELDS[name][0] not in attributes:
+                attributes.append(TRANSACTION_FIELDS[name][0])
+        # The archive has no overdue_at (only pending rows are flagged, only closed ones archived)
+        self.columns = [getattr(model, attribute) if hasattr(model, attribute) else null().label(attribute)
+                        for attribute in attributes]
+        if self.with_user:
+            self.columns += [User.username, User.email]
+            attributes += list(USER_FIELDS)
+        position = {attribute: index for index, attribute in enumerate(attributes)}
+        self._plan = [
+            (name, position[name], None) if name in USER_FIELDS else
+            (name, position[TRANSACTION_FIELDS[name][0]], TRANSACTION_FIELDS[name][1])
+            for name in fields if name != 'items'
+        ]
+
+    def query(self, *extra):
+        # Query of row tuples; filters, ordering and limits are added by the caller. Extra
+        # columns go after the serialized ones and are left out of the output
+        query = db.session.query(*self.columns, *extra)
+        if self.with_user:
+            query = query.outerjoin(User, User.id == self.model.user_id)
+        return query
+
+    def _items(self, transaction_ids):
+        item_model = self.item_model
+        items = {transaction_id: [] for transaction_id in transaction_ids}
+        for start in range(0, len(transaction_ids), ITEM_BATCH_SIZE):
+            rows = db.session.execute(select(
+                item_model.transaction_id, item_model.id, item_model.product_name,
+                item_model.unit_price_minor, item_model.quantity
+            ).where(item_model.transaction_id.in_(transaction_ids[start:start + ITEM_BATCH_SIZE])).order_by(item_model.id))
+            for transaction_id, item_id, product_name, unit_price_minor, quantity in rows:
+                items[transaction_id].append({
+                    'id': item_id,
+                    'product_name': product_name,
+                    'product_price': to_major_units(unit_price_minor),
+                    'unit_price_minor': unit_price_minor,
+                    'quantity': quantity
+                })
+        return items
+
+    def serialize(self, rows):
+        plan = self._plan
+        records = []
+        for row in rows:
+            record = {}
+            for name, index, formatter in plan:
+                value = row[index]
+                record[name] = formatter(value) if formatter is not None and value is not None else value
+            records.append(record)
+        if self.with_user:
+            for record in records:
+                # Orphaned rows keep the placeholder the admin views always showed
+                for name in USER_FIELDS:
+                    if name in record and record[name] is None:
+                        record[name] = 'Unknown'
+        if self.with_items:
+            items = self._items([row[0] for row in rows])
+            for row, record in zip(rows, records):
+                record['items'] = items[row[0]]
+        return records
+
+class OrjsonProvider(DefaultJSONProvider):
+    # Flask JSON provider on orjson: responses are encoded straight to bytes. Values orjson
+    # would format differently (datetimes, dataclasses) go through Flask's default hook, so
+    # output matches the stdlib provider except for key order and non-ASCII text sent as UTF-8
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        if kwargs.get('indent') or kwargs.get('sort_keys'):
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self.options).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self.options | orjson.OPT_APPEND_NEWLINE),
+            mimetype=self.mimetype
+        )
+
+def configure_json(app):
+    # JSON_ENCODER: 'auto' uses orjson when installed, 'orjson' requires it, 'stdlib' never uses it
+    encoder = app.config.get('JSON_ENCODER', 'auto')
+    if encoder == 'orjson' and orjson is None:
+        raise RuntimeError('JSON_ENCODER=orjson but the orjson package is not installed')
+    if encoder in ('auto', 'orjson') and orjson is not None:
+        app.json = OrjsonProvider(app)
+    return type(app.json).__name__
@@ -0,0 +1,140 @@
+from sqlalchemy import select, update
+from collections import defaultdict
+from datetime import datetime
+from types import SimpleNamespace
+from models.models import db, Transaction, TransactionItem, TransactionArchive
+from services.transaction_cache import history_cache
+from services import reporting
+
+STATUSES = ('pending', 'approved', 'cancelled')
+LOOKUP_CHUNK_SIZE = 500
+
+# Outcome per requested change: updated, unchanged, not_found, archived, conflict, duplicate.
+# Changes arrive already validated as dicts with 'index', 'status' and either 'transaction_id'
+# or 'transfer_title', plus an optional 'expected_updated_at' (optimistic concurrency).
+
+def _chunks(values):
+    values = list(values)
+    for start in range(0, len(values), LOOKUP_CHUNK_SIZE):
+        yield values[start:start + LOOKUP_CHUNK_SIZE]
+
+# Everything resolving a change and moving its rollups needs
+TARGET_COLUMNS = (Transaction.id, Transaction.user_id, Transaction.status, Transaction.updated_at,
+                  Transaction.created_at, Transaction.payment_method, Transaction.currency,
+                  Transaction.amount_minor, Transaction.transfer_title)
+
+def _load_targets(ids, titles):
+    rows = []
+    for chunk in _chunks(ids):
+        rows.extend(db.session.execute(select(*TARGET_COLUMNS).where(Transaction.id.in_(chunk))).all())
+    for chunk in _chunks(titles):
+        rows.extend(db.session.execute(select(*TARGET_COLUMNS).where(Transaction.transfer_title.in_(chunk))).all())
+    return {row.id: row for row in rows}
+
+def apply_status_updates(changes, atomic=False, now=None, targets=None):
+    # targets: {id: row of TARGET_COLUMNS} the caller already read, e.g. the statement import
+    now = now or datetime.utcnow()
+    results = [{'index': change['index']} for change in changes]
+
+    if targets is None:
+        targets = _load_targets(
+            {change['transaction_id'] for change in changes if change.get('transaction_id') is not None},
+            {change['transfer_title'] for change in changes if change.get('transfer_title')}
+        )
+    by_title = {row.transfer_title: row for row in targets.values() if row.transfer_title}
+
+    # Resolve every change against the rows read above; nothing is written yet
+    planned = defaultdict(list)
+    seen = set()
+    missing = {}
+    for change, result in zip(changes, results):
+        row = targets.get(change['transaction_id']) if change.get('transaction_id') is not None else by_title.get(change['transfer_title'])
+        if row is None:
+            result['status'] = 'not_found'
+            if change.get('transaction_id') is not None:
+                missing[change['transaction_id']] = result
+            continue
+
+        result['transaction_id'] = row.id
+        if row.id in seen:
+            result.update({'status': 'duplicate', 'error': 'Transaction already changed earlier in this batch'})
+            continue
+        seen.add(row.id)
+
+        expected = change.get('expected_updated_at')
+        if expected is not None and row.updated_at != expected:
+            result.update({'status': 'conflict', 'updated_at': row.updated_at.isoformat() if row.updated_at else None})
+            continue
+        if (row.status or 'pending') == change['status']:
+            result.update({'status': 'unchanged', 'transaction_status': change['status']})
+            continue
+        planned[change['status']].append((row, result))
+
+    if missing:
+        for chunk in _chunks(missing):
+            for archived_id in db.session.execute(select(TransactionArchive.id).where(TransactionArchive.id.in_(chunk))).scalars():
+                missing[archived_id].update({'status': 'archived', 'error': 'Transaction is archived'})
+
+    # Entries still without a status are the planned updates
+    if atomic and any(result.get('status') not in (None, 'unchanged') for result in results):
+        db.session.rollback()
+        for result in results:
+            result.setdefault('status', 'skipped')
+        return 0, results
+
+    # One UPDATE per (target status, status read above). Rows only move if their status is still
+    # the one read, so a write that landed in between is neither overwritten nor double-counted
+    # in the rollups (amounts and dates never change after creation); RETURNING tells which rows
+    # actually changed. The expanding IN keeps the statement text, and its compiled form, stable
+    updated = {}
+    for new_status, entries in planned.items():
+        by_status = defaultdict(list)
+        for row, _ in entries:
+            by_status[row.status].append(row.id)
+        changed = set()
+        for old_status, ids in by_status.items():
+            changed.update(db.session.execute(
+                update(Transaction).where(
+                    Transaction.id.in_(ids),
+                    Transaction.status.is_(None) if old_status is None else Transaction.status == old_status
+                )
+                .values(status=new_status, updated_at=now).returning(Transaction.id)
+                .execution_options(synchronize_session=False)
+            ).scalars())
+
+        for row, result in entries:
+            if row.id in changed:
+                updated[row.id] = (row, new_status)
+                result.update({'status': 'updated', 'transaction_status': new_status, 'updated_at': now.isoformat()})
+            else:
+                result.update({'status': 'conflict', 'error': 'Transaction changed concurrently'})
+
+    if atomic and len(updated) != sum(len(entries) for entries in planned.values()):
+        db.session.rollback()
+        for result in results:
+            if result['status'] == 'updated':
+                result['status'] = 'skipped'
+        return 0, results
+
+    if updated:
+        # Rollups move by the same deltas a single update would produce, batched per key
+        items = defaultdict(list)
+        for chunk in _chunks(updated):
+            for item in db.session.execute(select(
+                TransactionItem.transaction_id, TransactionItem.product_name,
+                TransactionItem.unit_price_minor, TransactionItem.quantity
+            ).where(TransactionItem.transaction_id.in_(chunk))):
+                items[item.transaction_id].append(item)
+
+        rollups = reporting.RollupDelta()
+        for transaction_id, (row, new_status) in updated.items():
+            transaction = SimpleNamespace(created_at=row.created_at, payment_method=row.payment_method,
+                                          currency=row.currency, amount_minor=row.amount_minor)
+            rollups.add(transaction, items[transaction_id], row.status, -1)
+            rollups.add(transaction, items[transaction_id], new_status, 1)
+        rollups.apply()
+
+    db.session.commit()
+    for user_id in {row.user_id for row, _ in updated.values()}:
+        history_cache.invalidate(user_id)
+    return len(updated), results
@@ -0,0 +1,24 @@
+from flask import current_app
+import threading
+
+DEFAULT_API_BASE = 'https://api.stripe.com'
+
+_lock = threading.Lock()
+_settings = None
+
+def get_stripe():
+    # The SDK is imported and configured on first use: importing it costs ~0.2 s, which
+    # workers and test apps that never call Stripe should not pay at boot
+    global _settings
+    import stripe
+
+    config = current_app.config
+    settings = (config.get('STRIPE_SECRET_KEY'), config.get('STRIPE_API_BASE') or DEFAULT_API_BASE,
+                config.get('STRIPE_TIMEOUT', 10))
+    if settings != _settings:
+        with _lock:
+            stripe.api_key, stripe.api_base, timeout = settings
+            # Bounded upstream waits; under gunicorn's gevent workers these calls yield instead of blocking
+            stripe.default_http_client = stripe.http_client.RequestsClient(timeout=timeout)
+            _settings = settings
+    return stripe
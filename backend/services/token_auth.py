@@ -0,0 +1,121 @@
+from flask_login import UserMixin
+from datetime import datetime, timedelta, timezone
+from models.models import db, User
+from services.transaction_cache import LRUCache
+from services.extensions import AppExtension
+import threading
+import time
+import jwt
+
+class TokenUser(UserMixin):
+    # Request user built from verified JWT claims, without loading the User row. The role
+    # comes from the account lookup, not the claims, so a demotion does not wait for expiry
+    def __init__(self, claims, is_admin):
+        self.id = claims['user_id']
+        self.username = claims.get('username')
+        self.email = claims.get('email')
+        self.auth_method = claims.get('auth_method')
+        self.is_admin = is_admin
+        self.token_claims = claims
+
+    def __repr__(self):
+        return f'<TokenUser {self.username}>'
+
+class TokenAuthenticator:
+    def __init__(self):
+        self.verified_hits = 0
+        self.verified_misses = 0
+        self.revocation_lookups = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.secret = app.config['JWT_SECRET']
+        self.expiration = timedelta(hours=app.config['JWT_EXPIRATION_HOURS'])
+        # Verified tokens skip signature checks; token version and role are re-read from
+        # the DB at most once per TOKEN_REVOCATION_CHECK_SECONDS per user
+        self._verified = LRUCache(maxsize=app.config.get('TOKEN_CACHE_SIZE', 10000),
+                                  ttl=app.config.get('TOKEN_CACHE_TTL', 300))
+        self._accounts = LRUCache(maxsize=app.config.get('TOKEN_CACHE_SIZE', 10000),
+                                  ttl=app.config.get('TOKEN_REVOCATION_CHECK_SECONDS', 60))
+        app.extensions['token_auth'] = self
+
+    def issue(self, user):
+        payload = {
+            'user_id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'auth_method': user.auth_method,
+            'is_admin': bool(user.is_admin),
+            'ver': user.token_version or 0,
+            'exp': datetime.now(timezone.utc) + self.expiration
+        }
+        return jwt.encode(payload, self.secret, algorithm='HS256')
+
+    def _verify(self, token):
+        claims = self._verified.get(token)
+        if claims is not None:
+            with self._lock:
+                self.verified_hits += 1
+            if claims['exp'] < time.time():
+                self._verified.delete(token)
+                return None
+            return claims
+
+        with self._lock:
+            self.verified_misses += 1
+        try:
+            claims = jwt.decode(token, self.secret, algorithms=['HS256'], options={'require': ['exp', 'user_id']})
+        except jwt.InvalidTokenError:
+            return None
+        self._verified.set(token, claims)
+        return claims
+
+    def _account(self, user_id):
+        # (token_version, is_admin) of the user
+        account = self._accounts.get(user_id)
+        if account is None:
+            with self._lock:
+                self.revocation_lookups += 1
+            # A deleted user maps to version -1, which never matches an issued token
+            row = db.session.query(User.token_version, User.is_admin).filter_by(id=user_id).first()
+            account = (row.token_version, bool(row.is_admin)) if row is not None else (-1, False)
+            self._accounts.set(user_id, account)
+        return account
+
+    def authenticate(self, token):
+        claims = self._verify(token)
+        if claims is None:
+            return None
+        version, is_admin = self._account(claims['user_id'])
+        if claims.get('ver', 0) != version:
+            return None
+        return TokenUser(claims, is_admin)
+
+    def load_user_from_request(self, request):
+        header = request.headers.get('Authorization', '')
+        if not header.startswith('Bearer '):
+            return None
+        return self.authenticate(header[len('Bearer '):].strip())
+
+    def revoke_user_tokens(self, user_id):
+        # Invalidates every token issued to the user so far; other workers notice
+        # within TOKEN_REVOCATION_CHECK_SECONDS
+        user = db.session.get(User, user_id)
+        user.token_version = (user.token_version or 0) + 1
+        db.session.commit()
+        self._accounts.delete(user_id)
+        return user.token_version
+
+    def stats(self):
+        return {
+            'verified_hits': self.verified_hits,
+            'verified_misses': self.verified_misses,
+            'revocation_lookups': self.revocation_lookups,
+            'cached_tokens': len(self._verified)
+        }
+
+token_auth = AppExtension('token_auth', TokenAuthenticator)
+
+def load_user_from_request(request):
+    # Flask-Login request loader; resolves the authenticator of the app serving the request
+    return token_auth.load_user_from_request(request)
@@ -0,0 +1,127 @@
+from collections import OrderedDict
+from services.extensions import AppExtension
+import threading
+import time
+
+class LRUCache:
+    def __init__(self, maxsize=1024, ttl=300):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class TransactionHistoryCache:
+    # Any object with get/set/delete/clear (e.g. a Redis wrapper) can replace the
+    # in-process LRU through TRANSACTION_CACHE_BACKEND or set_backend().
+    # invalidate() only reaches this process; writes handled by another worker (or bulk
+    # jobs) are caught by the `version` callable, a cheap shared read compared on every hit
+    def __init__(self, backend=None):
+        self.backend = backend or LRUCache()
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale = 0
+        self._generations = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('TRANSACTION_CACHE_ENABLED', True)
+        backend = app.config.get('TRANSACTION_CACHE_BACKEND')
+        if backend is not None:
+            self.set_backend(backend)
+        else:
+            self.set_backend(LRUCache(
+                maxsize=app.config.get('TRANSACTION_CACHE_SIZE', 1024),
+                ttl=app.config.get('TRANSACTION_CACHE_TTL', 300)
+            ))
+        app.extensions['transaction_history_cache'] = self
+
+    def set_backend(self, backend):
+        self.backend = backend
+
+    @staticmethod
+    def _key(user_id):
+        return f'transactions:user:{user_id}'
+
+    def get_or_load(self, user_id, loader, version=None):
+        if not self.enabled:
+            return loader()
+
+        key = self._key(user_id)
+        # Read before loading: a write that lands during the load leaves an older version
+        # stored, so the next read reloads instead of keeping a stale entry
+        current = version() if version else None
+        entry = self.backend.get(key)
+        if entry is not None:
+            cached_version, value = entry
+            if cached_version == current:
+                with self._lock:
+                    self.hits += 1
+                return value
+            with self._lock:
+                self.stale += 1
+
+        with self._lock:
+            self.misses += 1
+            generation = self._generations.get(user_id, 0)
+        value = loader()
+        with self._lock:
+            # Skip the store if a write invalidated this user while we were loading
+            if self._generations.get(user_id, 0) == generation:
+                self.backend.set(key, (current, value))
+        return value
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self.invalidations += 1
+        self.backend.delete(self._key(user_id))
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'enabled': self.enabled,
+            'backend': type(self.backend).__name__,
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'stale': self.stale,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else 0.0,
+            'size': len(self.backend) if hasattr(self.backend, '__len__') else None
+        }
+
+history_cache = AppExtension('transaction_history_cache', TransactionHistoryCache)
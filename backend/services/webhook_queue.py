@@ -0,0 +1,263 @@
+from sqlalchemy import select, update, func, or_, and_
+from datetime import datetime, timedelta
+from models.models import db, Transaction, TransactionItem, TransactionArchive, WebhookEvent
+from services.database import dialect_insert
+from services.extensions import AppExtension
+from services.transaction_cache import history_cache
+from services import reporting
+from services.stripe_client import get_stripe
+import json
+import logging
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Handlers receive event['data']['object'] and return the user ids whose history changed.
+# They must be idempotent: an event can be re-run after a crash or a failed batch.
+
+def _line_items(session_object):
+    # Fake/expanded events carry line_items inline; real ones are fetched from Stripe
+    expanded = session_object.get('line_items')
+    if expanded:
+        return expanded.get('data', [])
+    return get_stripe().checkout.Session.list_line_items(session_object['id'], limit=100).get('data', [])
+
+def handle_checkout_completed(session_object):
+    if Transaction.query.filter_by(external_id=session_object['id']).first():
+        return set()
+    if TransactionArchive.query.filter_by(external_id=session_object['id']).first():
+        return set()
+
+    user_id = int((session_object.get('metadata') or {}).get('user_id'))
+    transaction = Transaction(
+        user_id=user_id,
+        amount_minor=session_object.get('amount_total') or 0,
+        currency=(session_object.get('currency') or 'pln').upper(),
+        payment_method='stripe',
+        status='approved' if session_object.get('payment_status') == 'paid' else 'pending',
+        external_id=session_object['id']
+    )
+    db.session.add(transaction)
+    db.session.flush()
+
+    items = []
+    for line_item in _line_items(session_object):
+        quantity = line_item.get('quantity') or 1
+        price = line_item.get('price') or {}
+        unit_price_minor = price.get('unit_amount')
+        if unit_price_minor is None:
+            unit_price_minor = (line_item.get('amount_total') or 0) // quantity
+        items.append(TransactionItem(
+            transaction_id=transaction.id,
+            product_name=(line_item.get('description') or 'Unknown Product')[:100],
+            unit_price_minor=unit_price_minor,
+            quantity=quantity
+        ))
+    db.session.add_all(items)
+
+    reporting.record_transaction_created(transaction, items)
+    return {user_id}
+
+def _set_stripe_status(session_object, new_status):
+    transaction = Transaction.query.filter_by(external_id=session_object['id']).first()
+    if not transaction:
+        # The completed event has not been processed yet; retry later
+        raise LookupError(f"No transaction for checkout session {session_object['id']}")
+    if transaction.status == new_status:
+        return set()
+
+    old_status = transaction.status
+    transaction.status = new_status
+    transaction.updated_at = datetime.utcnow()
+    reporting.record_status_change(transaction, old_status, new_status)
+    return {transaction.user_id}
+
+EVENT_HANDLERS = {
+    'checkout.session.completed': handle_checkout_completed,
+    'checkout.session.async_payment_succeeded': lambda obj: _set_stripe_status(obj, 'approved'),
+    'checkout.session.async_payment_failed': lambda obj: _set_stripe_status(obj, 'cancelled'),
+}
+
+class WebhookQueue:
+    def __init__(self):
+        self.app = None
+        self.processed = 0
+        self.failed = 0
+        self.retried = 0
+        self.batches = 0
+        self._threads = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config.get('WEBHOOK_WORKERS', 2)
+        self.batch_size = app.config.get('WEBHOOK_BATCH_SIZE', 50)
+        self.max_attempts = app.config.get('WEBHOOK_MAX_ATTEMPTS', 5)
+        self.poll_interval = app.config.get('WEBHOOK_POLL_INTERVAL', 1.0)
+        self.claim_timeout = app.config.get('WEBHOOK_CLAIM_TIMEOUT', 300)
+        self.retry_delay = app.config.get('WEBHOOK_RETRY_DELAY', 5)
+        app.extensions['webhook_queue'] = self
+
+    def enqueue(self, event_id, event_type, payload):
+        # Returns False when Stripe redelivers an event we already hold
+        statement = dialect_insert(db.session.get_bind(), WebhookEvent.__table__).values(
+            id=event_id,
+            type=event_type,
+            payload=payload,
+            status='pending',
+            attempts=0,
+            received_at=datetime.utcnow()
+        ).on_conflict_do_nothing(index_elements=['id'])
+        inserted = db.session.execute(statement).rowcount == 1
+        db.session.commit()
+        if inserted:
+            self._wakeup.set()
+        return inserted
+
+    def _claimable(self, now):
+        return or_(
+            and_(WebhookEvent.status == 'pending', or_(
+                WebhookEvent.attempts == 0,
+                # Back off before retrying, e.g. an async_payment event that overtook its checkout
+                WebhookEvent.claimed_at < now - timedelta(seconds=self.retry_delay)
+            )),
+            # Claimed by a worker that died mid-batch
+            and_(WebhookEvent.status == 'processing',
+                 WebhookEvent.claimed_at < now - timedelta(seconds=self.claim_timeout))
+        )
+
+    def claim_batch(self):
+        token = uuid.uuid4().hex
+        now = datetime.utcnow()
+        candidates = select(WebhookEvent.id).where(self._claimable(now)).order_by(
+            WebhookEvent.received_at
+        ).limit(self.batch_size)
+        db.session.execute(
+            update(WebhookEvent)
+            .where(WebhookEvent.id.in_(candidates))
+            .where(self._claimable(now))
+            .values(status='processing', claimed_by=token, claimed_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return WebhookEvent.query.filter_by(claimed_by=token).order_by(WebhookEvent.received_at).all()
+
+    def _handle(self, event):
+        handler = EVENT_HANDLERS.get(event.type)
+        touched = set()
+        if handler:
+            touched = handler(json.loads(event.payload)['data']['object']) or set()
+        event.status = 'done'
+        event.processed_at = datetime.utcnow()
+        event.claimed_by = None
+        return touched
+
+    def _fail(self, event_id, error):
+        event = db.session.get(WebhookEvent, event_id)
+        event.attempts += 1
+        event.last_error = str(error)[:500]
+        event.status = 'failed' if event.attempts >= self.max_attempts else 'pending'
+        event.claimed_by = None
+        db.session.commit()
+        with self._lock:
+            if event.status == 'failed':
+                self.failed += 1
+            else:
+                self.retried += 1
+        logger.warning('Webhook event %s (%s) failed: %s', event.id, event.type, error)
+
+    def process_batch(self):
+        events = self.claim_batch()
+        if not events:
+            return 0
+        event_ids = [event.id for event in events]
+
+        # Fast path: the whole batch in one commit. If any event fails, roll back and
+        # redo the batch one event per commit so a bad event cannot block the others.
+        touched = set()
+        try:
+            for event in events:
+                touched |= self._handle(event)
+            db.session.commit()
+            done = len(events)
+        except Exception:
+            db.session.rollback()
+            touched, done = set(), 0
+            for event_id in event_ids:
+                event = db.session.get(WebhookEvent, event_id)
+                try:
+                    touched |= self._handle(event)
+                    db.session.commit()
+                    done += 1
+                except Exception as e:
+                    db.session.rollback()
+                    self._fail(event_id, e)
+
+        for user_id in touched:
+            history_cache.invalidate(user_id)
+        with self._lock:
+            self.processed += done
+            self.batches += 1
+        return len(event_ids)
+
+    def _run(self):
+        with self.app.app_context():
+            while not self._stop.is_set():
+                try:
+                    claimed = self.process_batch()
+                except Exception:
+                    logger.exception('Webhook worker error')
+                    db.session.rollback()
+                    claimed = 0
+                finally:
+                    db.session.remove()
+                if not claimed:
+                    self._wakeup.wait(self.poll_interval)
+                    self._wakeup.clear()
+
+    def start(self, workers=None):
+        self._stop.clear()
+        for index in range(workers or self.workers):
+            thread = threading.Thread(target=self._run, name=f'webhook-worker-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def drain(self):
+        # Process synchronously until the queue is empty (CLI and tests)
+        total = 0
+        while True:
+            claimed = self.process_batch()
+            if not claimed:
+                return total
+            total += claimed
+
+    def metrics(self):
+        counts = dict(db.session.query(WebhookEvent.status, func.count()).group_by(WebhookEvent.status).all())
+        oldest = db.session.query(func.min(WebhookEvent.received_at)).filter(
+            WebhookEvent.status.in_(['pending', 'processing'])
+        ).scalar()
+        return {
+            'depth': counts.get('pending', 0) + counts.get('processing', 0),
+            'pending': counts.get('pending', 0),
+            'processing': counts.get('processing', 0),
+            'failed': counts.get('failed', 0),
+            'done': counts.get('done', 0),
+            'lag_seconds': round((datetime.utcnow() - oldest).total_seconds(), 3) if oldest else 0.0,
+            'workers_alive': sum(1 for thread in self._threads if thread.is_alive()),
+            'processed_total': self.processed,
+            'failed_total': self.failed,
+            'retried_total': self.retried,
+            'batches_total': self.batches
+        }
+
+webhook_queue = AppExtension('webhook_queue', WebhookQueue)
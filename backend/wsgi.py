@@ -0,0 +1,5 @@
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+# Migrations run once in gunicorn's on_starting hook, not in every worker
+from app import create_app
+
+app = create_app({'AUTO_MIGRATE': False})
@@ -7,6 +7,7 @@ const AdminPanel = () => {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
   const [isAdmin, setIsAdmin] = useState(false);
+  const [searchQuery, setSearchQuery] = useState('');
   const navigate = useNavigate();
 
   useEffect(() => {
@@ -42,6 +43,26 @@ const AdminPanel = () => {
     checkAdminStatus();
   }, [navigate]);
 
+  useEffect(() => {
+    if (!isAdmin) {
+      return undefined;
+    }
+
+    // Changes from other admins and Stripe webhooks arrive as deltas instead of list re-fetches
+    const source = new EventSource('http://localhost:5000/api/events', { withCredentials: true });
+    source.addEventListener('transaction', (event) => {
+      const delta = JSON.parse(event.data);
+      setTransactions(current =>
+        current.some(transaction => transaction.id === delta.id)
+          ? current.map(transaction => transaction.id === delta.id ? { ...transaction, ...delta } : transaction)
+          : [delta, ...current]
+      );
+    });
+    source.addEventListener('reset', () => fetchTransactions());
+
+    return () => source.close();
+  }, [isAdmin]);
+
   const fetchTransactions = async () => {
     try {
       const response = await fetch('http://localhost:5000/api/admin/transactions', {
@@ -65,6 +86,34 @@ const AdminPanel = () => {
     }
   };
 
+  const searchTransactions = async (event) => {
+    event.preventDefault();
+    if (!searchQuery.trim()) {
+      fetchTransactions();
+      return;
+    }
+
+    try {
+      // Searched on the server (tytuł przelewu, użytkownik, email, produkty)
+      const response = await fetch(`http://localhost:5000/api/admin/transactions/search?q=${encodeURIComponent(searchQuery)}&limit=100`, {
+        method: 'GET',
+        credentials: 'include',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+      });
+
+      if (response.ok) {
+        const data = await response.json();
+        setTransactions(data.transactions);
+      } else {
+        throw new Error('Nie udało się wyszukać transakcji');
+      }
+    } catch (err) {
+      setError(err.message);
+    }
+  };
+
   const updateTransactionStatus = async (transactionId, newStatus) => {
     try {
       setLoading(true);
@@ -148,6 +197,16 @@ const AdminPanel = () => {
     <div className="admin-panel">
       <h1>Panel Administratora</h1>
       <h2>Zarządzanie Płatnościami</h2>
+
+      <form className="search-form" onSubmit={searchTransactions}>
+        <input
+          type="text"
+          value={searchQuery}
+          onChange={(e) => setSearchQuery(e.target.value)}
+          placeholder="Szukaj: tytuł przelewu, użytkownik, email, produkt"
+        />
+        <button type="submit">Szukaj</button>
+      </form>
       
       {transactions.length === 0 ? (
         <p>Brak transakcji do wyświetlenia</p>
@@ -181,6 +240,9 @@ const AdminPanel = () => {
                     <span className={getStatusBadgeClass(transaction.status)}>
                       {getStatusLabel(transaction.status)}
                     </span>
+                    {transaction.status === 'pending' && transaction.overdue_at && (
+                      <span className="status-badge overdue">Po terminie</span>
+                    )}
                   </td>
                   <td>{transaction.created_at}</td>
                   <td>
@@ -12,11 +12,19 @@ const Shop = () => {
   const [showCheckout, setShowCheckout] = useState(false);
   const [isProcessing, setIsProcessing] = useState(false);
   const [paymentError, setPaymentError] = useState(null);  const [orderComplete, setOrderComplete] = useState(false);
-  const products = [
-    { id: 1, name: 'Podkładka pod myszkę', price: 20, image: podkladka, description: 'Gamingowa podkładka pod myszkę' },
-    { id: 2, name: 'Gamingowy Kubek', price: 15, image: kubek, description: 'Idealny na kawkę przy ulubionej grze' },
-    { id: 3, name: 'Plakat Wiedźmin 3 - Dziki Gon', price: 40, image: plakat, description: 'Panorama Novigrad' },
-  ];
+  const [products, setProducts] = useState([]);
+  const productImages = { podkladka, kubek, plakat };
+
+  useEffect(() => {
+    // The browser revalidates with If-None-Match, so an unchanged catalog comes back as 304
+    fetch('http://localhost:5000/api/products', { cache: 'no-cache' })
+      .then(response => response.json())
+      .then(data => setProducts(data.products.map(product => ({
+        ...product,
+        image: productImages[product.image] || `https://via.placeholder.com/300x200?text=${encodeURIComponent(product.name)}`,
+      }))))
+      .catch(() => setPaymentError('Nie udało się wczytać produktów.'));
+  }, []);
 
   const addToCart = (product) => {
     const existingProductIndex = cart.findIndex(item => item.id === product.id);
@@ -63,24 +71,11 @@ const Shop = () => {
       setIsProcessing(true);
       setPaymentError(null);
       
-      const getImagePlaceholder = (name) => {
-        return `https://via.placeholder.com/300x200?text=${encodeURIComponent(name)}`;
-      };
-        const lineItems = cart.map(item => {
-        return {
-          price_data: {
-            currency: 'pln',
-            product_data: {
-              name: item.name,
-              description: item.description,
-        
-              images: [getImagePlaceholder(item.name)]
-            },
-            unit_amount: item.price * 100,
-          },
-          quantity: item.quantity,
-        };
-      });
+      // Prices are resolved by the server from the catalog
+      const lineItems = cart.map(item => ({
+        product_id: item.id,
+        quantity: item.quantity,
+      }));
       
       if (paymentMethod === 'offline') {
         const response = await fetch('http://localhost:5000/api/create-offline-payment', {
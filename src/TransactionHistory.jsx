@@ -1,10 +1,16 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import './TransactionHistory.css';
 
 const TransactionHistory = () => {
   const [transactions, setTransactions] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const transactionsRef = useRef([]);
+
+  useEffect(() => {
+    transactionsRef.current = transactions;
+  }, [transactions]);
 
   useEffect(() => {
     const fetchTransactions = async () => {
@@ -20,6 +26,7 @@ const TransactionHistory = () => {
         if (response.ok) {
           const data = await response.json();
           setTransactions(data.transactions);
+          setNextCursor(data.next_cursor);
         } else {
           throw new Error('Nie udało się pobrać historii transakcji');
         }
@@ -31,8 +38,48 @@ const TransactionHistory = () => {
     };
 
     fetchTransactions();
+
+    // Status changes are pushed by the server; only a transaction we have not seen yet
+    // (or a resync request) reloads the list
+    const source = new EventSource('http://localhost:5000/api/events', { withCredentials: true });
+    source.addEventListener('transaction', (event) => {
+      const delta = JSON.parse(event.data);
+      if (!transactionsRef.current.some(transaction => transaction.id === delta.id)) {
+        fetchTransactions();
+        return;
+      }
+      setTransactions(current => current.map(transaction =>
+        transaction.id === delta.id ? { ...transaction, status: delta.status } : transaction
+      ));
+    });
+    source.addEventListener('reset', fetchTransactions);
+
+    return () => source.close();
   }, []);
 
+  // Older, closed transactions live in the archive and are loaded page by page
+  const loadOlderTransactions = async () => {
+    try {
+      const response = await fetch(`http://localhost:5000/api/transactions?cursor=${encodeURIComponent(nextCursor)}`, {
+        method: 'GET',
+        credentials: 'include',
+        headers: {
+          'Content-Type': 'application/json',
+        },
+      });
+
+      if (response.ok) {
+        const data = await response.json();
+        setTransactions([...transactions, ...data.transactions]);
+        setNextCursor(data.next_cursor);
+      } else {
+        throw new Error('Nie udało się pobrać starszych transakcji');
+      }
+    } catch (err) {
+      setError(err.message);
+    }
+  };
+
   const getStatusLabel = (status) => {
     switch (status) {
       case 'pending':
@@ -82,7 +129,7 @@ const TransactionHistory = () => {
     <div className="transaction-history">
       <h2>Historia Transakcji</h2>
       
-      {transactions.length === 0 ? (
+      {transactions.length === 0 && !nextCursor ? (
         <p className="no-transactions">Nie masz jeszcze żadnych transakcji</p>
       ) : (
         <div className="transactions-list">
@@ -132,6 +179,11 @@ const TransactionHistory = () => {
               )}
             </div>
           ))}
+          {nextCursor && (
+            <button className="load-more-btn" onClick={loadOlderTransactions}>
+              Pokaż starsze transakcje
+            </button>
+          )}
         </div>
       )}
     </div>